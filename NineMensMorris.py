@@ -2,43 +2,144 @@
 
 import pygame, sys, os
 import math
-import itertools
 import random
 from pygame.locals import *
+import engine
+import variants
+import greedy
+import search
+import evaluation
+import mcts
+import endgame
+import wdl
+import book
+import aiworker
+import assets
+import profiling
+
+VARIANT = 'nine' #game to play, a name in variants.definitions or a definition file
+AI_SEARCH = True #use the alpha-beta search AI, False for the original greedy AI
+AI_MCTS = False #use Monte Carlo tree search for the search AI instead of alpha-beta
+AI_TIME_LIMIT = 0.02 #seconds the search AI may think each move
+ENDGAME_DIRECTORY = os.path.join('data', 'endgame') #tables made by endgame.py, used if present
+WDL_DIRECTORY = os.path.join('data', 'wdl') #tables made by wdl.py, used if present
+BOOK_PATH = os.path.join('data', 'book.bin') #opening book made by book.py, used if present
+WEIGHTS_PATH = os.path.join('data', 'weights.bin') #evaluation weights made by learn.py, used if present
+ASSET_DIRECTORY = 'data' #images, and the bundle made by assets.py if present
+FONT_SIZE = 36
+TEXT_COLOR = (10, 10, 10)
+LINE_COLOR = (163, 153, 141) #lines of boards drawn for variants without their own image
+LINE_WIDTH = 6
+BOARD_RECT = pygame.Rect((213, 84), (297, 297)) #where the intersections of a drawn board go
+DEBUG_OVERLAY = False #show the AI's time and speed, the frame rate and the greedy AI's values, F3 toggles it
+DEBUG_FONT_SIZE = 20
+PROFILE_MODE = None #'instrument', 'trace' or 'sample' to profile the game, see profiling.py
+PROFILE_PATH = None #file the profile is saved to on exit, None for profiling.defaultPath
+DIRTY_RENDERING = True #redraw only the parts of the screen that changed, False redraws it all each frame
+AI_PONDER = True #let the search AI think on the human's time, False leaves the CPU idle between moves
+FPS_CAP = 60 #most frames drawn each second while something is moving
+ANIMATION_STEP = 1.0 / 30 #seconds of animation in each update of the pieces, whatever the frame rate
+MAX_ANIMATION_STEPS = 5 #most updates in one frame, a longer stall slows the animation instead
+AI_DONE_EVENT = USEREVENT #posted by the AI worker when a move is ready
+
+#drawing layers, higher layers are drawn on top
+PIECE_LAYER = 0
+MENU_LAYER = 1
+TEXT_LAYER = 2
+
+#renderText function
+#@param _text the text
+#@param _size the font size
+#@param _cache true to keep the surface for the next time _text is drawn
+#@return the surface of _text
+def renderText(_text, _size=FONT_SIZE, _cache=True):
+    if _cache:
+        return assetManager.text(_text, _size, TEXT_COLOR)
+    return assetManager.font(None, _size).render(_text, 1, TEXT_COLOR)
+
+#Label class is a line of text drawn over the board
+class Label(pygame.sprite.DirtySprite):
+    #__init__ method
+    #@param _text the text
+    #@param _xy the top left corner
+    #@param _size the font size
+    #@param _cache false for text that changes too often to keep its surfaces
+    def __init__(self, _text, _xy, _size=FONT_SIZE, _cache=True):
+        pygame.sprite.DirtySprite.__init__(self)
+        self._layer = TEXT_LAYER
+        self.xy = _xy
+        self.size = _size
+        self.cache = _cache
+        self.text = None
+        self.setText(_text)
+        self.visible = 0
+        self.add(allspritesGroup)
 
-#load_image function
-#@param name the file name of the image
-#@param colorkey the transparent color in the image
-#@return the image surface
-def load_image(name, colorkey=None):
-    fullname = os.path.join('data', name)
-    try:
-        image = pygame.image.load(fullname) #load a surface
-    except pygame.error, message:
-        print 'Cannot load image:', name
-        raise SystemExit, message
-    image = image.convert() #convert pixel format
-    if colorkey is not None:
-        if colorkey is -1:
-            colorkey = image.get_at((0,0))
-        image.set_colorkey(colorkey, RLEACCEL) #the transparent color
-    return image
+    #setText method
+    #@param _text the new text
+    def setText(self, _text):
+        if _text != self.text:
+            self.text = _text
+            self.image = renderText(_text, self.size, self.cache)
+            self.rect = self.image.get_rect(topleft=self.xy)
+            self.dirty = 1
+
+    #show method
+    #@param _visible true to draw the label
+    def show(self, _visible):
+        if self.visible != int(_visible):
+            self.visible = int(_visible)
+
+#Menu class is the see-through box behind the menus with the button under the
+#mouse highlighted
+class Menu(pygame.sprite.DirtySprite):
+    def __init__(self):
+        pygame.sprite.DirtySprite.__init__(self)
+        self._layer = MENU_LAYER
+        self.images = [] #image with no button, the left button and the right button highlighted
+        for highlight in range(3):
+            image = pygame.Surface((240, 100))
+            image.set_alpha(127)
+            image.fill((255, 255, 255))
+            if highlight:
+                pygame.draw.rect(image, (180, 180, 180), pygame.Rect((-60 + highlight * 100, 45), (60, 40)), 0)
+            pygame.draw.rect(image, (10, 10, 10), pygame.Rect((40, 45), (60, 40)), 1)
+            pygame.draw.rect(image, (10, 10, 10), pygame.Rect((140, 45), (60, 40)), 1)
+            self.images.append(image)
+        self.highlight = 0
+        self.image = self.images[0]
+        self.rect = self.image.get_rect(topleft=(200, 180))
+        self.add(allspritesGroup)
+
+    #setHighlight method
+    #@param _highlight 0 for no button, 1 for the left button and 2 for the right
+    def setHighlight(self, _highlight):
+        if _highlight != self.highlight:
+            self.highlight = _highlight
+            self.image = self.images[_highlight]
+            self.dirty = 1
+
+    #show method
+    #@param _visible true to draw the menu
+    def show(self, _visible):
+        if self.visible != int(_visible):
+            self.visible = int(_visible)
 
 #Piece class represents a piece on the board
-class Piece(pygame.sprite.Sprite):
+class Piece(pygame.sprite.DirtySprite):
     #__init__ method
     #@param _player the player for which the piece belongs
     #@param _x the starting x position
     #@param _y the starting y position
     def __init__(self, _player, _x, _y):
-        pygame.sprite.Sprite.__init__(self) #call Sprite initializer
+        pygame.sprite.DirtySprite.__init__(self) #call Sprite initializer
+        self._layer = PIECE_LAYER
         self.add(allspritesGroup)
-        self.image = pieceImg[_player]
+        self.image = assetManager.image(pieceImages[_player], -1)
         self.rect = self.image.get_rect()
         self.grabbed = False
         self.player = _player
         self.position = -1 #position on the board
-        self.paths = []
         self.lost = False #true if the piece has been lost and removed from the board
         self.xyPrevious = (_x, _y) #previous position before grabbing
         self.xy = (_x, _y) #x y coordinates
@@ -54,50 +155,38 @@ class Piece(pygame.sprite.Sprite):
         self.moving = True
         self.dest = ((800, 800))
 
-    #findBestPath method
-    #@param _dest the destination position
-    #@return the shortest path from position to _dest as a list or an empty
-    #list if there is no path
-    def findBestPath(self, _dest):
-        self.paths = []
-        self.findPaths([self.position], _dest)
-        if self.paths:
-            return random.sample(filter(lambda x: len(x) == min([len(i) for i in self.paths]), self.paths), 1)[0]
-        return []
-
-    #findPaths method
-    #finds all simple paths from position to _dest and adds them to the _path list
-    #@param _path the path so far
-    #@param _dest the destination position
-    def findPaths(self, _path, _dest):
-        if _path[-1] == _dest:
-            self.paths += [_path]
-        for i in filter(lambda x: board[x] == 0, neighbors[_path[-1]]):
-            if not i in _path:
-                self.findPaths(_path + [i], _dest)
-
-    #getOpenNeighbors method
-    #@return a list of open neighbor positions
-    def getOpenNeighbors(self):
-        return filter(lambda x: board[x] == 0, neighbors[self.position])
-    
     #jumpTo method
     #@param (x, y) the new x,y position
     def jumpTo(self, (x, y)):
         self.xy = (x, y)
+        center = (int(x), int(y))
+        if center != self.rect.center:
+            self.rect.center = center #move rect to xy
+            self.dirty = 1
 
     #update method
-    #updates the piece every step of the game
+    #moves the piece one ANIMATION_STEP towards its destination
     def update(self):
-        if self.grabbed:
-            self.jumpTo(pygame.mouse.get_pos())
         if self.moving:
             d = point_direction(self.xy, self.dest)
             s = min(20, point_distance(self.xy, self.dest) / 8)
             self.jumpTo((self.xy[0] + (math.sin(d) * s), self.xy[1] - (math.cos(d) * s)))
             if point_distance(self.xy, self.dest) < 1:
                 self.moving = False
-        self.rect.center = (self.xy[0], self.xy[1]) #move rect to xy
+
+#movingPieces function
+#@return true if a piece is being animated
+def movingPieces():
+    for p in pieces:
+        if p.moving:
+            return True
+    return False
+
+#postAIDone function
+#called from the AI worker's thread when a move is ready, wakes the game loop
+#@param _future the MoveFuture
+def postAIDone(_future):
+    pygame.event.post(pygame.event.Event(AI_DONE_EVENT))
 
 #point_direction function
 #@param (x1, y1) the first position
@@ -113,244 +202,168 @@ def point_direction((x1, y1), (x2, y2)):
 def point_distance((x1, y1), (x2, y2)):
     return math.sqrt(((x1 - x2) ** 2) + ((y1 - y2) ** 2))
         
-#returns true if the position is part of a mill for player
-#isMill function
-#@param _pos the position
-#@param _player the player, either 1 or 2
-#@return the _pos is part of a mill or not
-def isMill(_pos, _player):
-    if board[_pos] != 0: #there's a piece here
-        if board[_pos].player == _player: #the piece belongs to this player
-            if board[mills[_pos][0][0]] != 0 and board[mills[_pos][0][1]] != 0: #there are pieces at the 2 other intersections
-                if board[mills[_pos][0][0]].player == _player and board[mills[_pos][0][1]].player == _player:
-                    return True
-            if board[mills[_pos][1][0]] != 0 and board[mills[_pos][1][1]] != 0: #there are pieces at the 2 other intersections
-                if board[mills[_pos][1][0]].player == _player and board[mills[_pos][1][1]].player == _player:
-                    return True
-    return False
-
-#canMove method
-#returns true if player can slide any pieces
-#@param _player the player
-#@return true if the player can make a move
-def canMove(_player):
-    for i in pieces:
-        if i.player == _player and i.position != -1:
-            for p in neighbors[i.position]:
-                if board[p] == 0:
-                    return True
-    return False
-
-#allMills function                
-#returns true if all pieces on the board for player are part of mills
-#@param _player the player
-#@return true if all _player's pieces are part of mills
-def allMills(_player):
-    for i in pieces:
-        if i.player == _player and i.position != -1:
-            if not isMill(i.position, _player):
-                return False
-    return True
-
-#isLegalMove function
-#@param _from the starting position
-#@param _to the endint position
-#@return true if _from to _to is connected by a line
-def isLegalMove(_from, _to):
-    if (_from, _to) in [(0, 7), (7, 0), (8, 15), (15, 8), (16, 23), (23, 16)]:
-        return True
-    if (_from, _to) in [(7, 8), (8, 7), (15, 16), (16, 15)]:
-        return False
-    if _from % 2 == 1:
-        if abs(_to - _from) == 8:
-            return True
-    if abs(_to - _from) == 1:
-        return True
-    return False
-
-#getAllMoves function
-#@param _player the player
-#@param flying if _player is in the flying stage
-#@return a list of possible moves for player as [piece, destination]
-def getAllMoves(_player, flying):
-    moves = []
-    if flying:
-        emptyIntersections = filter(lambda x: board[x] == 0, range(24))
-        for i in pieces:
-            if i.player == _player and not i.lost and i.position != -1:
-                for x in emptyIntersections:
-                    moves += [[i, x]]
-    else:
-        for i in pieces:
-            if i.player == _player and not i.lost and i.position != -1:
-                for x in i.getOpenNeighbors():
-                    moves += [[i, x]]
-    return moves
-
-#getPiecesRemaining function
-#@param _player the player
-#@return the number of pieces remaining for player
-def getPiecesRemaining(_player):
-    total = 0
-    for i in pieces:
-        if i.player == _player and i.lost:
-            total += 1
-    return 9 - total
-
 #getIntersectionValue function
 #@param _player the player1Group
 #@param _pos the position on the boardImg
 #@return a value for an open intersection corresponding to how valuable the spot is for player
 def getIntersectionValue(_player, _pos):
-    value = 0
-    if _pos in [1, 3, 5, 7, 17, 19, 21, 23]: #edge
-        value += 1
-    elif _pos in [9, 11, 13, 15]: #intersection
-        value += 2
-
-    #check if adjacent intersections can be mills
-    if board[_pos] != 0:
-        if board[_pos].player == 2:
-            for i in filter(lambda x: board[x] == 0, neighbors[_pos]):
-                if board[mills[i][0][0]] != 0 and board[mills[i][0][1]] != 0 and not (_pos in mills[i][0]):
-                    if board[mills[i][0][0]].player == _player and board[mills[i][0][1]].player == _player: #we can make a mill
-                        value -= 50
-                elif board[mills[i][1][0]] != 0 and board[mills[i][1][1]] != 0 and not (_pos in mills[i][1]):
-                    if board[mills[i][1][0]].player == _player and board[mills[i][1][1]].player == _player: #we can make a mill
-                        value -= 50
-        if isMill(_pos, _player): #this is a mill
-            value -= 7
-
-    if board[mills[_pos][0][0]] != 0 and board[mills[_pos][0][1]] != 0:
-        if board[mills[_pos][0][0]].player == _player and board[mills[_pos][0][1]].player == _player: #we can make a mill
-            value += 7
-        elif board[mills[_pos][0][0]].player == _player % 2 + 1 and board[mills[_pos][0][1]].player == _player % 2 + 1: #block a mill
-            value += 7
-    elif board[mills[_pos][1][0]] != 0 and board[mills[_pos][1][1]] != 0:
-        if board[mills[_pos][1][0]].player == _player and board[mills[_pos][1][1]].player == _player: #we can make a mill
-            value += 7
-        elif board[mills[_pos][1][0]].player == _player % 2 + 1 and board[mills[_pos][1][1]].player == _player % 2 + 1: #block a mill
-            value += 7
-    if board[mills[_pos][0][0]] != 0:
-        if board[mills[_pos][0][0]].player == _player:
-            value += 1
-    if board[mills[_pos][0][1]] != 0:
-        if board[mills[_pos][0][1]].player == _player:
-            value += 1
-    if board[mills[_pos][1][0]] != 0:
-        if board[mills[_pos][1][0]].player == _player:
-            value += 1
-    if board[mills[_pos][1][1]] != 0:
-        if board[mills[_pos][1][1]].player == _player:
-            value += 1
-    if len(filter(lambda x: board[x].player == 1, filter(lambda x: board[x] != 0, neighbors[_pos]))) > 1:
-        value += 3
-    return value
-
-#getPathValue function
-#@param _path the path as a list
-#@return a value for the path corresponding to how good this path is for player 2
-def getPathValue(_path):
-    value = getIntersectionValue(2, _path[1]) - getIntersectionValue(2, _path[0])
-    for i in _path[2:]:
-        value += (getIntersectionValue(2, i) - 3)
-    return value
+    return greedy.intersectionValue(state, _player, _pos)
+
+#getUnplacedPiece function
+#@param _player the player
+#@return the first piece _player has not placed on the board yet
+def getUnplacedPiece(_player):
+    return filter(lambda x: x.player == _player and x.position == -1 and not x.lost, pieces)[0]
+
+#getSearchMove function
+#@param _move the compound move found for player 2 by the search AI or None
+#@return _move as a list [piece, destination, removal] where removal is the
+#position of the piece to remove after a mill or -1, or an empty list if player
+#2 can't move
+def getSearchMove(_move):
+    if _move is None:
+        return []
+    if _move[0] == -1:
+        return [getUnplacedPiece(2), _move[1], _move[2]]
+    return [board[_move[0]], _move[1], _move[2]]
 
 #calcPieceToRemove()
 #return the best piece for player 2 to remove
 def calcPieceToRemove():
-    possiblePieces = filter(lambda x: x != -1, [i.position for i in pieces[:9]]) #positions of player1 pieces on the board
-    if not allMills(1):
-        possiblePieces = filter(lambda x: not isMill(x, 1), possiblePieces) #exclude pieces in mills
-    values = [getIntersectionValue(2, i) for i in possiblePieces] #values for possible pieces
-    return board[possiblePieces[random.sample(filter(lambda x: values[x] == max(values), range(len(possiblePieces))), 1)[0]]]
+    return board[greedy.pieceToRemove(state, 2, random)]
 
 #calcBestMove function
-#@param stage the current stage
-#@return the best move for player as a list [piece, destination]
-def calcBestMove(stage):
-    if stage == 1: #placing stage
-        piece = filter(lambda x: x.player == 2 and x.position == -1 and not x.lost, pieces)[0] #the first unplaced piece for player 2
-        values = [getIntersectionValue(2, i) for i in range(24)] #get values for all intersections
-        destination = []
-        emptyIntersections = filter(lambda x: board[x] == 0, range(24))
-        maxValue = 0
-        for i in emptyIntersections: #find the highest valued empty intersections
-            if values[i] > maxValue:
-                maxValue = values[i]
-                destination = [i]
-            elif values[i] == maxValue:
-                destination += [i]
-        return [piece, random.sample(destination, 1)[0]]
-    elif stage == 2: #sliding stage
-        emptyIntersections = filter(lambda x: board[x] == 0, range(24))
-        paths = []
-        #find shortest paths from all pieces to all empty intersections
-        for d in emptyIntersections:
-            paths += filter(lambda x: x != [], [p.findBestPath(d) for p in filter(lambda x: not x.lost and x.position != -1, pieces[9:])])
-        if paths != []:
-            values = [getPathValue(i) for i in paths] #values of the paths
-            paths = random.sample([paths[i] for i in filter(lambda x: values[x] == max(values), range(len(paths)))], 1)[0]
-            return [board[paths[0]], paths[1]]
+#@return the best move for player 2 found by the original AI as a list
+#[piece, destination], or an empty list if player 2 can't move
+def calcBestMove():
+    move = greedy.bestMove(state, 2, random)
+    if move is None:
         return []
-    else: #flying stage
-        moves = getAllMoves(2, True)
-        values = [getIntersectionValue(2, i[1]) - getIntersectionValue(2, i[0].position) for i in moves]
-        return moves[random.sample(filter(lambda x: values[x] == max(values), range(len(moves))), 1)[0]]
-        
+    if move[0] == -1:
+        return [getUnplacedPiece(2), move[1]]
+    return [board[move[0]], move[1]]
+
+#setUpPieces function
+#makes a new set of pieces for both players beside the board
+def setUpPieces():
+    spacing = min(50, 450 // state.variant.pieces) #nine pieces fit in a row 50 apart
+    player1Group.empty()
+    player2Group.empty()
+    for i in range(state.variant.pieces):
+        pieces[i] = Piece(1, 160 + (i * spacing), 450) #player1
+        pieces[i].add(player1Group)
+        pieces[i + state.variant.pieces] = Piece(2, 160 + (i * spacing), 30) #player2
+        pieces[i + state.variant.pieces].add(player2Group)
+
+#makeIntersections function
+#@param _variant the variants.Variant
+#@return the rects of the intersections of _variant's board, those drawn on
+#the board image for the standard game and spread over BOARD_RECT otherwise
+def makeIntersections(_variant):
+    if _variant is engine.STANDARD:
+        return standardIntersections
+    columns = max([x for x, y in _variant.points])
+    rows = max([y for x, y in _variant.points])
+    return [pygame.Rect((BOARD_RECT.left + x * BOARD_RECT.width // columns, BOARD_RECT.top + y * BOARD_RECT.height // rows), (1, 1))
+            for x, y in _variant.points]
+
+#drawBoard function
+#draws the lines of a variant's board over the board image, which is covered
+#with wood from beside it first
+#@param _surface the surface with the board image
+#@param _variant the variants.Variant
+def drawBoard(_surface, _variant):
+    strip = pygame.Rect((0, 0), (BOARD_RECT.left - 10, _surface.get_height()))
+    for x in range(BOARD_RECT.left - 10, BOARD_RECT.right + 10, strip.width):
+        _surface.blit(_surface, (x, 0), strip)
+    for line in _variant.lines:
+        for a, b in zip(line, line[1:]):
+            pygame.draw.line(_surface, LINE_COLOR, intersections[a].topleft, intersections[b].topleft, LINE_WIDTH)
+    for r in intersections:
+        pygame.draw.circle(_surface, LINE_COLOR, r.topleft, LINE_WIDTH)
 
 def main():
     mouseRect = 0
     selectedPiece = 0
-    turn = 1 #player1 turn
-    piecesToPlay = 18 #pieces left to be placed on the board
-    removePiece = False #if we made a mill and are choosing a piece to remove
     removedPiece = False #we just removed a piece
     stage = 0 #0 = choose # of players, 1 = in game, 2 = play again?
     players = 1 #number of human players
     movingPiece = 0 # the piece that is moving, if there is one
-    
+    aiRemoval = -1 #the position the search AI chose to remove after its mill
+    aiFuture = None #the search AI's move being worked out in the background
+    mousePos = pygame.mouse.get_pos() #kept up to date from the mouse events
+    animationTime = 0.0 #seconds of animation not yet stepped
+    drawn = False #a frame has been drawn since the loop started
+    debugOverlay = DEBUG_OVERLAY
+    aiText = 'AI: -' #time and speed of the last AI move for the debug overlay
+    speedText = ''
+    frames = 0 #frames drawn since fpsTime
+    fpsTime = pygame.time.get_ticks()
+    fps = 0.0
+
     while True:
-        clock.tick(30)
-        if players == 1 and turn == 2 and stage != 2: # do AI stuff
+        if useSearch and AI_PONDER and players == 1 and state.turn == 1 and stage == 1 and not state.removing and not state.isGameOver():
+            aiWorker.ponder(state) #think on the human's time
+        if players == 1 and state.turn == 2 and stage != 2: # do AI stuff
             if movingPiece != 0: #a piece is moving
                 if not movingPiece.moving:
                     movingPiece = 0
             else:
-                if removePiece:
-                    bestMove = calcPieceToRemove()
+                if state.removing:
+                    if aiRemoval != -1:
+                        bestMove = board[aiRemoval]
+                    else:
+                        bestMove = calcPieceToRemove()
                     board[bestMove.position] = 0
+                    state.removePiece(bestMove.position)
                     bestMove.remove()
-                    removePiece = False
-                    turn = turn % 2 + 1 #switch turns
-                    if getPiecesRemaining(turn) < 3 or (piecesToPlay <= 1 and getPiecesRemaining(turn) > 3 and not canMove(turn)):
-                        stage = 2 #game over
                 else:
-                    if piecesToPlay > 0:
-                        bestMove = calcBestMove(1)
-                    elif getPiecesRemaining(2) > 3:
-                        bestMove = calcBestMove(2)
+                    bestMove = 0 #no move yet
+                    if useSearch:
+                        if aiFuture is None:
+                            aiFuture = aiWorker.request(state, _callback=postAIDone)
+                        if aiFuture.done():
+                            if aiFuture.fromBook:
+                                aiText = 'AI: book move'
+                            else:
+                                aiText = 'AI: %dms, depth %d' % (1000 * aiFuture.elapsed, aiFuture.depth)
+                                speedText = '%d nodes/s' % (aiFuture.nodes / max(aiFuture.elapsed, 1e-3))
+                            bestMove = getSearchMove(aiFuture.result())
+                            aiFuture = None
+                            if bestMove != []:
+                                aiRemoval = bestMove[2]
                     else:
-                        bestMove = calcBestMove(3)
-                    if bestMove != []: #otherwise player2 is trapped
+                        bestMove = calcBestMove()
+                    if bestMove: #otherwise player2 is trapped or still thinking
                         movingPiece = bestMove[0]
                         movingPiece.moving = True
                         if movingPiece.position != -1:
                             board[movingPiece.position] = 0 #clear old position
                         movingPiece.dest = intersections[bestMove[1]].topleft
+                        state.makeMove(movingPiece.position, bestMove[1])
                         board[bestMove[1]] = movingPiece #set new board position
                         movingPiece.position = bestMove[1]
-                        if isMill(bestMove[0].position, 2): #just made a mill
-                            removePiece = True
-                        else:
-                            turn = turn % 2 + 1 #switch turns
-                        piecesToPlay = max(0, piecesToPlay - 1)
-                if getPiecesRemaining(turn) < 3 or (piecesToPlay <= 1 and getPiecesRemaining(turn) > 3 and not canMove(turn)):
+                if state.isGameOver():
                     stage = 2 #game over
 
-        for event in pygame.event.get():
+        #frames are only drawn while a piece moves or the AI has work to do,
+        #otherwise the loop sleeps until an event, an AI_DONE_EVENT included
+        aiToMove = players == 1 and state.turn == 2 and stage != 2
+        if not drawn or (aiToMove and aiFuture is None) or movingPieces():
+            animationTime += clock.tick(FPS_CAP) / 1000.0
+            events = pygame.event.get()
+        else:
+            events = [pygame.event.wait()] + pygame.event.get()
+            clock.tick() #the time spent waiting is not animated
+            animationTime = 0.0
+
+        for event in events:
+            if event.type in (MOUSEMOTION, MOUSEBUTTONDOWN, MOUSEBUTTONUP):
+                mousePos = event.pos
+                if selectedPiece != 0 and selectedPiece.grabbed:
+                    selectedPiece.jumpTo(mousePos) #the grabbed piece follows the mouse
             if event.type == MOUSEBUTTONDOWN:
-                mouseRect = pygame.Rect(pygame.mouse.get_pos(), (1,1))
+                mouseRect = pygame.Rect(mousePos, (1,1))
                 if event.button == 1: #left click
                     if stage == 0: #choose # of players
                         if mouseRect.colliderect(pygame.Rect((240, 225), (60, 40))): #1
@@ -360,65 +373,42 @@ def main():
                             players = 2
                             stage = 1
                     elif stage == 1: #in game
-                        if turn == 1:
-                            if removePiece: #choose a piece to remove
-                                if mouseRect.collidelist([i.rect for i in player2Group.sprites()]) != -1: #we're clicking a piece
-                                    selectedPiece = player2Group.sprites()[mouseRect.collidelist([i.rect for i in player2Group.sprites()])]
-                                    if selectedPiece.position != -1 and (allMills(2) or not isMill(selectedPiece.position, 2)): #every piece is in a mill or selected piece is not in a mill
-                                        board[selectedPiece.position] = 0
-                                        selectedPiece.remove()
-                                        turn = turn % 2 + 1 #switch turns
-                                        if getPiecesRemaining(turn) < 3 or (piecesToPlay <= 1 and getPiecesRemaining(turn) > 3 and not canMove(turn)):
-                                            stage = 2 #game over
-                                        removePiece = False
-                                        removedPiece = True
-                                    else:
-                                        selectedPiece = 0
-                            else:
-                                if mouseRect.collidelist([i.rect for i in player1Group.sprites()]) != -1: #we're clicking a piece
-                                    selectedPiece = player1Group.sprites()[mouseRect.collidelist([i.rect for i in player1Group.sprites()])]
-                                    if (piecesToPlay > 0 and selectedPiece.position == -1) or (piecesToPlay == 0 and selectedPiece.position != -1):
-                                        selectedPiece.grabbed = True #grab the piece
-                                    else:
-                                        selectedPiece = 0
+                        if state.removing: #choose a piece to remove
+                            opponentGroup = playerGroups[state.turn % 2 + 1]
+                            if mouseRect.collidelist([i.rect for i in opponentGroup.sprites()]) != -1: #we're clicking a piece
+                                selectedPiece = opponentGroup.sprites()[mouseRect.collidelist([i.rect for i in opponentGroup.sprites()])]
+                                if selectedPiece.position != -1 and state.canRemove(selectedPiece.position): #every piece is in a mill or selected piece is not in a mill
+                                    board[selectedPiece.position] = 0
+                                    state.removePiece(selectedPiece.position)
+                                    selectedPiece.remove()
+                                    if state.isGameOver():
+                                        stage = 2 #game over
+                                    removedPiece = True
+                                else:
+                                    selectedPiece = 0
                         else:
-                            if removePiece: #choose a piece to remove
-                                if mouseRect.collidelist([i.rect for i in player1Group.sprites()]) != -1: #we're clicking a piece
-                                    selectedPiece = player1Group.sprites()[mouseRect.collidelist([i.rect for i in player1Group.sprites()])]
-                                    if selectedPiece.position != -1 and (allMills(1) or not isMill(selectedPiece.position, 1)): #every piece is in a mill or selected piece is not in a mill
-                                        board[selectedPiece.position] = 0
-                                        selectedPiece.remove()
-                                        turn = turn % 2 + 1 #switch turns
-                                        removePiece = False
-                                        removedPiece = True
-                                    else:
-                                        selectedPiece = 0
-                            else:
-                                if mouseRect.collidelist([i.rect for i in player2Group.sprites()]) != -1: #we're clicking a piece
-                                    selectedPiece = player2Group.sprites()[mouseRect.collidelist([i.rect for i in player2Group.sprites()])]
-                                    if (piecesToPlay > 0 and selectedPiece.position == -1) or (piecesToPlay == 0 and selectedPiece.position != -1):
-                                        selectedPiece.grabbed = True #grab the piece
-                                    else:
-                                        selectedPiece = 0
+                            playerGroup = playerGroups[state.turn]
+                            if mouseRect.collidelist([i.rect for i in playerGroup.sprites()]) != -1: #we're clicking a piece
+                                selectedPiece = playerGroup.sprites()[mouseRect.collidelist([i.rect for i in playerGroup.sprites()])]
+                                if (state.stage(state.turn) == 1) == (selectedPiece.position == -1): #place a new piece or move one on the board
+                                    selectedPiece.grabbed = True #grab the piece
+                                    selectedPiece.jumpTo(mousePos)
+                                else:
+                                    selectedPiece = 0
                     else: #you win, play again?
                         if mouseRect.colliderect(pygame.Rect((240, 225), (60, 40))): #yes
                             stage = 0
                             selectedPiece = 0
-                            turn = 1
-                            piecesToPlay = 18
-                            removePiece = False
                             removedPiece = False
-                            allspritesGroup.empty()
-                            for i in range(24):
+                            if aiFuture is not None:
+                                aiFuture.cancel()
+                                aiFuture = None
+                            aiWorker.stopPondering()
+                            state.reset()
+                            allspritesGroup.remove(player1Group.sprites(), player2Group.sprites())
+                            for i in range(len(board)):
                                 board[i] = 0
-                            player1Group.empty()
-                            for i in range(9):
-                                pieces[i] = Piece(1, 160 + (i * 50), 450) #player1
-                                pieces[i].add(player1Group)
-                            player2Group.empty()
-                            for i in range(9):
-                                pieces[i + 9] = Piece(2, 160 + (i * 50), 30) #player2
-                                pieces[i + 9].add(player2Group)
+                            setUpPieces()
                         elif mouseRect.colliderect(pygame.Rect((340, 225), (60, 40))): #no
                             return
                     mouseRect = 0
@@ -428,165 +418,90 @@ def main():
                         if removedPiece == False: #we didn't just remove a piece
                             selectedPiece.grabbed = False
                             targetPosition = selectedPiece.rect.collidelist(intersections)
-                            if targetPosition == -1 or board[targetPosition] != 0 or (piecesToPlay == 0 and getPiecesRemaining(turn) > 3 and not isLegalMove(selectedPiece.position, targetPosition)): #we didn't move to an intersection or intersection is full
+                            if targetPosition == -1 or not state.isLegal(selectedPiece.position, targetPosition): #we didn't move to an intersection or the move is illegal
                                 selectedPiece.jumpTo(selectedPiece.xyPrevious) #move the piece back
                             else:
                                 if selectedPiece.position != -1:
                                     board[selectedPiece.position] = 0 #clear previous board position
+                                state.makeMove(selectedPiece.position, targetPosition)
                                 board[targetPosition] = selectedPiece #set new board position
                                 selectedPiece.position = targetPosition
                                 selectedPiece.jumpTo(intersections[targetPosition].topleft) #move the piece
                                 selectedPiece.xyPrevious = selectedPiece.xy #reset previous position
-                                if isMill(targetPosition, turn): #we have a mill
-                                    removePiece = True
-                                else:
-                                    turn = turn % 2 + 1 #switch turns
-                                    if getPiecesRemaining(turn) < 3 or (piecesToPlay <= 1 and getPiecesRemaining(turn) > 3 and not canMove(turn)):
-                                        stage = 2 #game over
-                                piecesToPlay = max(0, piecesToPlay - 1)
+                                if state.isGameOver():
+                                    stage = 2 #game over
                         else:
                             removedPiece = False
                     mouseRect = 0
                     selectedPiece = 0
+            elif event.type == KEYDOWN and event.key == K_F3:
+                debugOverlay = not debugOverlay
             elif event.type == QUIT:
                 return
 
-        allspritesGroup.update()
-        
-        #draw board
-        baseSurface.blit(boardImg, (0, 0))
-                
-        #draw allsprites
-        allspritesGroup.draw(baseSurface)
-
-        if stage == 0:
-            menuSurface.fill((255, 255, 255))
-            if pygame.Rect(pygame.mouse.get_pos(), (1,1)).colliderect(pygame.Rect((240, 225), (60, 40))): #1
-                pygame.draw.rect(menuSurface, (180, 180, 180), pygame.Rect((40, 45), (60, 40)), 0)
-            elif pygame.Rect(pygame.mouse.get_pos(), (1,1)).colliderect(pygame.Rect((340, 225), (60, 40))): #2
-                pygame.draw.rect(menuSurface, (180, 180, 180), pygame.Rect((140, 45), (60, 40)), 0)
-            pygame.draw.rect(menuSurface, (10, 10, 10), pygame.Rect((40, 45), (60, 40)), 1)
-            pygame.draw.rect(menuSurface, (10, 10, 10), pygame.Rect((140, 45), (60, 40)), 1)
-            baseSurface.blit(menuSurface, (200, 180))
-            baseSurface.blit(font.render("How many players?", 1, (10, 10, 10)), (205, 190))
-            baseSurface.blit(font.render("1", 1, (10, 10, 10)), (265, 235))
-            baseSurface.blit(font.render("2", 1, (10, 10, 10)), (365, 235))
-        elif stage == 1:
-            if removePiece:
-                baseSurface.blit(font.render("Choose a piece to remove", 1, (10, 10, 10)), (30, 420))
-            #for i in range(24):
-            #    baseSurface.blit(font.render(str(getIntersectionValue(2,i)), 1, (10, 10, 10)), intersections[i].topleft)
-            baseSurface.blit(font.render(color[turn] + "'s turn", 1, (10, 10, 10)), (30, 400))
-        else:
-            menuSurface.fill((255, 255, 255))
-            if pygame.Rect(pygame.mouse.get_pos(), (1,1)).colliderect(pygame.Rect((240, 225), (60, 40))): #1
-                pygame.draw.rect(menuSurface, (180, 180, 180), pygame.Rect((40, 45), (60, 40)), 0)
-            elif pygame.Rect(pygame.mouse.get_pos(), (1,1)).colliderect(pygame.Rect((340, 225), (60, 40))): #2
-                pygame.draw.rect(menuSurface, (180, 180, 180), pygame.Rect((140, 45), (60, 40)), 0)
-            pygame.draw.rect(menuSurface, (10, 10, 10), pygame.Rect((40, 45), (60, 40)), 1)
-            pygame.draw.rect(menuSurface, (10, 10, 10), pygame.Rect((140, 45), (60, 40)), 1)
-            baseSurface.blit(menuSurface, (200, 180))
-            baseSurface.blit(font.render(color[turn % 2 + 1] + " wins!", 1, (10, 10, 10)), (30, 220))
-            baseSurface.blit(font.render("Play again?", 1, (10, 10, 10)), (250, 190))
-            baseSurface.blit(font.render("YES", 1, (10, 10, 10)), (245, 235))
-            baseSurface.blit(font.render("NO", 1, (10, 10, 10)), (355, 235))
-        pygame.display.flip()
-
-pygame.init()
-
-if not pygame.font: print 'Warning, fonts disabled'
-
-window = pygame.display.set_mode((640,480)) #initialize window to display
-pygame.display.set_caption('Nine Mens Morris')
-
-pygame.mouse.set_visible(1)
-
-baseSurface = pygame.display.get_surface()
-menuSurface = pygame.Surface((240, 100))
-menuSurface.set_alpha(127)
-menuSurface.fill((255, 255, 255))
-
-font = pygame.font.Font(None, 36) #new font object
-
-boardImg = load_image('board.bmp')
-boardImg.convert()
-boardImg.set_colorkey(0, RLEACCEL)
+        steps = 0
+        while animationTime >= ANIMATION_STEP and steps < MAX_ANIMATION_STEPS:
+            allspritesGroup.update()
+            animationTime -= ANIMATION_STEP
+            steps += 1
+        if steps == MAX_ANIMATION_STEPS:
+            animationTime = 0.0
+
+        #show the menu and text of the stage, only changes are redrawn
+        for labelStage, labels in enumerate(stageLabels):
+            for label in labels:
+                label.show(labelStage == stage)
+        menu.show(stage != 1)
+        if stage != 1:
+            hoverRect = pygame.Rect(mousePos, (1,1))
+            if hoverRect.colliderect(pygame.Rect((240, 225), (60, 40))): #1
+                menu.setHighlight(1)
+            elif hoverRect.colliderect(pygame.Rect((340, 225), (60, 40))): #2
+                menu.setHighlight(2)
+            else:
+                menu.setHighlight(0)
+        if stage == 1:
+            turnLabel.setText(color[state.turn] + "'s turn")
+        elif stage == 2:
+            winnerLabel.setText(color[state.winner()] + " wins!")
+        removeLabel.show(stage == 1 and state.removing)
+
+        #debug overlay, the greedy AI's value of each intersection for player 2
+        now = pygame.time.get_ticks()
+        if now - fpsTime >= 1000:
+            fps = frames * 1000.0 / (now - fpsTime)
+            frames = 0
+            fpsTime = now
+        for label, text in zip(debugLabels, [aiText, speedText, '%.0f fps' % fps]):
+            label.show(debugOverlay)
+            if debugOverlay:
+                label.setText(text)
+        for i, label in enumerate(valueLabels):
+            label.show(debugOverlay and stage == 1)
+            if debugOverlay and stage == 1:
+                label.setText(str(getIntersectionValue(2, i)))
+
+        #draw allsprites over the board where something changed
+        with profiling.section('frame render'):
+            if DIRTY_RENDERING:
+                pygame.display.update(allspritesGroup.draw(baseSurface))
+            else:
+                allspritesGroup.repaint_rect(baseSurface.get_rect())
+                allspritesGroup.draw(baseSurface)
+                pygame.display.flip()
+        drawn = True
+        frames += 1
 
-pieceImg = [0, load_image('blue.bmp', -1), load_image('red.bmp', -1)]
 color = [0, 'Blue', 'Red']
+pieceImages = [0, 'blue.bmp', 'red.bmp'] #image of each player's pieces
+assetManager = assets.AssetManager(ASSET_DIRECTORY) #loads images when they are first drawn
+
+state = engine.Position(variants.getVariant(VARIANT)) #the game state
+board = [0] * state.variant.size #the Piece on each intersection
+useSearch = AI_SEARCH or state.variant is not engine.STANDARD #the greedy AI only plays the standard game
 
-board = [0] * 24
-
-allspritesGroup = pygame.sprite.Group()
-player1Group = pygame.sprite.Group()
-player2Group = pygame.sprite.Group()
-selectedGroup = pygame.sprite.Group()
-
-pieces = [0] * 18
-for i in range(9):
-    pieces[i] = Piece(1, 160 + (i * 50), 450) #player1
-    pieces[i].add(player1Group)
-for i in range(9):
-    pieces[i + 9] = Piece(2, 160 + (i * 50), 30) #player2
-    pieces[i + 9].add(player2Group)
-
-#lists of mills that can be made
-mills = [[[1, 2], [6, 7]], #0
-        [[0, 2], [9, 17]], #1
-        [[0, 1], [3, 4]], #2
-        [[2, 4], [11, 19]], #3
-        [[2, 3], [5, 6]], #4
-        [[4, 6], [13, 21]], #5
-        [[4, 5], [7, 0]], #6
-        [[6, 0], [15, 23]], #7
-
-        [[9, 10], [14, 15]], #8
-        [[8, 10], [1, 17]], #9
-        [[8, 9], [11, 12]], #10
-        [[10, 12], [3, 19]], #11
-        [[10, 11], [13, 14]], #12
-        [[12, 14], [5, 21]], #13
-        [[12, 13], [15, 8]], #14
-        [[14, 8], [7, 23]], #15
-
-        [[17, 18], [22, 23]], #16
-        [[16, 18], [1, 9]], #17
-        [[16, 17], [19, 20]], #18
-        [[18, 20], [3, 11]], #19
-        [[18, 19], [21, 22]], #20
-        [[20, 22], [5, 13]], #21
-        [[20, 21], [23, 16]], #22
-        [[22, 16], [7, 15]]] #23
-
-neighbors = [[7, 1], #0
-             [0, 2, 9], #1
-             [1, 3], #2
-             [2, 4, 11], #3
-             [3, 5], #4
-             [4, 6, 13], #5
-             [5, 7], #6
-             [6, 0, 15], #7
-
-             [15, 9], #8
-             [8, 10, 1, 17], #9
-             [9, 11], #10
-             [10, 12, 3, 19], #11
-             [11, 13], #12
-             [12, 14, 5, 21], #13
-             [13, 15], #14
-             [14, 8, 7, 23], #15
-
-             [23, 17], #16
-             [16, 18, 9], #17
-             [17, 19], #18
-             [18, 20, 11], #19
-             [19, 21], #20
-             [20, 22, 13], #21
-             [21, 23], #22
-             [22, 16, 15]] #23
-
-#coordinates of intersections
-intersections = [pygame.Rect((213, 84), (1, 1)),
+#coordinates of the intersections of the standard board image
+standardIntersections = [pygame.Rect((213, 84), (1, 1)),
                 pygame.Rect((364, 84), (1, 1)),
                 pygame.Rect((510, 84), (1, 1)),
                 pygame.Rect((510, 230), (1, 1)),
@@ -612,6 +527,71 @@ intersections = [pygame.Rect((213, 84), (1, 1)),
                 pygame.Rect((362, 280), (1, 1)),
                 pygame.Rect((313, 280), (1, 1)),
                 pygame.Rect((313, 230), (1, 1))]
-
-clock = pygame.time.Clock()
-main()
+intersections = makeIntersections(state.variant)
+
+#the window, sprites and AI are only made when run, so the module can be
+#imported without a display
+if __name__ == '__main__':
+    pygame.init()
+
+    if not pygame.font: print 'Warning, fonts disabled'
+
+    window = pygame.display.set_mode((640,480)) #initialize window to display
+    pygame.display.set_caption(state.variant.name)
+
+    pygame.mouse.set_visible(1)
+
+    baseSurface = pygame.display.get_surface()
+
+    boardImg = assetManager.image('board.bmp', 0)
+    backgroundImg = pygame.Surface(baseSurface.get_size()).convert() #what is under the sprites
+    backgroundImg.blit(boardImg, (0, 0))
+    if state.variant is not engine.STANDARD:
+        drawBoard(backgroundImg, state.variant)
+
+    allspritesGroup = pygame.sprite.LayeredDirty()
+    allspritesGroup.clear(baseSurface, backgroundImg)
+    player1Group = pygame.sprite.Group()
+    player2Group = pygame.sprite.Group()
+    playerGroups = [0, player1Group, player2Group]
+    selectedGroup = pygame.sprite.Group()
+
+    pieces = [0] * (2 * state.variant.pieces)
+    setUpPieces()
+
+    menu = Menu()
+    turnLabel = Label("Blue's turn", (30, 400))
+    removeLabel = Label("Choose a piece to remove", (30, 420))
+    winnerLabel = Label("Blue wins!", (30, 220))
+    stageLabels = [[Label("How many players?", (205, 190)), Label("1", (265, 235)), Label("2", (365, 235))], #labels of each stage
+                   [turnLabel],
+                   [winnerLabel, Label("Play again?", (250, 190)), Label("YES", (245, 235)), Label("NO", (355, 235))]]
+    debugLabels = [Label('', (5, 60 + 20 * i), DEBUG_FONT_SIZE, False) for i in range(3)] #AI time, AI speed and frame rate
+    valueLabels = [] #the greedy AI's values are only for the standard game
+    if state.variant is engine.STANDARD:
+        valueLabels = [Label('', r.topleft, DEBUG_FONT_SIZE) for r in intersections]
+
+    baseSurface.blit(backgroundImg, (0, 0)) #the sprites are drawn over it as they change
+    pygame.display.flip()
+
+    if state.variant is not engine.STANDARD: #the search, tables and book are only for the standard game
+        aiWorker = aiworker.AIWorker(mcts.MctsSearcher(AI_TIME_LIMIT))
+    elif AI_MCTS:
+        aiWorker = aiworker.AIWorker(mcts.MctsSearcher(AI_TIME_LIMIT), book.OpeningBook(BOOK_PATH)) #keeps its tree, pondering grows the part the next search starts from
+    else:
+        searcher = search.Searcher(AI_TIME_LIMIT, _endgame=endgame.EndgameDatabase(ENDGAME_DIRECTORY),
+                                   _wdl=wdl.WdlDatabase(WDL_DIRECTORY), _weights=evaluation.loadWeights(WEIGHTS_PATH))
+        aiWorker = aiworker.AIWorker(searcher, book.OpeningBook(BOOK_PATH))
+
+    clock = pygame.time.Clock()
+    profiler = None
+    if PROFILE_MODE is not None:
+        profiler = profiling.Profiler(PROFILE_MODE)
+        profiler.start([(sys.modules[__name__], 'calcBestMove', lambda: 'calcBestMove stage %d' % state.stage(2))])
+    try:
+        main()
+    finally:
+        if profiler is not None:
+            profiler.stop()
+            profiler.save(PROFILE_PATH or profiling.defaultPath(PROFILE_MODE))
+            print profiler.report()
@@ -0,0 +1,134 @@
+#!/usr/bin/python
+
+#aiworker module
+#runs the search AI in a background thread so the game loop keeps drawing while
+#it thinks. Requests return a MoveFuture that the game loop polls each frame.
+#While the human thinks the worker can ponder on their position, which fills
+#the transposition table for the search that follows their move.
+
+import threading, Queue
+
+PONDER_TIME_LIMIT = 5.0 #pondering stops after this long so a game left waiting goes back to using no CPU
+
+#MoveFuture class is the result of a move request that may not be ready yet
+class MoveFuture(object):
+    #__init__ method
+    #@param _position a copy of the Position to search
+    #@param _timeLimit the seconds to search or None for the searcher's limit
+    #@param _callback a function called with the future when it is done or None
+    def __init__(self, _position, _timeLimit=None, _callback=None):
+        self.position = _position
+        self.timeLimit = _timeLimit
+        self.callback = _callback
+        self.stopEvent = threading.Event() #set to cancel the search
+        self.finished = threading.Event()
+        self.move = None
+        self.error = None #exception raised by the search
+        self.fromBook = False #the move came from the opening book
+        self.nodes = 0 #nodes searched
+        self.depth = 0 #deepest iteration completed
+        self.elapsed = 0.0 #seconds searched
+
+    #cancel method
+    #stops the search as soon as possible, the result will be None or the best move so far
+    def cancel(self):
+        self.stopEvent.set()
+
+    #cancelled method
+    #@return true if cancel has been called
+    def cancelled(self):
+        return self.stopEvent.is_set()
+
+    #done method
+    #@return true if the result is ready
+    def done(self):
+        return self.finished.is_set()
+
+    #result method
+    #@param _timeout the most seconds to wait or None to wait until it is ready
+    #@return the compound move found, or None if there are no moves, the search
+    #was cancelled before it started or the wait timed out
+    def result(self, _timeout=None):
+        self.finished.wait(_timeout)
+        if self.error is not None:
+            raise self.error
+        return self.move
+
+    #setResult method
+    #@param _move the compound move found
+    #@param _error the exception raised by the search or None
+    def setResult(self, _move, _error=None):
+        self.move = _move
+        self.error = _error
+        self.finished.set()
+        if self.callback is not None:
+            self.callback(self)
+
+#AIWorker class owns a Searcher and runs its searches one at a time in a daemon thread
+class AIWorker(object):
+    #__init__ method
+    #@param _searcher the search.Searcher, only used by the worker thread from now on
+    #@param _book the book.OpeningBook to answer from before searching or None
+    def __init__(self, _searcher, _book=None):
+        self.searcher = _searcher
+        self.book = _book
+        self.jobs = Queue.Queue()
+        self.pondering = None #MoveFuture of the ponder search
+        self.thread = threading.Thread(target=self.run, name='AIWorker')
+        self.thread.daemon = True
+        self.thread.start()
+
+    #request method
+    #stops any pondering and starts a search for the best move
+    #@param _position the Position, it is copied
+    #@param _timeLimit the seconds to search or None for the searcher's limit
+    #@param _callback a function called with the MoveFuture when it is done,
+    #from the worker thread, or None
+    #@return a MoveFuture for the move
+    def request(self, _position, _timeLimit=None, _callback=None):
+        self.stopPondering()
+        future = MoveFuture(_position.copy(), _timeLimit, _callback)
+        move = None
+        if self.book is not None:
+            move = self.book.lookup(_position)
+        if move is not None:
+            future.fromBook = True
+            future.setResult(move)
+        else:
+            self.jobs.put(future)
+        return future
+
+    #ponder method
+    #searches _position until stopped or for PONDER_TIME_LIMIT, does nothing if
+    #it is already pondering or has pondered _position
+    #@param _position the Position the opponent of the AI is thinking about
+    def ponder(self, _position):
+        if self.pondering is not None and self.pondering.position.hash == _position.hash:
+            return
+        self.stopPondering()
+        self.pondering = MoveFuture(_position.copy(), PONDER_TIME_LIMIT)
+        self.jobs.put(self.pondering)
+
+    #stopPondering method
+    def stopPondering(self):
+        if self.pondering is not None:
+            self.pondering.cancel()
+            self.pondering = None
+
+    #run method
+    #the worker thread, searches the requests in order
+    def run(self):
+        while True:
+            future = self.jobs.get()
+            if future.cancelled():
+                future.setResult(None)
+                continue
+            try:
+                move = self.searcher.findMove(future.position, future.timeLimit, future.stopEvent)
+            except Exception, e:
+                future.setResult(None, e)
+            else:
+                future.nodes = self.searcher.nodes
+                future.depth = self.searcher.depth
+                future.elapsed = self.searcher.elapsed
+                future.setResult(move)
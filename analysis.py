@@ -0,0 +1,288 @@
+#!/usr/bin/python
+
+#analysis module
+#analyses positions offline without the GUI: the best move, score and principal
+#variation found by the search, the move the original greedy AI would make, the
+#opening book's move and what the endgame and wdl tables say about the position
+#positions are read from a file of positions in the form of perft, one a line,
+#or from the games of a game record file, and are analysed across all cores
+#with each result written as a JSON line or CSV row as soon as it is done
+
+import sys, os, time, csv, json, random, itertools
+from optparse import OptionParser
+from multiprocessing import Pool, cpu_count
+import engine
+import search
+import evaluation
+import greedy
+import endgame
+import wdl
+import book
+from transposition import TranspositionTable
+from perft import parsePosition, formatPosition
+from gamerecord import readGames, formatMove
+
+DEFAULT_TIME_LIMIT = 1.0 #seconds searched for each position
+DEFAULT_HASH_MB = 16
+FORMATS = ('jsonl', 'csv')
+
+#fields of a result in the order of the CSV columns
+FIELDS = ['id', 'position', 'played', 'moves', 'best', 'score', 'depth', 'nodes', 'elapsed', 'pv',
+          'greedy', 'book', 'solved', 'result', 'distance', 'error']
+
+#Analyzer class analyses positions with a search and the solved tables
+class Analyzer(object):
+    #__init__ method
+    #@param _timeLimit the seconds to search each position
+    #@param _maxDepth the deepest iteration to search
+    #@param _hashMB the size of the transposition table in megabytes
+    #@param _book the opening book file or None
+    #@param _endgame the endgame table directory or None
+    #@param _wdl the wdl table directory or None
+    #@param _weights the evaluation weights file or None for the hand-tuned weights
+    def __init__(self, _timeLimit=DEFAULT_TIME_LIMIT, _maxDepth=search.MAX_DEPTH, _hashMB=DEFAULT_HASH_MB,
+                 _book=None, _endgame=None, _wdl=None, _weights=None):
+        self.endgame = endgame.EndgameDatabase(_endgame) if _endgame is not None else None
+        self.wdl = wdl.WdlDatabase(_wdl) if _wdl is not None else None
+        self.searcher = search.Searcher(_timeLimit, _maxDepth, TranspositionTable(_hashMB), self.endgame, self.wdl,
+                                        evaluation.loadWeights(_weights))
+        self.book = book.OpeningBook(_book)
+
+    #greedyMove method
+    #the move of the original AI, with its ties broken by a generator seeded by
+    #the position so the same position always gets the same move
+    #@param _position the Position, it is not changed
+    #@return the greedy AI's compound move
+    def greedyMove(self, _position):
+        position = _position.copy()
+        player = position.turn
+        rng = random.Random(position.hash)
+        f, t = greedy.bestMove(position, player, rng)
+        r = -1
+        if position.makeMove(f, t):
+            r = greedy.pieceToRemove(position, player, rng)
+        return (f, t, r)
+
+    #solved method
+    #@param _position the Position
+    #@return a tuple (source, result, distance) where source is 'rules' for a
+    #finished game, 'endgame' or 'wdl' for the tables that hold the position or
+    #None, result is 1, 0 or -1 for the player to move and distance is the moves
+    #to the end if it is known
+    def solved(self, _position):
+        if _position.isGameOver():
+            winner = _position.winner()
+            return ('rules', 0 if winner == 0 else (1 if winner == _position.turn else -1), 0)
+        if self.endgame is not None:
+            value = self.endgame.probe(_position)
+            if value is not None:
+                result, moves = endgame.decodeValue(value)
+                return ('endgame', result, moves if result else None)
+        if self.wdl is not None:
+            result = self.wdl.probe(_position)
+            if result is not None:
+                return ('wdl', result, None)
+        return (None, None, None)
+
+    #analyze method
+    #@param _position the Position, it is not changed
+    #@return a dictionary of the results, with the fields of FIELDS other than
+    #id, played and error, moves are in text notation
+    def analyze(self, _position):
+        moves = _position.getCompoundMoves() if not _position.isGameOver() else []
+        source, result, distance = self.solved(_position)
+        analysis = {'position': formatPosition(_position), 'moves': len(moves), 'best': None, 'score': None,
+                    'depth': 0, 'nodes': 0, 'elapsed': 0.0, 'pv': [], 'greedy': None, 'book': None,
+                    'solved': source, 'result': result, 'distance': distance}
+        if not moves:
+            return analysis
+        best = self.searcher.findMove(_position)
+        bookMove = self.book.lookup(_position)
+        analysis.update({'best': formatMove(best), 'score': self.searcher.score, 'depth': self.searcher.depth,
+                         'nodes': self.searcher.nodes, 'elapsed': round(self.searcher.elapsed, 4),
+                         'pv': [formatMove(m) for m in self.searcher.pv], 'greedy': formatMove(self.greedyMove(_position)),
+                         'book': formatMove(bookMove) if bookMove is not None else None})
+        return analysis
+
+_analyzers = {} #Analyzers made in this process by settings
+
+#analyzeTask function
+#runs in a worker process
+#@param _task a tuple (id, position text, played move text or None, error or
+#None, settings) where settings are the arguments of Analyzer and a task with an
+#error is reported without being analysed
+#@return the dictionary of the results with id and played added, or with error
+#set if the position couldn't be analysed
+def analyzeTask(_task):
+    taskId, text, played, error, settings = _task
+    try:
+        if error is not None:
+            raise ValueError(error)
+        analyzer = _analyzers.get(settings)
+        if analyzer is None:
+            analyzer = _analyzers[settings] = Analyzer(*settings)
+        analysis = analyzer.analyze(parsePosition(text))
+        analysis['error'] = None
+    except Exception, e: #the rest of the batch still gets analysed
+        analysis = {'position': text, 'error': str(e)}
+    analysis['id'] = taskId
+    analysis['played'] = played
+    return analysis
+
+#positionTasks function
+#@param _path a file of positions in the form of perft, one a line, blank lines
+#and lines starting with # are skipped
+#@return a generator of (id, position text, None, None) where id is the line number
+def positionTasks(_path):
+    f = open(_path)
+    try:
+        for number, line in enumerate(f):
+            line = line.strip()
+            if line and not line.startswith('#'):
+                yield (str(number + 1), line, None, None)
+    finally:
+        f.close()
+
+#gameTasks function
+#@param _path a game record file
+#@param _every how many plies apart the positions analysed are, 1 for every position
+#@param _skip the plies at the start of each game not analysed
+#@return a generator of (id, position text, played move text, None) for the
+#positions before the moves of the games where id is game:ply, counted from 1,
+#and for the final positions where played is None
+#a game that can't be replayed ends with (id, position text or None, None,
+#error) for the ply it fails at, and a game of another variant than the
+#standard game is only reported with an error
+def gameTasks(_path, _every=1, _skip=0):
+    for number, game in enumerate(readGames(_path)):
+        ply = 0
+        position = None
+        try:
+            variant = game.startPosition().variant
+            if variant is not engine.STANDARD:
+                yield ('%d:1' % (number + 1), None, None, 'not analysed, the game is ' + variant.name)
+                continue
+            for position, move in game.positions():
+                if ply >= _skip and (ply - _skip) % _every == 0:
+                    yield ('%d:%d' % (number + 1, ply + 1), formatPosition(position), formatMove(move), None)
+                ply += 1
+            yield ('%d:%d' % (number + 1, ply + 1), formatPosition(game.replay()), None, None)
+        except ValueError, e: #the position before the failing move is kept for the report
+            text = formatPosition(position) if position is not None else None
+            yield ('%d:%d' % (number + 1, ply + 1), text, None, 'replay failed: %s' % e)
+
+#analyzePositions function
+#@param _tasks an iterable of (id, position text, played move text or None, error or None)
+#@param _processes the number of worker processes, 1 to analyse in this process
+#@param _settings a tuple of the arguments of Analyzer
+#@return a generator of the dictionaries of the results in the order they finish
+def analyzePositions(_tasks, _processes=cpu_count(), _settings=()):
+    tasks = itertools.imap(lambda task: task + (tuple(_settings),), _tasks)
+    if _processes <= 1:
+        for analysis in itertools.imap(analyzeTask, tasks):
+            yield analysis
+        return
+    pool = Pool(_processes)
+    try:
+        for analysis in pool.imap_unordered(analyzeTask, tasks):
+            yield analysis
+    finally:
+        pool.terminate()
+
+#JsonWriter class writes results as JSON lines
+class JsonWriter(object):
+    #__init__ method
+    #@param _file the file to write to
+    def __init__(self, _file):
+        self.file = _file
+
+    #write method
+    #@param _analysis the dictionary of the results
+    def write(self, _analysis):
+        self.file.write(json.dumps(dict([(k, _analysis.get(k)) for k in FIELDS]), sort_keys=True) + '\n')
+        self.file.flush()
+
+#CsvWriter class writes results as CSV rows under a header of FIELDS
+class CsvWriter(object):
+    #__init__ method
+    #@param _file the file to write to
+    def __init__(self, _file):
+        self.file = _file
+        self.writer = csv.writer(_file)
+        self.writer.writerow(FIELDS)
+
+    #write method
+    #@param _analysis the dictionary of the results, the principal variation is
+    #written as moves separated by spaces
+    def write(self, _analysis):
+        row = []
+        for k in FIELDS:
+            value = _analysis.get(k)
+            if isinstance(value, list):
+                value = ' '.join(value)
+            row.append('' if value is None else value)
+        self.writer.writerow(row)
+        self.file.flush()
+
+def main():
+    parser = OptionParser(usage='usage: %prog [options] FILE\n\n'
+                          'FILE holds positions in the form of perft.py, one a line, or is a game\n'
+                          'record file with --games')
+    parser.add_option('-g', '--games', action='store_true', default=False,
+                      help='FILE is a game record file, the positions of its games are analysed')
+    parser.add_option('-e', '--every', type='int', default=1,
+                      help='with --games, analyse every N-th position of each game [default: %default]')
+    parser.add_option('-s', '--skip', type='int', default=0,
+                      help='with --games, plies at the start of each game not analysed [default: %default]')
+    parser.add_option('-t', '--time', type='float', default=DEFAULT_TIME_LIMIT,
+                      help='seconds to search each position [default: %default]')
+    parser.add_option('-d', '--depth', type='int', default=search.MAX_DEPTH,
+                      help='deepest iteration to search [default: %default]')
+    parser.add_option('-H', '--hash', type='int', default=DEFAULT_HASH_MB,
+                      help='transposition table megabytes in each process [default: %default]')
+    parser.add_option('-p', '--processes', type='int', default=cpu_count(),
+                      help='worker processes [default: %default]')
+    parser.add_option('-b', '--book', default=book.DEFAULT_PATH,
+                      help='opening book file [default: %default]')
+    parser.add_option('--endgame', default=endgame.DEFAULT_DIRECTORY,
+                      help='endgame table directory [default: %default]')
+    parser.add_option('--wdl', default=wdl.DEFAULT_DIRECTORY,
+                      help='wdl table directory [default: %default]')
+    parser.add_option('--weights', metavar='FILE',
+                      help='evaluation weights file made by learn.py [default: the hand-tuned weights]')
+    parser.add_option('-f', '--format', default='jsonl', choices=FORMATS,
+                      help='jsonl or csv [default: %default]')
+    parser.add_option('-o', '--output', metavar='FILE',
+                      help='file to write the results to [default: standard output]')
+    options, args = parser.parse_args()
+    if len(args) != 1:
+        parser.error('give one file')
+    if options.every < 1 or options.skip < 0:
+        parser.error('--every must be at least 1 and --skip at least 0')
+    if options.weights is not None and not os.path.exists(options.weights):
+        parser.error('no weights file ' + options.weights)
+    if options.games:
+        tasks = gameTasks(args[0], options.every, options.skip)
+    else:
+        tasks = positionTasks(args[0])
+    settings = (options.time, options.depth, options.hash, options.book, options.endgame, options.wdl, options.weights)
+    output = open(options.output, 'wb' if options.format == 'csv' else 'w') if options.output else sys.stdout
+    writer = CsvWriter(output) if options.format == 'csv' else JsonWriter(output)
+    start = time.time()
+    count = 0
+    errors = 0
+    try:
+        for analysis in analyzePositions(tasks, options.processes, settings):
+            writer.write(analysis)
+            count += 1
+            if analysis['error'] is not None:
+                errors += 1
+    finally:
+        if output is not sys.stdout:
+            output.close()
+    seconds = time.time() - start
+    print >>sys.stderr, '%d positions, %d errors in %.1fs, %.2f positions/s' % (count, errors, seconds,
+                                                                             count / max(seconds, 1e-9))
+
+if __name__ == '__main__':
+    main()
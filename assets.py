@@ -0,0 +1,173 @@
+#!/usr/bin/python
+
+#assets module
+#loads the GUI's images and fonts on first use and keeps them, so only what a
+#screen shows is ever loaded
+#images can also come from a bundle, one file made by the pack command that
+#holds every image of a directory as raw pixels, read through mmap so starting
+#up decodes no image files
+#a bundle is a header, an index entry for each image (name, width, height,
+#offset and size of its pixels) and the pixels as RGB rows
+
+import os, mmap, struct
+from optparse import OptionParser
+import pygame
+
+MAGIC = 'NMMAS1'
+HEADER = struct.Struct('<6sI') #magic, images
+ENTRY = struct.Struct('<32sHHII') #name, width, height, offset, size
+IMAGE_EXTENSIONS = ('.bmp', '.png', '.gif', '.jpg', '.tga')
+DEFAULT_BUNDLE = 'assets.bin' #name of the bundle in the asset directory
+
+#AssetBundle class reads the images of a bundle
+class AssetBundle(object):
+    #__init__ method
+    #@param _path the bundle file
+    def __init__(self, _path):
+        f = open(_path, 'rb')
+        try:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        finally:
+            f.close()
+        magic, count = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC:
+            raise IOError('bad asset bundle ' + _path)
+        self.entries = {} #name to (width, height, offset, size)
+        for i in range(count):
+            name, width, height, offset, size = ENTRY.unpack_from(self.data, HEADER.size + i * ENTRY.size)
+            if offset + size > len(self.data):
+                raise IOError('bad asset bundle ' + _path)
+            self.entries[name.rstrip('\0')] = (width, height, offset, size)
+
+    #image method
+    #@param _name the file name the image was packed from
+    #@return a new surface of the image or None if it is not in the bundle
+    def image(self, _name):
+        entry = self.entries.get(_name)
+        if entry is None:
+            return None
+        width, height, offset, size = entry
+        return pygame.image.fromstring(self.data[offset:offset + size], (width, height), 'RGB')
+
+#AssetManager class loads and caches the images and fonts of the GUI
+class AssetManager(object):
+    #__init__ method
+    #@param _directory the directory of the image files
+    #@param _bundlePath a bundle to read images from first, or None to look for
+    #DEFAULT_BUNDLE in _directory
+    def __init__(self, _directory, _bundlePath=None):
+        self.directory = _directory
+        if _bundlePath is None:
+            _bundlePath = os.path.join(_directory, DEFAULT_BUNDLE)
+        self.bundlePath = _bundlePath
+        self.bundle = None #opened on the first image
+        self.images = {} #(name, colorkey) to the converted surface
+        self.fonts = {} #(name, size) to the font
+        self.texts = {} #(text, size, color) to the rendered surface
+
+    #loadImage method
+    #@param _name the image file name
+    #@return a new surface of the image, from the bundle if it has it
+    def loadImage(self, _name):
+        if self.bundle is None and os.path.exists(self.bundlePath):
+            self.bundle = AssetBundle(self.bundlePath)
+        if self.bundle is not None:
+            image = self.bundle.image(_name)
+            if image is not None:
+                return image
+        return pygame.image.load(os.path.join(self.directory, _name))
+
+    #image method
+    #needs the display to be set up, the surface is converted to its format
+    #@param _name the image file name
+    #@param _colorkey the transparent color, -1 for the color of the top left
+    #pixel or None for no transparency
+    #@return the surface, loaded once
+    def image(self, _name, _colorkey=None):
+        key = (_name, _colorkey)
+        image = self.images.get(key)
+        if image is None:
+            try:
+                image = self.loadImage(_name).convert() #convert pixel format
+            except pygame.error, message:
+                print 'Cannot load image:', _name
+                raise SystemExit, message
+            if _colorkey is not None:
+                if _colorkey == -1:
+                    _colorkey = image.get_at((0,0))
+                image.set_colorkey(_colorkey, pygame.RLEACCEL) #the transparent color
+            self.images[key] = image
+        return image
+
+    #font method
+    #@param _name the font file or None for the default font
+    #@param _size the size
+    #@return the font, made once
+    def font(self, _name, _size):
+        key = (_name, _size)
+        font = self.fonts.get(key)
+        if font is None:
+            font = pygame.font.Font(_name, _size)
+            self.fonts[key] = font
+        return font
+
+    #text method
+    #@param _text the text
+    #@param _size the size of the default font
+    #@param _color the color
+    #@return the surface of _text, rendered once
+    def text(self, _text, _size, _color):
+        key = (_text, _size, _color)
+        image = self.texts.get(key)
+        if image is None:
+            image = self.font(None, _size).render(_text, 1, _color)
+            self.texts[key] = image
+        return image
+
+#pack function
+#@param _directory the directory of the image files
+#@param _path the bundle file to write
+#@return the names of the images packed
+def pack(_directory, _path):
+    names = sorted([n for n in os.listdir(_directory) if os.path.splitext(n)[1].lower() in IMAGE_EXTENSIONS])
+    images = []
+    for name in names:
+        if len(name) > 32:
+            raise ValueError('image name too long for a bundle: ' + name)
+        image = pygame.image.load(os.path.join(_directory, name))
+        images.append((name, image.get_size(), pygame.image.tostring(image, 'RGB')))
+    offset = HEADER.size + len(images) * ENTRY.size
+    index = []
+    for name, (width, height), pixels in images:
+        index.append(ENTRY.pack(name, width, height, offset, len(pixels)))
+        offset += len(pixels)
+    temporary = _path + '.tmp'
+    f = open(temporary, 'wb')
+    try:
+        f.write(HEADER.pack(MAGIC, len(images)))
+        f.write(''.join(index))
+        for name, size, pixels in images:
+            f.write(pixels)
+    finally:
+        f.close()
+    if os.path.exists(_path): #rename doesn't replace a file on Windows
+        os.remove(_path)
+    os.rename(temporary, _path)
+    return names
+
+def main():
+    parser = OptionParser(usage='usage: %prog [options] pack\n\n'
+                          'packs the images of the asset directory into one bundle file')
+    parser.add_option('-d', '--directory', default='data',
+                      help='directory of the images [default: %default]')
+    parser.add_option('-o', '--output',
+                      help='bundle file to write [default: %s in the directory]' % DEFAULT_BUNDLE)
+    options, args = parser.parse_args()
+    if args != ['pack']:
+        parser.error('unknown command')
+    output = options.output or os.path.join(options.directory, DEFAULT_BUNDLE)
+    names = pack(options.directory, output)
+    print 'packed %d images into %s: %s' % (len(names), output, ', '.join(names))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,168 @@
+#!/usr/bin/python
+
+#batcheval module
+#the evaluation of the evaluation module for many positions at once with numpy,
+#for labelling and analysing large sets of positions
+#positions are given as arrays of the masks of the player to move and of the
+#other player and the features are worked out on the masks with byte tables:
+#the count of a player's pieces on each mill line is packed 2 bits a line into
+#one integer and the count of a player's pieces next to each intersection 4 bits
+#an intersection into three, so each feature takes a few table lookups and bit
+#operations on whole arrays
+
+import sys, time
+import numpy
+from engine import millLines, neighbors
+from evaluation import WEIGHTS
+
+CHUNK_SIZE = 8192 #positions evaluated in each pass, small enough to stay in the cache
+
+#_popCount[v] is the number of bits set in the 16 bit value v
+_popCount = numpy.array([bin(v).count('1') for v in range(1 << 16)], dtype=numpy.int8)
+
+#_lineCounts[k][b] holds, 2 bits for each mill line l at bit 2 * l, how many of
+#the intersections 8 * k to 8 * k + 7 on line l are set in byte b
+_lineCounts = numpy.zeros((3, 256), dtype=numpy.int64)
+for k in range(3):
+    for b in range(256):
+        for l, line in enumerate(millLines):
+            _lineCounts[k][b] += sum([1 for p in line if p // 8 == k and (b >> p % 8) & 1]) << 2 * l
+
+#_neighborCounts[k][j][b] holds, 4 bits for each intersection q of 8 * j to
+#8 * j + 7 at bit 4 * (q - 8 * j), how many of the neighbors of q among the
+#intersections 8 * k to 8 * k + 7 are set in byte b
+_neighborCounts = numpy.zeros((3, 3, 256), dtype=numpy.int64)
+for k in range(3):
+    for j in range(3):
+        for b in range(256):
+            for q in range(8 * j, 8 * j + 8):
+                count = sum([1 for p in neighbors[q] if p // 8 == k and (b >> p % 8) & 1])
+                _neighborCounts[k][j][b] += count << 4 * (q - 8 * j)
+
+#_nibbleMasks[b] has the 4 bits 4 * i to 4 * i + 3 set for each bit i set in byte b
+_nibbleMasks = numpy.array([sum([15 << 4 * i for i in range(8) if (b >> i) & 1]) for b in range(256)], dtype=numpy.int64)
+
+LINE_LOW_BITS = sum([1 << 2 * l for l in range(len(millLines))]) #the low bit of each line's count
+NIBBLE_LOW_BYTES = 0x0F0F0F0F
+
+_placeValues = numpy.array([1 << p for p in range(24)], dtype=numpy.int64)
+_defaultWeights = numpy.array(WEIGHTS, dtype=numpy.int32)
+
+#popCount function
+#@param _values an array of 32 bit values
+#@return an array of the number of bits set in each
+def popCount(_values):
+    return _popCount[_values & 0xFFFF] + _popCount[_values >> 16]
+
+#lineCounts function
+#@param _bytes a list of the three arrays of the bytes of N masks
+#@return an array of the counts of each mask's pieces on each mill line, packed
+#as in _lineCounts
+def lineCounts(_bytes):
+    return _lineCounts[0][_bytes[0]] + _lineCounts[1][_bytes[1]] + _lineCounts[2][_bytes[2]]
+
+#mobility function
+#@param _bytes a list of the three arrays of the bytes of N masks of a player
+#@param _empty a list of the three arrays of the bytes of N masks of the empty intersections
+#@return an array of the number of empty intersections next to each of the
+#player's pieces, summed over the pieces
+def mobility(_bytes, _empty):
+    total = 0
+    for j in range(3):
+        counts = (_neighborCounts[0][j][_bytes[0]] + _neighborCounts[1][j][_bytes[1]] +
+                  _neighborCounts[2][j][_bytes[2]]) & _nibbleMasks[_empty[j]]
+        counts = (counts & NIBBLE_LOW_BYTES) + ((counts >> 4) & NIBBLE_LOW_BYTES)
+        total = total + (((counts * 0x01010101) >> 24) & 255)
+    return total
+
+#splitBytes function
+#@param _masks an array of 24 bit masks
+#@return a list of the three arrays of the bytes of _masks, lowest first
+def splitBytes(_masks):
+    return [_masks & 255, (_masks >> 8) & 255, _masks >> 16]
+
+#masksFromBoards function
+#@param _boards an (N, 24) array with 0 for empty and 1 or 2 for the players' pieces
+#@param _player the player to move in every position
+#@return a tuple (mover, other) of arrays of the masks of the player to move and the other player
+def masksFromBoards(_boards, _player):
+    _boards = numpy.asarray(_boards)
+    return (numpy.dot(_boards == _player, _placeValues), numpy.dot(_boards == _player % 2 + 1, _placeValues))
+
+#getFeaturesBatch function
+#@param _mover an array of N masks of the player to move
+#@param _other an array of N masks of the other player
+#@param _moverHand an array of the pieces in hand of the player to move or None for 0
+#@param _otherHand an array of the pieces in hand of the other player or None for 0
+#@return an (N, 4) int32 array of the features of evaluation.getFeatures for the player to move
+def getFeaturesBatch(_mover, _other, _moverHand=None, _otherHand=None):
+    _mover = numpy.asarray(_mover, dtype=numpy.int64)
+    _other = numpy.asarray(_other, dtype=numpy.int64)
+    count = len(_mover)
+    features = numpy.empty((count, len(WEIGHTS)), dtype=numpy.int32)
+    for start in range(0, count, CHUNK_SIZE):
+        end = min(start + CHUNK_SIZE, count)
+        own = _mover[start:end]
+        other = _other[start:end]
+        ownBytes = splitBytes(own)
+        otherBytes = splitBytes(other)
+        emptyBytes = splitBytes(~(own | other) & 0xFFFFFF)
+        pieces = popCount(own).astype(numpy.int32) - popCount(other)
+        if _moverHand is not None:
+            pieces += _moverHand[start:end]
+        if _otherHand is not None:
+            pieces -= _otherHand[start:end]
+        ownLines = lineCounts(ownBytes)
+        otherLines = lineCounts(otherBytes)
+        ownEmpty = ~(ownLines | ownLines >> 1) & LINE_LOW_BITS #lines without own pieces
+        otherEmpty = ~(otherLines | otherLines >> 1) & LINE_LOW_BITS
+        features[start:end, 0] = pieces
+        features[start:end, 1] = (popCount(ownLines & ownLines >> 1 & LINE_LOW_BITS) -
+                                  popCount(otherLines & otherLines >> 1 & LINE_LOW_BITS))
+        features[start:end, 2] = (popCount(ownLines >> 1 & ~ownLines & otherEmpty) -
+                                  popCount(otherLines >> 1 & ~otherLines & ownEmpty))
+        features[start:end, 3] = mobility(ownBytes, emptyBytes) - mobility(otherBytes, emptyBytes)
+    return features
+
+#evaluateBatch function
+#@param _mover an array of N masks of the player to move
+#@param _other an array of N masks of the other player
+#@param _moverHand an array of the pieces in hand of the player to move or None for 0
+#@param _otherHand an array of the pieces in hand of the other player or None for 0
+#@param _weights a weight for each of evaluation.FEATURES, WEIGHTS if None
+#@return an int32 array of the scores evaluation.evaluate gives the positions
+def evaluateBatch(_mover, _other, _moverHand=None, _otherHand=None, _weights=None):
+    weights = _defaultWeights if _weights is None else numpy.array(_weights, dtype=numpy.int32)
+    return numpy.dot(getFeaturesBatch(_mover, _other, _moverHand, _otherHand), weights)
+
+#positionArrays function
+#@param _positions a list of Positions
+#@return a tuple (mover, other, moverHand, otherHand) of arrays for evaluateBatch
+def positionArrays(_positions):
+    mover = numpy.array([p.bits[p.turn] for p in _positions], dtype=numpy.int64)
+    other = numpy.array([p.bits[p.turn % 2 + 1] for p in _positions], dtype=numpy.int64)
+    moverHand = numpy.array([p.inHand[p.turn] for p in _positions], dtype=numpy.int32)
+    otherHand = numpy.array([p.inHand[p.turn % 2 + 1] for p in _positions], dtype=numpy.int32)
+    return (mover, other, moverHand, otherHand)
+
+#randomPositions function
+#@param _count the number of positions
+#@param _seed the random seed
+#@return arrays (mover, other) of random disjoint masks for benchmarking
+def randomPositions(_count, _seed=1):
+    rng = numpy.random.RandomState(_seed)
+    cells = rng.randint(0, 3, size=(_count, 24))
+    return masksFromBoards(cells, 1)
+
+def main():
+    count = 1000000
+    if len(sys.argv) > 1:
+        count = int(sys.argv[1])
+    mover, other = randomPositions(count)
+    start = time.time()
+    scores = evaluateBatch(mover, other)
+    seconds = time.time() - start
+    print '%d positions in %.3fs, %.0f positions/s' % (count, seconds, count / seconds)
+
+if __name__ == '__main__':
+    main()
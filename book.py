@@ -0,0 +1,195 @@
+#!/usr/bin/python
+
+#book module
+#opening book for the placing stage, built offline by searching the positions
+#reached in self-play games and read through mmap by the AI
+#positions are keyed by symmetry.canonicalKey and their moves stored for the
+#canonical position, so one entry serves all 16 symmetric positions
+#a book file is a header and then records sorted by key, each the key, the
+#move packed by transposition.encodeMove, the score and the depth searched
+
+import os, sys, mmap, struct, random
+from optparse import OptionParser
+import engine
+from search import Searcher
+from symmetry import canonicalKey, canonicalMasks, inverses, transformMove
+from transposition import TranspositionTable, encodeMove, decodeMove
+
+DEFAULT_PATH = os.path.join('data', 'book.bin')
+DEFAULT_PLIES = 8 #placements covered by a built book
+DEFAULT_GAMES = 50
+DEFAULT_TIME_LIMIT = 1.0 #seconds searched for each book position
+DEFAULT_EXPLORE = 0.3 #chance of playing a random move while building, to reach more positions
+MAGIC = 'NMMBK1'
+HEADER = struct.Struct('<6sI') #magic, records
+RECORD = struct.Struct('<QHhH') #key, move, score, depth
+
+#bookMove function
+#@param _position the Position
+#@param _move a compound move in _position
+#@return _move as played in the canonical position of _position
+def bookMove(_position, _move):
+    return transformMove(_move, canonicalMasks(_position.bits[1], _position.bits[2])[0])
+
+#OpeningBook class holds book entries, from a file or being built
+class OpeningBook(object):
+    #__init__ method
+    #@param _path the book file to read, an empty book if None or missing
+    def __init__(self, _path=None):
+        self.data = None #memory mapped file
+        self.count = 0 #records in the file
+        self.entries = {} #entries added since loading, key to (move, score, depth)
+        if _path is not None and os.path.exists(_path):
+            self.load(_path)
+
+    #load method
+    #@param _path the book file to read in place of the current entries
+    def load(self, _path):
+        if self.data is not None:
+            self.data.close()
+        f = open(_path, 'rb')
+        try:
+            self.data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        finally:
+            f.close()
+        magic, self.count = HEADER.unpack_from(self.data, 0)
+        if magic != MAGIC or len(self.data) != HEADER.size + self.count * RECORD.size:
+            raise IOError('bad opening book ' + _path)
+        self.entries = {}
+
+    #getRecord method
+    #@param _key a canonical key
+    #@return the tuple (move code, score, depth) stored for _key or None
+    def getRecord(self, _key):
+        entry = self.entries.get(_key)
+        if entry is not None:
+            return entry
+        low = 0
+        high = self.count
+        while low < high: #binary search of the sorted records
+            middle = (low + high) // 2
+            key, move, score, depth = RECORD.unpack_from(self.data, HEADER.size + middle * RECORD.size)
+            if key < _key:
+                low = middle + 1
+            elif key > _key:
+                high = middle
+            else:
+                return (move, score, depth)
+        return None
+
+    #lookup method
+    #@param _position the Position
+    #@return the book's compound move for _position or None if it isn't in the book
+    def lookup(self, _position):
+        record = self.getRecord(canonicalKey(_position))
+        if record is None:
+            return None
+        symmetry = canonicalMasks(_position.bits[1], _position.bits[2])[0]
+        move = transformMove(decodeMove(record[0]), inverses[symmetry])
+        if move not in _position.getCompoundMoves():
+            return None
+        return move
+
+    #add method
+    #keeps the entry for the position searched deepest
+    #@param _key a canonical key
+    #@param _moveCode the move for the canonical position packed by encodeMove
+    #@param _score the score of the move
+    #@param _depth the depth searched
+    def add(self, _key, _moveCode, _score, _depth):
+        record = self.getRecord(_key)
+        if record is None or record[2] < _depth:
+            self.entries[_key] = (_moveCode, _score, _depth)
+
+    #items method
+    #@return a list of all entries as (key, move code, score, depth) sorted by key
+    def items(self):
+        records = dict(self.entries)
+        for i in range(self.count):
+            key, move, score, depth = RECORD.unpack_from(self.data, HEADER.size + i * RECORD.size)
+            if key not in records:
+                records[key] = (move, score, depth)
+        return [(key,) + records[key] for key in sorted(records)]
+
+    #save method
+    #@param _path the file to write the book to
+    def save(self, _path):
+        items = self.items()
+        directory = os.path.dirname(_path)
+        if directory and not os.path.isdir(directory):
+            os.makedirs(directory)
+        f = open(_path + '.tmp', 'wb')
+        f.write(HEADER.pack(MAGIC, len(items)))
+        for key, move, score, depth in items:
+            f.write(RECORD.pack(key, move, max(-32768, min(32767, score)), depth))
+        f.close()
+        if os.path.exists(_path):
+            os.remove(_path)
+        os.rename(_path + '.tmp', _path)
+        self.load(_path)
+
+#build function
+#plays self-play games through the first _plies placements, searching every
+#position not yet in the book and adding the result
+#@param _book the OpeningBook to add to
+#@param _games the number of games
+#@param _plies the placements to cover
+#@param _timeLimit the seconds to search each position
+#@param _explore the chance of playing a random move instead of the book move
+#@param _random the random number generator
+def build(_book, _games, _plies, _timeLimit, _explore, _random):
+    searcher = Searcher(_timeLimit, _table=TranspositionTable(64))
+    for game in range(_games):
+        position = engine.Position()
+        for ply in range(_plies):
+            move = _book.lookup(position)
+            if move is None:
+                move = searcher.findMove(position)
+                _book.add(canonicalKey(position), encodeMove(bookMove(position, move)), searcher.score, searcher.depth)
+                print 'game %d ply %d: depth %d score %d' % (game + 1, ply + 1, searcher.depth, searcher.score)
+                sys.stdout.flush()
+            if _random.random() < _explore:
+                move = _random.choice(position.getCompoundMoves())
+            position.makeCompound(move)
+
+#merge function
+#@param _paths the book files to merge
+#@return an OpeningBook with the deepest searched entry of each position
+def merge(_paths):
+    book = OpeningBook()
+    for path in _paths:
+        for key, move, score, depth in OpeningBook(path).items():
+            book.add(key, move, score, depth)
+    return book
+
+def main():
+    parser = OptionParser(usage='usage: %prog build [options]\n       %prog merge [options] BOOK...')
+    parser.add_option('-o', '--output', default=DEFAULT_PATH,
+                      help='book file to write, build adds to it [default: %default]')
+    parser.add_option('-g', '--games', type='int', default=DEFAULT_GAMES,
+                      help='self-play games to build from [default: %default]')
+    parser.add_option('-p', '--plies', type='int', default=DEFAULT_PLIES,
+                      help='placements covered [default: %default]')
+    parser.add_option('-t', '--time', type='float', default=DEFAULT_TIME_LIMIT,
+                      help='seconds to search each position [default: %default]')
+    parser.add_option('-e', '--explore', type='float', default=DEFAULT_EXPLORE,
+                      help='chance of a random move while building [default: %default]')
+    parser.add_option('-s', '--seed', type='int', default=None,
+                      help='random seed for building')
+    options, args = parser.parse_args()
+    if not args or args[0] not in ('build', 'merge'):
+        parser.error('give the command build or merge')
+    if args[0] == 'build':
+        if not 0 < options.plies <= 2 * engine.PIECES_PER_PLAYER:
+            parser.error('plies must be between 1 and %d' % (2 * engine.PIECES_PER_PLAYER))
+        book = OpeningBook(options.output)
+        build(book, options.games, options.plies, options.time, options.explore, random.Random(options.seed))
+    else:
+        if not args[1:]:
+            parser.error('give the books to merge')
+        book = merge(args[1:])
+    book.save(options.output)
+    print '%d positions in %s' % (book.count, options.output)
+
+if __name__ == '__main__':
+    main()
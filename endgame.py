@@ -0,0 +1,312 @@
+#!/usr/bin/python
+
+#endgame module
+#retrograde analysis of the sliding and flying stages, and lookups into the
+#solved tables
+#a subspace holds the positions where nobody has pieces in hand, the player to
+#move has a pieces on the board and the other player has b. Ordinary moves lead
+#from subspace (a, b) to (b, a) so both are solved together as the class (a, b),
+#captures lead to a class with one piece less which is solved before it.
+#every subspace is written to its own file: a header and then one signed 16 bit
+#value for each position in positionindex order, 0 for a draw, n > 0 if the
+#player to move wins in n moves and -n - 1 if the player to move loses in n moves
+
+import os, sys, mmap, struct, time
+from array import array
+from optparse import OptionParser
+from multiprocessing import Pool, cpu_count
+from engine import bit, neighborMask, millLineMasks, millMask, bitPositions, popCount, ALL_POSITIONS
+from positionindex import binomial, pairCount, rankPair, unrankPair, depositMask, sortedMasks
+
+DEFAULT_DIRECTORY = os.path.join('data', 'endgame')
+DEFAULT_MAX_PIECES = 4
+MIN_PIECES = 3 #a player with fewer pieces has lost
+MAGIC = 'NMMEG1'
+HEADER = struct.Struct('<6sBBI') #magic, pieces of the player to move, pieces of the other player, entries
+ENTRY = struct.Struct('<h')
+
+#flags of a position during the analysis
+CAN_DRAW = 1 #a capture leads to a drawn position
+CAN_WIN = 2 #a capture leads to a lost position for the opponent
+
+#tablePath function
+#@param _directory the directory of the tables
+#@param _a the pieces of the player to move
+#@param _b the pieces of the other player
+#@return the path of the file for subspace (_a, _b)
+def tablePath(_directory, _a, _b):
+    return os.path.join(_directory, 'endgame_%d_%d.bin' % (_a, _b))
+
+#decodeValue function
+#@param _value a stored value
+#@return a tuple (result, moves) where result is 1 if the player to move wins, -1
+#if they lose and 0 for a draw, and moves is the number of moves to the end
+def decodeValue(_value):
+    if _value > 0:
+        return (1, _value)
+    if _value < 0:
+        return (-1, -_value - 1)
+    return (0, 0)
+
+#millTargets function
+#@param _mask a player's pieces
+#@return a mask of the empty or opponent points that would complete a mill for _mask
+def millTargets(_mask):
+    targets = 0
+    for line in millLineMasks:
+        rest = line & ~_mask
+        if rest and not rest & (rest - 1): #one point of the line is missing
+            targets |= rest
+    return targets
+
+#EndgameDatabase class looks up solved positions in memory mapped tables
+class EndgameDatabase(object):
+    #__init__ method
+    #@param _directory the directory of the tables
+    def __init__(self, _directory=DEFAULT_DIRECTORY):
+        self.directory = _directory
+        self.tables = {} #memory mapped file or None for each subspace asked for
+
+    #getTable method
+    #@param _a the pieces of the player to move
+    #@param _b the pieces of the other player
+    #@return the memory mapped table of subspace (_a, _b) or None if it hasn't been generated
+    def getTable(self, _a, _b):
+        try:
+            return self.tables[(_a, _b)]
+        except KeyError:
+            pass
+        table = None
+        path = tablePath(self.directory, _a, _b)
+        if os.path.exists(path):
+            f = open(path, 'rb')
+            try:
+                table = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            finally:
+                f.close()
+            magic, a, b, count = HEADER.unpack_from(table, 0)
+            if magic != MAGIC or (a, b) != (_a, _b) or count != pairCount(_a, _b):
+                raise IOError('bad endgame table ' + path)
+        self.tables[(_a, _b)] = table
+        return table
+
+    #lookup method
+    #@param _mover the pieces of the player to move
+    #@param _other the pieces of the other player
+    #@return the stored value of the position or None if it isn't in the tables
+    def lookup(self, _mover, _other):
+        table = self.getTable(popCount(_mover), popCount(_other))
+        if table is None:
+            return None
+        return ENTRY.unpack_from(table, HEADER.size + ENTRY.size * rankPair(_mover, _other))[0]
+
+    #probe method
+    #@param _position the Position
+    #@return the stored value of _position or None if it isn't in the tables
+    def probe(self, _position):
+        if _position.removing or _position.inHand[1] or _position.inHand[2]:
+            return None
+        player = _position.turn
+        return self.lookup(_position.bits[player], _position.bits[player % 2 + 1])
+
+#getClasses function
+#@param _maxPieces the most pieces either player may have
+#@return a list of levels, each a list of the classes (a, b) with a >= b and the
+#same number of pieces, in the order they have to be solved
+def getClasses(_maxPieces):
+    levels = []
+    for total in range(2 * MIN_PIECES, 2 * _maxPieces + 1):
+        level = [(a, total - a) for a in range(_maxPieces, MIN_PIECES - 1, -1) if MIN_PIECES <= total - a <= a]
+        if level:
+            levels.append(level)
+    return levels
+
+#isClassSolved function
+#@param _directory the directory of the tables
+#@param _a the larger piece count of the class
+#@param _b the smaller piece count of the class
+#@return true if the tables of the class exist
+def isClassSolved(_directory, _a, _b):
+    return os.path.exists(tablePath(_directory, _a, _b)) and os.path.exists(tablePath(_directory, _b, _a))
+
+#solveClass function
+#solves the subspaces (_a, _b) and (_b, _a) by retrograde analysis and writes
+#their tables, the classes with one piece less must be solved already
+#@param _directory the directory of the tables
+#@param _a the larger piece count of the class
+#@param _b the smaller piece count of the class
+#@return a tuple (a, b, positions, wins, losses, draws, seconds)
+def solveClass(_directory, _a, _b):
+    start = time.time()
+    database = EndgameDatabase(_directory)
+    subspaces = [(_a, _b)]
+    if _a != _b:
+        subspaces.append((_b, _a))
+    offsets = []
+    total = 0
+    for a, b in subspaces:
+        offsets.append(total)
+        total += pairCount(a, b)
+    values = array('h', [0]) * total
+    done = array('B', [0]) * total
+    pending = array('B', [0]) * total #moves to positions in the class not known to be wins
+    lossDepth = array('H', [0]) * total #longest loss found so far
+    flags = array('B', [0]) * total
+    layers = {} #positions to finish at each depth as (index << 1) | lost
+
+    #first look at the moves of every position, counting the moves that stay in
+    #the class and scoring the captures from the solved tables
+    for s, (a, b) in enumerate(subspaces):
+        flying = a == MIN_PIECES
+        otherMasks = sortedMasks(b)[:binomial[24 - a][b]]
+        g = offsets[s]
+        for mover in sortedMasks(a):
+            free = ALL_POSITIONS & ~mover
+            moverPieces = bitPositions(mover)
+            for packed in otherMasks:
+                other = depositMask(packed, free)
+                empty = free & ~other
+                count = 0
+                win = 0
+                loss = 0
+                flag = 0
+                removable = None
+                for p in moverPieces:
+                    if flying:
+                        dests = empty
+                    else:
+                        dests = neighborMask[p] & empty
+                    if not dests:
+                        continue
+                    rest = mover ^ bit[p]
+                    mills = millTargets(rest) & dests
+                    count += popCount(dests & ~mills)
+                    if not mills:
+                        continue
+                    if b == MIN_PIECES: #the capture wins at once
+                        win = 1
+                        break
+                    if removable is None:
+                        removable = bitPositions(other & ~millMask(other)) or bitPositions(other)
+                    for x in bitPositions(mills):
+                        after = rest | bit[x]
+                        for r in removable:
+                            v = database.lookup(other ^ bit[r], after)
+                            if v is None:
+                                raise IOError('endgame table %d %d is missing' % (b - 1, a))
+                            if v == 0:
+                                flag |= CAN_DRAW
+                            elif v > 0:
+                                loss = max(loss, v + 1)
+                            elif not win or -v < win:
+                                win = -v
+                if win:
+                    flags[g] = flag | CAN_WIN
+                    layers.setdefault(win, []).append(g << 1)
+                else:
+                    pending[g] = count
+                    lossDepth[g] = loss
+                    flags[g] = flag
+                    if count == 0 and not flag: #every move loses, or there are no moves
+                        layers.setdefault(loss, []).append((g << 1) | 1)
+                g += 1
+
+    #then finish positions in order of depth, a lost position makes its
+    #predecessors wins and a won position counts down its predecessors' moves
+    depth = 0
+    while layers:
+        for entry in layers.pop(depth, []):
+            g = entry >> 1
+            if done[g]:
+                continue
+            done[g] = 1
+            lost = entry & 1
+            if lost:
+                values[g] = -depth - 1
+            else:
+                values[g] = depth
+            s = int(len(subspaces) > 1 and g >= offsets[1])
+            a, b = subspaces[s]
+            mover, other = unrankPair(a, b, g - offsets[s])
+            before = offsets[len(subspaces) - 1 - s] #positions the other player moved from
+            empty = ALL_POSITIONS & ~(mover | other)
+            for y in bitPositions(other & ~millMask(other)):
+                base = other ^ bit[y]
+                if b == MIN_PIECES:
+                    sources = empty
+                else:
+                    sources = neighborMask[y] & empty
+                for x in bitPositions(sources):
+                    q = before + rankPair(base | bit[x], mover)
+                    if done[q]:
+                        continue
+                    if lost:
+                        layers.setdefault(depth + 1, []).append(q << 1)
+                    elif not flags[q] & CAN_WIN: #a capture wins so its moves aren't counted
+                        pending[q] -= 1
+                        if lossDepth[q] <= depth:
+                            lossDepth[q] = depth + 1
+                        if pending[q] == 0 and not flags[q]:
+                            layers.setdefault(lossDepth[q], []).append((q << 1) | 1)
+        depth += 1
+
+    for s, (a, b) in enumerate(subspaces):
+        table = values[offsets[s]:offsets[s] + pairCount(a, b)]
+        if sys.byteorder == 'big':
+            table.byteswap()
+        path = tablePath(_directory, a, b)
+        f = open(path + '.tmp', 'wb')
+        f.write(HEADER.pack(MAGIC, a, b, len(table)))
+        f.write(table.tostring())
+        f.close()
+        if os.path.exists(path):
+            os.remove(path)
+        os.rename(path + '.tmp', path) #a table file is only there once it is complete
+    wins = sum([1 for v in values if v > 0])
+    losses = sum([1 for v in values if v < 0])
+    return (_a, _b, total, wins, losses, total - wins - losses, time.time() - start)
+
+#solveClassTask function
+#@param _task a tuple (directory, a, b) for solveClass
+#@return the result of solveClass
+def solveClassTask(_task):
+    return solveClass(*_task)
+
+#generate function
+#solves every class up to _maxPieces, skipping classes already solved so an
+#interrupted run can be resumed, classes with the same number of pieces are
+#solved in parallel
+#@param _directory the directory of the tables
+#@param _maxPieces the most pieces either player may have
+#@param _processes the number of worker processes
+def generate(_directory, _maxPieces, _processes):
+    if not os.path.isdir(_directory):
+        os.makedirs(_directory)
+    pool = Pool(_processes)
+    try:
+        for level in getClasses(_maxPieces):
+            tasks = [(_directory, a, b) for a, b in level if not isClassSolved(_directory, a, b)]
+            for a, b in level:
+                if not (_directory, a, b) in tasks:
+                    print '%dv%d already solved' % (a, b)
+            for a, b, positions, wins, losses, draws, seconds in pool.imap_unordered(solveClassTask, tasks):
+                print '%dv%d: %d positions, %d wins, %d losses, %d draws in %.1fs' % (a, b, positions, wins, losses, draws, seconds)
+                sys.stdout.flush()
+    finally:
+        pool.terminate()
+
+def main():
+    parser = OptionParser(usage='usage: %prog [options]')
+    parser.add_option('-d', '--directory', default=DEFAULT_DIRECTORY,
+                      help='directory to write the tables to [default: %default]')
+    parser.add_option('-m', '--max-pieces', type='int', default=DEFAULT_MAX_PIECES,
+                      help='most pieces either player may have [default: %default]')
+    parser.add_option('-p', '--processes', type='int', default=cpu_count(),
+                      help='worker processes [default: %default]')
+    options, args = parser.parse_args()
+    if options.max_pieces < MIN_PIECES or options.max_pieces > 9:
+        parser.error('max pieces must be between %d and 9' % MIN_PIECES)
+    generate(options.directory, options.max_pieces, options.processes)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,442 @@
+#!/usr/bin/python
+
+#engine module
+#headless game state for Nine Men's Morris and the other games in variants,
+#importable without pygame
+#each player's pieces are stored as a 24 bit integer where bit i is set if the
+#player has a piece on intersection i (same numbering as the mills and
+#neighbors tables of the variant)
+
+import random
+import variants
+
+#the standard game, positions are of this variant unless they are given another
+STANDARD = variants.getVariant('nine')
+
+#lookup tables of the standard game, all built once at import time by variants
+
+PIECES_PER_PLAYER = STANDARD.pieces
+ALL_POSITIONS = STANDARD.allPositions
+PATH_CACHE_SIZE = 50000 #most shortest path tables kept before the cache is cleared
+
+#lists of mills that can be made, the other two intersections of each mill through an intersection
+mills = STANDARD.mills
+neighbors = STANDARD.neighbors
+
+#single bit mask for each intersection
+bit = STANDARD.bit
+
+#the 16 lines of three intersections that make a mill
+millLines = STANDARD.millLines
+millLineMasks = STANDARD.millLineMasks
+
+#indexes into millLines of the two lines through each intersection
+pointLines = STANDARD.pointLines
+
+#masks of the two pairs of intersections that complete a mill with each intersection
+millPairMasks = STANDARD.millPairMasks
+
+#mask of the neighbors of each intersection
+neighborMask = STANDARD.neighborMask
+
+#adjacent[a][b] is true if a and b are connected by a line
+adjacent = STANDARD.adjacent
+
+#bit counts and set bit positions of every 12 bit value, a 24 bit mask is looked
+#up as its low and high halves
+halfCount = [bin(i).count('1') for i in range(1 << 12)]
+_lowPositions = [[p for p in range(12) if i & bit[p]] for i in range(1 << 12)]
+_highPositions = [[p + 12 for p in l] for l in _lowPositions]
+
+#popCount function
+#@param _mask a 24 bit mask
+#@return the number of bits set in _mask
+def popCount(_mask):
+    return halfCount[_mask & 0xfff] + halfCount[_mask >> 12]
+
+#bitPositions function
+#@param _mask a 24 bit mask
+#@return a list of the intersections set in _mask
+def bitPositions(_mask):
+    return _lowPositions[_mask & 0xfff] + _highPositions[_mask >> 12]
+
+#closesMill function
+#@param _mask the player's pieces, including _pos
+#@param _pos the position
+#@return true if _pos is part of a mill in _mask
+closesMill = STANDARD.closesMill
+
+#zobrist keys for hashing positions, the same on every run
+pieceKeys = STANDARD.pieceKeys
+handKeys = STANDARD.handKeys
+turnKey = STANDARD.turnKey #included when player 2 is to move
+removingKey = STANDARD.removingKey #included when a piece must be removed
+
+#millMask function
+#@param _mask a player's pieces
+#@return a mask of the pieces in _mask that are part of mills
+millMask = STANDARD.millMask
+
+_pathCache = {}
+
+#shortestPaths function
+#breadth first search from _src through empty intersections, results are cached
+#on the starting position and the empty mask
+#@param _src the starting position
+#@param _empty a mask of the empty intersections
+#@return a tuple (distance, count) of lists with the length of the shortest path
+#from _src to each intersection (-1 if there is no path) and the number of
+#shortest paths to it
+def shortestPaths(_src, _empty):
+    key = (_empty << 5) | _src
+    tables = _pathCache.get(key)
+    if tables is None:
+        distance = [-1] * 24
+        count = [0] * 24
+        distance[_src] = 0
+        count[_src] = 1
+        frontier = [_src]
+        while frontier:
+            nextFrontier = []
+            for p in frontier:
+                for n in bitPositions(neighborMask[p] & _empty):
+                    if distance[n] == -1:
+                        distance[n] = distance[p] + 1
+                        nextFrontier.append(n)
+                    if distance[n] == distance[p] + 1:
+                        count[n] += count[p]
+            frontier = nextFrontier
+        if len(_pathCache) >= PATH_CACHE_SIZE:
+            _pathCache.clear()
+        tables = (distance, count)
+        _pathCache[key] = tables
+    return tables
+
+#shortestPath function
+#@param _src the starting position
+#@param _dest the destination position
+#@param _empty a mask of the empty intersections
+#@param _random the random number generator used to choose between paths of equal length
+#@return one of the shortest paths from _src to _dest as a list, chosen
+#uniformly, or an empty list if there is no path
+def shortestPath(_src, _dest, _empty, _random=random):
+    distance, count = shortestPaths(_src, _empty)
+    if distance[_dest] == -1 or _dest == _src:
+        return []
+    path = [_dest]
+    p = _dest
+    while p != _src:
+        pick = _random.randrange(count[p])
+        for n in neighbors[p]:
+            if distance[n] == distance[p] - 1:
+                pick -= count[n]
+                if pick < 0:
+                    break
+        p = n
+        path.append(p)
+    path.reverse()
+    return path
+
+#Position class represents the complete state of a game
+class Position(object):
+    __slots__ = ['variant', 'bits', 'inHand', 'turn', 'removing', 'hash']
+
+    #__init__ method
+    #@param _variant the variants.Variant of the game, STANDARD if None
+    def __init__(self, _variant=None):
+        self.variant = _variant or STANDARD
+        self.reset()
+
+    #reset method
+    #sets up the starting position
+    def reset(self):
+        pieces = self.variant.pieces
+        self.bits = [0, 0, 0] #piece masks for player 1 and 2, index 0 is unused
+        self.inHand = [0, pieces, pieces] #pieces left to be placed
+        self.turn = 1 #the player to move
+        self.removing = False #true if the player to move made a mill and must remove a piece
+        self.hash = self.computeHash() #zobrist hash, kept up to date by every move
+
+    #copy method
+    #@return a new independent Position equal to this one
+    def copy(self):
+        other = Position.__new__(Position)
+        other.variant = self.variant
+        other.bits = self.bits[:]
+        other.inHand = self.inHand[:]
+        other.turn = self.turn
+        other.removing = self.removing
+        other.hash = self.hash
+        return other
+
+    #computeHash method
+    #@return the zobrist hash of the position calculated from scratch
+    def computeHash(self):
+        v = self.variant
+        h = 0
+        for player in (1, 2):
+            for p in bitPositions(self.bits[player]):
+                h ^= v.pieceKeys[player][p]
+            h ^= v.handKeys[player][self.inHand[player]]
+        if self.turn == 2:
+            h ^= v.turnKey
+        if self.removing:
+            h ^= v.removingKey
+        return h
+
+    #occupied method
+    #@return a mask of all intersections with a piece
+    def occupied(self):
+        return self.bits[1] | self.bits[2]
+
+    #empty method
+    #@return a mask of all intersections without a piece
+    def empty(self):
+        return self.variant.allPositions & ~(self.bits[1] | self.bits[2])
+
+    #getPlayer method
+    #@param _pos the position
+    #@return the player with a piece on _pos or 0 if it is empty
+    def getPlayer(self, _pos):
+        if self.bits[1] & bit[_pos]:
+            return 1
+        if self.bits[2] & bit[_pos]:
+            return 2
+        return 0
+
+    #piecesOnBoard method
+    #@param _player the player
+    #@return the number of pieces _player has on the board
+    def piecesOnBoard(self, _player):
+        return popCount(self.bits[_player])
+
+    #piecesRemaining method
+    #@param _player the player
+    #@return the number of pieces _player has not lost
+    def piecesRemaining(self, _player):
+        return popCount(self.bits[_player]) + self.inHand[_player]
+
+    #stage method
+    #@param _player the player
+    #@return 1 if _player is placing, 2 if sliding, 3 if flying
+    def stage(self, _player):
+        if self.inHand[_player] > 0:
+            return 1
+        if self.piecesRemaining(_player) > self.variant.flying:
+            return 2
+        return 3
+
+    #isMill method
+    #@param _pos the position
+    #@param _player the player, either 1 or 2
+    #@return _pos is part of a mill for _player or not
+    def isMill(self, _pos, _player):
+        mask = self.bits[_player]
+        return mask & bit[_pos] != 0 and self.variant.closesMill(mask, _pos)
+
+    #allMills method
+    #@param _player the player
+    #@return true if all of _player's pieces on the board are part of mills
+    def allMills(self, _player):
+        mask = self.bits[_player]
+        return mask & ~self.variant.millMask(mask) == 0
+
+    #canMove method
+    #@param _player the player
+    #@return true if _player can slide any pieces
+    def canMove(self, _player):
+        empty = self.empty()
+        neighborMask = self.variant.neighborMask
+        for p in bitPositions(self.bits[_player]):
+            if neighborMask[p] & empty:
+                return True
+        return False
+
+    #isLegal method
+    #@param _from the starting position or -1 to place a piece
+    #@param _to the ending position
+    #@return true if the player to move can play _from to _to
+    def isLegal(self, _from, _to):
+        if self.removing or not self.empty() & bit[_to]:
+            return False
+        stage = self.stage(self.turn)
+        if stage == 1:
+            return _from == -1
+        if _from == -1 or not self.bits[self.turn] & bit[_from]:
+            return False
+        return stage == 3 or self.variant.adjacent[_from][_to]
+
+    #getMoves method
+    #@return a list of moves for the player to move as (from, to) tuples,
+    #from is -1 for a placement
+    def getMoves(self):
+        if self.removing:
+            return []
+        empty = bitPositions(self.empty())
+        stage = self.stage(self.turn)
+        if stage == 1:
+            return [(-1, x) for x in empty]
+        moves = []
+        own = bitPositions(self.bits[self.turn])
+        if stage == 3:
+            for p in own:
+                moves += [(p, x) for x in empty]
+        else:
+            emptyMask = self.empty()
+            neighborMask = self.variant.neighborMask
+            for p in own:
+                moves += [(p, x) for x in bitPositions(neighborMask[p] & emptyMask)]
+        return moves
+
+    #canRemove method
+    #@param _pos the position
+    #@return true if the player to move may remove the piece on _pos
+    def canRemove(self, _pos):
+        opponent = self.turn % 2 + 1
+        if not self.removing or not self.bits[opponent] & bit[_pos]:
+            return False
+        return bit[_pos] & self.removable(opponent) != 0
+
+    #removable method
+    #@param _player the player whose pieces would be removed
+    #@return a mask of _player's pieces that may be removed after a mill
+    def removable(self, _player):
+        mask = self.bits[_player]
+        free = mask & ~self.variant.millMask(mask)
+        if free:
+            return free
+        return mask #every piece is in a mill
+
+    #getRemovals method
+    #@return a list of positions the player to move may remove a piece from
+    def getRemovals(self):
+        if not self.removing:
+            return []
+        return bitPositions(self.removable(self.turn % 2 + 1))
+
+    #makeMove method
+    #plays a move for the player to move, the turn only passes if no mill was made
+    #@param _from the starting position or -1 to place a piece
+    #@param _to the ending position
+    #@return true if the move made a mill and a piece must be removed
+    def makeMove(self, _from, _to):
+        v = self.variant
+        player = self.turn
+        keys = v.pieceKeys[player]
+        if _from == -1:
+            hand = v.handKeys[player]
+            self.hash ^= hand[self.inHand[player]] ^ hand[self.inHand[player] - 1]
+            self.inHand[player] -= 1
+        else:
+            self.bits[player] &= ~bit[_from]
+            self.hash ^= keys[_from]
+        self.bits[player] |= bit[_to]
+        self.hash ^= keys[_to]
+        if v.closesMill(self.bits[player], _to):
+            self.removing = True
+            self.hash ^= v.removingKey
+            return True
+        self.turn = player % 2 + 1
+        self.hash ^= v.turnKey
+        return False
+
+    #removePiece method
+    #removes an opponent piece after a mill and passes the turn
+    #@param _pos the position of the piece to remove
+    def removePiece(self, _pos):
+        v = self.variant
+        opponent = self.turn % 2 + 1
+        self.bits[opponent] &= ~bit[_pos]
+        self.removing = False
+        self.turn = opponent
+        self.hash ^= v.pieceKeys[opponent][_pos] ^ v.removingKey ^ v.turnKey
+
+    #isGameOver method
+    #@return true if the player to move has lost
+    def isGameOver(self):
+        if self.removing:
+            return False
+        remaining = self.piecesRemaining(self.turn)
+        if remaining < 3:
+            return True
+        return self.inHand[self.turn] == 0 and remaining > self.variant.flying and not self.canMove(self.turn)
+
+    #winner method
+    #@return the winning player or 0 if the game is not over
+    def winner(self):
+        if self.isGameOver():
+            return self.turn % 2 + 1
+        return 0
+
+    #getCompoundMoves method
+    #a compound move is a move together with the removal it earns, so one
+    #compound move always passes the turn
+    #@return a list of compound moves for the player to move as (from, to, remove)
+    #tuples, from is -1 for a placement and remove is -1 if no mill is made
+    def getCompoundMoves(self):
+        closesMill = self.variant.closesMill
+        player = self.turn
+        own = self.bits[player]
+        removals = None
+        moves = []
+        for f, t in self.getMoves():
+            if f == -1:
+                after = own | bit[t]
+            else:
+                after = (own & ~bit[f]) | bit[t]
+            if closesMill(after, t):
+                if removals is None:
+                    removals = bitPositions(self.removable(player % 2 + 1))
+                if removals:
+                    for r in removals:
+                        moves.append((f, t, r))
+                    continue
+            moves.append((f, t, -1))
+        return moves
+
+    #makeCompound method
+    #@param _move a compound move as (from, to, remove) for the player to move
+    def makeCompound(self, _move):
+        f, t, r = _move
+        v = self.variant
+        player = self.turn
+        opponent = player % 2 + 1
+        keys = v.pieceKeys[player]
+        h = self.hash ^ keys[t] ^ v.turnKey
+        if f == -1:
+            hand = v.handKeys[player]
+            h ^= hand[self.inHand[player]] ^ hand[self.inHand[player] - 1]
+            self.inHand[player] -= 1
+            self.bits[player] |= bit[t]
+        else:
+            h ^= keys[f]
+            self.bits[player] ^= bit[f] | bit[t]
+        if r != -1:
+            h ^= v.pieceKeys[opponent][r]
+            self.bits[opponent] ^= bit[r]
+        self.turn = opponent
+        self.hash = h
+
+    #unmakeCompound method
+    #takes back the compound move that was just made with makeCompound
+    #@param _move the compound move as (from, to, remove)
+    def unmakeCompound(self, _move):
+        f, t, r = _move
+        v = self.variant
+        opponent = self.turn
+        player = opponent % 2 + 1
+        keys = v.pieceKeys[player]
+        h = self.hash ^ keys[t] ^ v.turnKey
+        if r != -1:
+            h ^= v.pieceKeys[opponent][r]
+            self.bits[opponent] ^= bit[r]
+        if f == -1:
+            hand = v.handKeys[player]
+            h ^= hand[self.inHand[player]] ^ hand[self.inHand[player] + 1]
+            self.inHand[player] += 1
+            self.bits[player] ^= bit[t]
+        else:
+            h ^= keys[f]
+            self.bits[player] ^= bit[f] | bit[t]
+        self.turn = player
+        self.hash = h
@@ -0,0 +1,202 @@
+#!/usr/bin/python
+
+#evaluation module
+#static evaluation of positions for the search AI, scores are from the point of
+#view of the player to move
+#EvaluationState keeps the features up to date as pieces are placed, moved and
+#removed, so the search pays for the two lines and the neighbors of the points
+#that change instead of scanning the whole board at every leaf
+#the weights are the hand-tuned WEIGHTS unless weights fitted by learn.py are
+#loaded from a weights file, a header and one signed word for each feature
+
+import os, struct
+from engine import bit, millLineMasks, pointLines, neighborMask, popCount, bitPositions, halfCount
+
+#names and weights of the features returned by getFeatures
+FEATURES = ['pieces', 'mills', 'openTwos', 'mobility']
+WEIGHTS = [40, 6, 4, 1]
+MAGIC = 'NMMEV1'
+HEADER = struct.Struct('<6sB') #magic, number of weights
+
+#loadWeights function
+#@param _path a weights file or None
+#@return the weights in _path, or WEIGHTS if _path is None or doesn't exist
+def loadWeights(_path):
+    if _path is None or not os.path.exists(_path):
+        return list(WEIGHTS)
+    f = open(_path, 'rb')
+    try:
+        data = f.read()
+    finally:
+        f.close()
+    if len(data) < HEADER.size:
+        raise IOError('bad weights file ' + _path)
+    magic, count = HEADER.unpack_from(data, 0)
+    if magic != MAGIC or count != len(FEATURES) or len(data) != HEADER.size + 4 * count:
+        raise IOError('bad weights file ' + _path)
+    return list(struct.unpack_from('<%di' % count, data, HEADER.size))
+
+#saveWeights function
+#@param _path the weights file to write
+#@param _weights a weight for each of FEATURES
+def saveWeights(_path, _weights):
+    if len(_weights) != len(FEATURES):
+        raise ValueError('%d weights for %d features' % (len(_weights), len(FEATURES)))
+    f = open(_path, 'wb')
+    try:
+        f.write(HEADER.pack(MAGIC, len(_weights)) + struct.pack('<%di' % len(_weights), *[int(w) for w in _weights]))
+    finally:
+        f.close()
+
+#getFeatures function
+#@param _position the Position
+#@param _player the player
+#@return a list of feature values for _player minus the same values for the opponent
+def getFeatures(_position, _player):
+    opponent = _player % 2 + 1
+    own = _position.bits[_player]
+    other = _position.bits[opponent]
+    empty = _position.empty()
+    mills = 0
+    openTwos = 0
+    for line in millLineMasks:
+        ownCount = popCount(line & own)
+        otherCount = popCount(line & other)
+        if ownCount == 3:
+            mills += 1
+        elif otherCount == 3:
+            mills -= 1
+        elif ownCount == 2 and otherCount == 0:
+            openTwos += 1
+        elif otherCount == 2 and ownCount == 0:
+            openTwos -= 1
+    mobility = 0
+    for p in bitPositions(own):
+        mobility += popCount(neighborMask[p] & empty)
+    for p in bitPositions(other):
+        mobility -= popCount(neighborMask[p] & empty)
+    pieces = _position.piecesRemaining(_player) - _position.piecesRemaining(opponent)
+    return [pieces, mills, openTwos, mobility]
+
+#evaluate function
+#@param _position the Position
+#@param _weights a weight for each of FEATURES
+#@return the heuristic score of _position for the player to move
+def evaluate(_position, _weights=WEIGHTS):
+    features = getFeatures(_position, _position.turn)
+    return sum([w * f for w, f in zip(_weights, features)])
+
+#lineScores function
+#@param _weights a weight for each of FEATURES
+#@return a list where item a * 4 + b is the weighted mills and openTwos score
+#that a line with a pieces of player 1 and b of player 2 adds for player 1
+def lineScores(_weights):
+    scores = [0] * 16
+    for a in range(4):
+        for b in range(4):
+            scores[a * 4 + b] = _weights[1] * (int(a == 3) - int(b == 3)) + \
+                                _weights[2] * (int(a == 2 and b == 0) - int(b == 2 and a == 0))
+    return scores
+
+_lineSteps = [0, 4, 1] #change to a line key for a piece of each player
+_signs = [0, 1, -1]
+
+#mobilityChange function
+#@param _bits the masks of both players, without a piece on _pos
+#@param _player the player
+#@param _pos an empty position
+#@return the change to the mobility of player 1 less that of player 2 when a
+#piece of _player is put on _pos: the neighbors lose an empty neighbor and the
+#new piece gains the empty ones
+def mobilityChange(_bits, _player, _pos):
+    near = neighborMask[_pos]
+    own = near & _bits[1]
+    other = near & _bits[2]
+    free = near & ~(own | other)
+    return _signs[_player] * (halfCount[free & 0xfff] + halfCount[free >> 12]) - \
+           (halfCount[own & 0xfff] + halfCount[own >> 12]) + (halfCount[other & 0xfff] + halfCount[other >> 12])
+
+#EvaluationState class holds the score of a position from the point of view of
+#player 1, less the pieces in hand, and updates it with each change to the board
+class EvaluationState(object):
+    #__init__ method
+    #@param _position the Position to start from
+    #@param _weights a weight for each of FEATURES
+    def __init__(self, _position, _weights=WEIGHTS):
+        self.pieceWeight = _weights[0]
+        self.mobilityWeight = _weights[3]
+        self.lineScores = lineScores(_weights)
+        self.reset(_position)
+
+    #reset method
+    #@param _position the Position to take the score of
+    def reset(self, _position):
+        self.bits = [0, 0, 0]
+        self.lineKeys = [0] * len(millLineMasks) #a * 4 + b for the pieces of each player on each line
+        self.score = 0
+        for player in (1, 2):
+            for p in bitPositions(_position.bits[player]):
+                self.addPiece(player, p)
+
+    #addPiece method
+    #@param _player the player
+    #@param _pos the empty position to put a piece of _player on
+    def addPiece(self, _player, _pos):
+        keys = self.lineKeys
+        scores = self.lineScores
+        step = _lineSteps[_player]
+        score = self.score
+        for l in pointLines[_pos]:
+            key = keys[l]
+            keys[l] = key + step
+            score += scores[key + step] - scores[key]
+        bits = self.bits
+        self.score = score + self.mobilityWeight * mobilityChange(bits, _player, _pos) + self.pieceWeight * _signs[_player]
+        bits[_player] |= bit[_pos]
+
+    #removePiece method
+    #@param _player the player
+    #@param _pos the position of the piece of _player to take off
+    def removePiece(self, _player, _pos):
+        bits = self.bits
+        bits[_player] &= ~bit[_pos]
+        keys = self.lineKeys
+        scores = self.lineScores
+        step = _lineSteps[_player]
+        score = self.score
+        for l in pointLines[_pos]:
+            key = keys[l]
+            keys[l] = key - step
+            score += scores[key - step] - scores[key]
+        self.score = score - self.mobilityWeight * mobilityChange(bits, _player, _pos) - self.pieceWeight * _signs[_player]
+
+    #makeCompound method
+    #@param _move a compound move (from, to, remove)
+    #@param _player the player making _move
+    def makeCompound(self, _move, _player):
+        f, t, r = _move
+        if f != -1:
+            self.removePiece(_player, f)
+        self.addPiece(_player, t)
+        if r != -1:
+            self.removePiece(_player % 2 + 1, r)
+
+    #unmakeCompound method
+    #@param _move the compound move (from, to, remove) to take back
+    #@param _player the player who made _move
+    def unmakeCompound(self, _move, _player):
+        f, t, r = _move
+        if r != -1:
+            self.addPiece(_player % 2 + 1, r)
+        self.removePiece(_player, t)
+        if f != -1:
+            self.addPiece(_player, f)
+
+    #evaluate method
+    #@param _position the Position, with the same pieces on the board as this state
+    #@return the same score as evaluate(_position) with the weights of this state
+    def evaluate(self, _position):
+        score = self.score + self.pieceWeight * (_position.inHand[1] - _position.inHand[2])
+        if _position.turn == 1:
+            return score
+        return -score
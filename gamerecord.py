@@ -0,0 +1,312 @@
+#!/usr/bin/python
+
+#gamerecord module
+#compact binary game records for saving and replaying games
+#a record file is MAGIC followed by games, each a header with the pieces per
+#player, the result, the number of moves, the length of a tag (free text such
+#as the players' names) and the length of the variant, then the variant (the
+#name or definition file variants.getVariant loads the game's rules from), the
+#tag and the moves packed 14 bits each
+#files of the first format, OLD_MAGIC, have no variant and are still read, their
+#games with nine pieces are the standard game
+#games are read one at a time so archives of millions of games can be scanned
+#without loading them
+#the text notation names the intersections a1 to g7 as on the printed board,
+#a placement is written d1, a move a1-d1 and a removal is added as in a1-d1xg7
+
+import os, sys, time, struct, binascii
+from optparse import OptionParser
+import engine
+import variants
+
+MAGIC = 'NMMGR2'
+GAME_HEADER = struct.Struct('<BBHBB') #pieces per player, result, moves, tag length, variant length
+OLD_MAGIC = 'NMMGR1'
+OLD_GAME_HEADER = struct.Struct('<BBHB') #pieces per player, result, moves, tag length
+MOVE_BITS = 14
+MAX_MOVES = (1 << 16) - 1
+MAX_TAG = 255
+MAX_VARIANT = 255
+
+#results of a game
+UNFINISHED = 0
+DRAW = 3 #1 and 2 are wins for that player
+resultNames = ['*', '1-0', '0-1', '1/2-1/2']
+
+#name of each intersection in engine numbering, the outer square first from its
+#top left corner clockwise, then the middle and inner squares
+pointNames = ['a7', 'd7', 'g7', 'g4', 'g1', 'd1', 'a1', 'a4',
+              'b6', 'd6', 'f6', 'f4', 'f2', 'd2', 'b2', 'b4',
+              'c5', 'd5', 'e5', 'e4', 'e3', 'd3', 'c3', 'c4']
+pointNumbers = dict([(name, i) for i, name in enumerate(pointNames)])
+
+#encodeMove function
+#@param _move a compound move (from, to, remove)
+#@return _move as a number below 1 << MOVE_BITS
+def encodeMove(_move):
+    f, t, r = _move
+    return ((f + 1) * 24 + t) * 25 + r + 1
+
+#decodeMove function
+#@param _code a move packed by encodeMove
+#@return the compound move
+def decodeMove(_code):
+    code, r = divmod(_code, 25)
+    f, t = divmod(code, 24)
+    return (f - 1, t, r - 1)
+
+#packMoves function
+#@param _moves a list of compound moves
+#@return the moves packed MOVE_BITS each into a string, the last byte padded with zeros
+def packMoves(_moves):
+    if not _moves:
+        return ''
+    value = 0
+    for m in _moves:
+        value = (value << MOVE_BITS) | encodeMove(m)
+    size = (len(_moves) * MOVE_BITS + 7) // 8
+    value <<= size * 8 - len(_moves) * MOVE_BITS
+    return binascii.unhexlify('%0*x' % (size * 2, value))
+
+#unpackMoves function
+#@param _data a string from packMoves
+#@param _count the number of moves in _data
+#@return the list of compound moves
+def unpackMoves(_data, _count):
+    if not _count:
+        return []
+    value = int(binascii.hexlify(_data), 16) >> (len(_data) * 8 - _count * MOVE_BITS)
+    mask = (1 << MOVE_BITS) - 1
+    moves = [None] * _count
+    for i in range(_count - 1, -1, -1):
+        moves[i] = decodeMove(value & mask)
+        value >>= MOVE_BITS
+    return moves
+
+#GameRecord class is one game, from the start position
+class GameRecord(object):
+    __slots__ = ['moves', 'result', 'tag', 'variant', 'pieces']
+
+    #__init__ method
+    #@param _moves the list of compound moves played
+    #@param _result UNFINISHED, DRAW or the winning player
+    #@param _tag free text stored with the game
+    #@param _variant the source of the variants.Variant played, or None if it
+    #wasn't recorded
+    #@param _pieces the pieces each player starts with, the variant's if None
+    def __init__(self, _moves=None, _result=UNFINISHED, _tag='', _variant='nine', _pieces=None):
+        self.moves = _moves if _moves is not None else []
+        self.result = _result
+        self.tag = _tag
+        self.variant = _variant
+        if _pieces is None:
+            _pieces = variants.getVariant(_variant).pieces
+        self.pieces = _pieces
+
+    #startPosition method
+    #@return a new Position at the start of the game's variant
+    def startPosition(self):
+        if self.variant is None:
+            raise ValueError('the variant of a game with %d pieces was not recorded' % self.pieces)
+        variant = variants.getVariant(self.variant)
+        if variant.pieces != self.pieces:
+            raise ValueError('%s has %d pieces, the game has %d' % (variant.name, variant.pieces, self.pieces))
+        return engine.Position(variant)
+
+    #positions method
+    #plays the moves, checking each is legal
+    #@return a generator of (Position, move) before each move, the Position is
+    #the same object each time and is changed by the next step
+    def positions(self):
+        position = self.startPosition()
+        for i, m in enumerate(self.moves):
+            if position.isGameOver() or m not in position.getCompoundMoves():
+                raise ValueError('illegal move %s at ply %d' % (formatMove(m), i + 1))
+            yield position, m
+            position.makeCompound(m)
+
+    #replay method
+    #@return the Position after the moves
+    def replay(self):
+        position = self.startPosition()
+        for position, m in self.positions(): #the last move is made when the generator ends
+            pass
+        return position
+
+#GameWriter class appends games to a record file
+class GameWriter(object):
+    #__init__ method
+    #@param _path the record file, made if missing, games are added to a file
+    #of the first format in that format
+    def __init__(self, _path):
+        self.file = open(_path, 'ab')
+        self.file.seek(0, os.SEEK_END)
+        self.old = False #the file is of the first format, without variants
+        if self.file.tell() == 0:
+            self.file.write(MAGIC)
+        else:
+            f = open(_path, 'rb')
+            try:
+                magic = f.read(len(MAGIC))
+            finally:
+                f.close()
+            if magic not in (MAGIC, OLD_MAGIC):
+                self.file.close()
+                raise IOError('bad game record file ' + _path)
+            self.old = magic == OLD_MAGIC
+        self.count = 0 #games written
+
+    #write method
+    #@param _game the GameRecord
+    def write(self, _game):
+        tag = _game.tag.encode('utf-8') if isinstance(_game.tag, unicode) else _game.tag
+        variant = _game.variant.encode('utf-8') if isinstance(_game.variant, unicode) else _game.variant
+        if len(_game.moves) > MAX_MOVES or len(tag) > MAX_TAG:
+            raise ValueError('game too long to record')
+        if variant is None or len(variant) > MAX_VARIANT:
+            raise ValueError('the variant of the game can\'t be recorded')
+        if self.old:
+            if variant != 'nine':
+                raise ValueError('a file of the first format only holds %s' % engine.STANDARD.name)
+            header = OLD_GAME_HEADER.pack(_game.pieces, _game.result, len(_game.moves), len(tag))
+        else:
+            header = GAME_HEADER.pack(_game.pieces, _game.result, len(_game.moves), len(tag), len(variant)) + variant
+        self.file.write(header + tag + packMoves(_game.moves))
+        self.count += 1
+
+    def flush(self):
+        self.file.flush()
+
+    def close(self):
+        self.file.close()
+
+#readGames function
+#@param _path a record file
+#@return a generator of the GameRecords in the file
+def readGames(_path):
+    f = open(_path, 'rb')
+    try:
+        magic = f.read(len(MAGIC))
+        if magic not in (MAGIC, OLD_MAGIC):
+            raise IOError('bad game record file ' + _path)
+        gameHeader = OLD_GAME_HEADER if magic == OLD_MAGIC else GAME_HEADER
+        while True:
+            header = f.read(gameHeader.size)
+            if not header:
+                return
+            if len(header) < gameHeader.size:
+                raise IOError('truncated game record file ' + _path)
+            if magic == OLD_MAGIC:
+                pieces, result, count, tagLength = gameHeader.unpack(header)
+                variantLength = 0
+            else:
+                pieces, result, count, tagLength, variantLength = gameHeader.unpack(header)
+            size = (count * MOVE_BITS + 7) // 8
+            data = f.read(variantLength + tagLength + size)
+            if len(data) < variantLength + tagLength + size:
+                raise IOError('truncated game record file ' + _path)
+            if magic == OLD_MAGIC:
+                variant = 'nine' if pieces == engine.PIECES_PER_PLAYER else None
+            else:
+                variant = data[:variantLength]
+            moves = unpackMoves(data[variantLength + tagLength:], count)
+            yield GameRecord(moves, result, data[variantLength:variantLength + tagLength], variant, pieces)
+    finally:
+        f.close()
+
+#formatMove function
+#@param _move a compound move (from, to, remove)
+#@return _move in text notation
+def formatMove(_move):
+    f, t, r = _move
+    text = pointNames[t]
+    if f != -1:
+        text = pointNames[f] + '-' + text
+    if r != -1:
+        text += 'x' + pointNames[r]
+    return text
+
+#parseMove function
+#@param _text a move in text notation
+#@return the compound move
+def parseMove(_text):
+    try:
+        text, x, remove = _text.lower().partition('x')
+        r = pointNumbers[remove] if x else -1
+        f, dash, t = text.rpartition('-')
+        return (pointNumbers[f] if dash else -1, pointNumbers[t], r)
+    except KeyError:
+        raise ValueError('bad move ' + _text)
+
+#formatGame function
+#@param _game the GameRecord
+#@return the moves of _game in text notation followed by the result
+def formatGame(_game):
+    return ' '.join([formatMove(m) for m in _game.moves] + [resultNames[_game.result]])
+
+#parseGame function
+#@param _text moves in text notation, optionally followed by a result
+#@param _tag the tag of the game
+#@param _variant the source of the variants.Variant played
+#@return the GameRecord, its moves are checked to be legal
+def parseGame(_text, _tag='', _variant='nine'):
+    words = _text.split()
+    result = UNFINISHED
+    if words and words[-1] in resultNames:
+        result = resultNames.index(words.pop())
+    game = GameRecord([parseMove(w) for w in words], result, _tag, _variant)
+    game.replay()
+    return game
+
+def main():
+    parser = OptionParser(usage='usage: %prog [options] COMMAND ...\n\n'
+                          'commands:\n'
+                          '  export FILE         print the games in FILE in text notation\n'
+                          '  import TEXT FILE    append the games in TEXT, one per line, to FILE\n'
+                          '  stats FILE          count the games and results in FILE')
+    parser.add_option('-c', '--check', action='store_true', default=False,
+                      help='replay each game to check its moves are legal')
+    parser.add_option('-v', '--variant', default='nine',
+                      help='game the imported games were played in, %s or a definition file [default: %%default]'
+                      % ', '.join(sorted(variants.definitions)))
+    options, args = parser.parse_args()
+    if len(args) == 2 and args[0] == 'export':
+        for game in readGames(args[1]):
+            if options.check:
+                game.replay()
+            print formatGame(game)
+    elif len(args) == 3 and args[0] == 'import':
+        try:
+            variants.getVariant(options.variant)
+        except ValueError, e:
+            parser.error(str(e))
+        writer = GameWriter(args[2])
+        try:
+            for number, line in enumerate(open(args[1]), 1):
+                if line.strip():
+                    try:
+                        writer.write(parseGame(line, '', options.variant))
+                    except ValueError, e:
+                        sys.exit('line %d: %s' % (number, e))
+        finally:
+            writer.close()
+        print '%d games imported' % writer.count
+    elif len(args) == 2 and args[0] == 'stats':
+        start = time.time()
+        results = [0] * len(resultNames)
+        moves = 0
+        for game in readGames(args[1]):
+            if options.check:
+                game.replay()
+            results[game.result] += 1
+            moves += len(game.moves)
+        seconds = time.time() - start
+        games = sum(results)
+        print '%d games, %d moves, %.1f moves a game' % (games, moves, float(moves) / max(1, games))
+        print ', '.join(['%s %d' % (name, n) for name, n in zip(resultNames, results)])
+        print 'read in %.2fs, %.0f games/s' % (seconds, games / max(seconds, 1e-9))
+    else:
+        parser.error('unknown command')
+
+if __name__ == '__main__':
+    main()
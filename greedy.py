@@ -0,0 +1,104 @@
+#!/usr/bin/python
+
+#greedy module
+#the original AI, which plays the move to the most valuable intersection
+#without looking ahead and breaks ties at random
+
+from engine import bit, neighborMask, millPairMasks, bitPositions, popCount, shortestPath
+
+#intersectionValue function
+#@param _position the Position
+#@param _player the player
+#@param _pos the position on the board
+#@return a value for an intersection corresponding to how valuable the spot is for _player
+def intersectionValue(_position, _player, _pos):
+    own = _position.bits[_player]
+    other = _position.bits[_player % 2 + 1]
+    occupied = own | other
+    value = 0
+    if _pos in [1, 3, 5, 7, 17, 19, 21, 23]: #edge
+        value += 1
+    elif _pos in [9, 11, 13, 15]: #intersection
+        value += 2
+
+    #check if adjacent intersections can be mills
+    if occupied & bit[_pos]:
+        if own & bit[_pos]:
+            for i in bitPositions(neighborMask[_pos] & ~occupied):
+                a, b = millPairMasks[i]
+                if occupied & a == a and not bit[_pos] & a:
+                    if own & a == a: #we can make a mill
+                        value -= 50
+                elif occupied & b == b and not bit[_pos] & b:
+                    if own & b == b: #we can make a mill
+                        value -= 50
+        if _position.isMill(_pos, _player): #this is a mill
+            value -= 7
+
+    a, b = millPairMasks[_pos]
+    if occupied & a == a:
+        if own & a == a or other & a == a: #we can make or block a mill
+            value += 7
+    elif occupied & b == b:
+        if own & b == b or other & b == b: #we can make or block a mill
+            value += 7
+    value += popCount(own & (a | b))
+    if popCount(neighborMask[_pos] & other) > 1:
+        value += 3
+    return value
+
+#pathValue function
+#@param _position the Position
+#@param _player the player
+#@param _path the path as a list
+#@return a value for the path corresponding to how good this path is for _player
+def pathValue(_position, _player, _path):
+    value = intersectionValue(_position, _player, _path[1]) - intersectionValue(_position, _player, _path[0])
+    for i in _path[2:]:
+        value += (intersectionValue(_position, _player, i) - 3)
+    return value
+
+#bestMove function
+#@param _position the Position
+#@param _player the player to move
+#@param _random the random number generator for breaking ties
+#@return the best move for _player as a tuple (from, to), from is -1 for a
+#placement, or None if _player can't move
+def bestMove(_position, _player, _random):
+    empty = _position.empty()
+    stage = _position.stage(_player)
+    if stage == 1: #placing stage
+        values = [intersectionValue(_position, _player, i) for i in range(24)] #get values for all intersections
+        destination = []
+        maxValue = 0
+        for i in bitPositions(empty): #find the highest valued empty intersections
+            if values[i] > maxValue:
+                maxValue = values[i]
+                destination = [i]
+            elif values[i] == maxValue:
+                destination += [i]
+        return (-1, _random.choice(destination))
+    elif stage == 2: #sliding stage
+        paths = []
+        #find shortest paths from all pieces to all empty intersections
+        for d in bitPositions(empty):
+            paths += filter(lambda x: x != [], [shortestPath(i, d, empty, _random) for i in bitPositions(_position.bits[_player])])
+        if paths != []:
+            values = [pathValue(_position, _player, i) for i in paths] #values of the paths
+            path = _random.choice([paths[i] for i in range(len(paths)) if values[i] == max(values)])
+            return (path[0], path[1])
+        return None
+    else: #flying stage
+        moves = [(f, t) for f in bitPositions(_position.bits[_player]) for t in bitPositions(empty)]
+        values = [intersectionValue(_position, _player, t) - intersectionValue(_position, _player, f) for f, t in moves]
+        return _random.choice([moves[i] for i in range(len(moves)) if values[i] == max(values)])
+
+#pieceToRemove function
+#@param _position the Position, with a removal due
+#@param _player the player removing a piece
+#@param _random the random number generator for breaking ties
+#@return the position of the best opponent piece for _player to remove
+def pieceToRemove(_position, _player, _random):
+    possiblePieces = bitPositions(_position.removable(_player % 2 + 1)) #positions of opponent pieces that can be removed
+    values = [intersectionValue(_position, _player, i) for i in possiblePieces] #values for possible pieces
+    return _random.choice([possiblePieces[i] for i in range(len(possiblePieces)) if values[i] == max(values)])
@@ -0,0 +1,372 @@
+#!/usr/bin/python
+
+#learn module
+#fits the weights of the search AI's evaluation to the results of games
+#positions are labelled with the result for the player to move, from self-play
+#games, saved game records or positions sampled from the endgame or wdl tables,
+#and saved as NumPy arrays
+#the evaluation is a weighted sum of the features of evaluation.FEATURES, which
+#the search keeps up to date move by move, so the model is logistic regression
+#on the same features: the chance of winning is 1 / (1 + e^(-score / SCORE_SCALE))
+#and the fitted weights cost nothing more at a leaf than the hand-tuned ones
+#the weights are written to a file read by evaluation.loadWeights
+
+import sys, time, random
+from optparse import OptionParser
+from multiprocessing import Pool, cpu_count
+import numpy
+import engine
+import evaluation
+import greedy
+import search
+import endgame
+import wdl
+import tournament
+from batcheval import getFeaturesBatch
+from positionindex import pairCount, unrankPair
+from gamerecord import readGames, UNFINISHED, DRAW
+
+SCORE_SCALE = 100.0 #score at which the odds of winning are e to 1
+DEFAULT_PLAYER = 'search:time=0.01'
+DEFAULT_GAMES = 200
+DEFAULT_OPENING_PLIES = 6 #random moves at the start of each self-play game so the games differ
+DEFAULT_SAMPLES = 20000 #positions sampled from the tables
+REGULARIZATION = 1e-4 #L2 penalty on the weights in units of the log odds
+MAX_ITERATIONS = 50
+TOLERANCE = 1e-7 #largest step of the weights at which the fit has converged
+HOLDOUT = 0.1 #part of the positions kept out of the fit to check it
+DEFAULT_BENCH_GAMES = 40
+DEFAULT_BENCH_TIME = 0.02 #seconds for each move of the benchmark games
+BENCH_POSITIONS = 50
+
+#arrays of a data file
+ARRAYS = ['mover', 'other', 'moverHand', 'otherHand', 'labels']
+
+#emptyData function
+#@return a dictionary of empty arrays for ARRAYS
+def emptyData():
+    return {'mover': numpy.zeros(0, dtype=numpy.int64), 'other': numpy.zeros(0, dtype=numpy.int64),
+            'moverHand': numpy.zeros(0, dtype=numpy.int32), 'otherHand': numpy.zeros(0, dtype=numpy.int32),
+            'labels': numpy.zeros(0, dtype=numpy.float64)}
+
+#joinData function
+#@param _parts a list of dictionaries of arrays for ARRAYS
+#@return a dictionary of the arrays joined end to end
+def joinData(_parts):
+    return dict([(name, numpy.concatenate([part[name] for part in [emptyData()] + list(_parts)])) for name in ARRAYS])
+
+#saveData function
+#@param _path the file to write, NumPy's .npz format
+#@param _data a dictionary of arrays for ARRAYS
+def saveData(_path, _data):
+    f = open(_path, 'wb')
+    try:
+        numpy.savez_compressed(f, **_data)
+    finally:
+        f.close()
+
+#loadData function
+#@param _paths a list of data files written by saveData
+#@return a dictionary of their arrays joined end to end
+def loadData(_paths):
+    parts = []
+    for path in _paths:
+        archive = numpy.load(path)
+        try:
+            parts.append(dict([(name, archive[name]) for name in ARRAYS]))
+        finally:
+            archive.close()
+    return joinData(parts)
+
+#labelGames function
+#@param _games an iterable of GameRecords
+#@return a dictionary of arrays for ARRAYS of every position of the finished
+#games of the standard game before each move, labelled 1, 0.5 or 0 as the
+#player to move won, drew or lost the game
+def labelGames(_games):
+    rows = []
+    for game in _games:
+        if game.result == UNFINISHED or game.variant != 'nine':
+            continue
+        for position, move in game.positions():
+            player = position.turn
+            other = player % 2 + 1
+            label = 0.5 if game.result == DRAW else float(game.result == player)
+            rows.append((position.bits[player], position.bits[other], position.inHand[player], position.inHand[other], label))
+    if not rows:
+        return emptyData()
+    columns = zip(*rows)
+    return {'mover': numpy.array(columns[0], dtype=numpy.int64), 'other': numpy.array(columns[1], dtype=numpy.int64),
+            'moverHand': numpy.array(columns[2], dtype=numpy.int32), 'otherHand': numpy.array(columns[3], dtype=numpy.int32),
+            'labels': numpy.array(columns[4], dtype=numpy.float64)}
+
+#selfPlayGames function
+#@param _spec the spec of the player playing both sides
+#@param _games the number of games
+#@param _processes the number of worker processes
+#@param _seed the seed of the first game
+#@param _openingPlies the random moves at the start of each game
+#@return a generator of the GameRecords of the games in the order they finish
+def selfPlayGames(_spec, _games, _processes, _seed, _openingPlies):
+    tasks = [(_spec, _spec, _seed + g, False, _openingPlies, tournament.MAX_PLIES, 'nine') for g in range(_games)]
+    pool = Pool(_processes)
+    try:
+        for score, plies, times, moves, record in pool.imap_unordered(tournament.playGame, tasks):
+            yield record
+    finally:
+        pool.terminate()
+
+#sampleTables function
+#@param _database an endgame.EndgameDatabase or wdl.WdlDatabase
+#@param _samples the number of positions to sample, shared between the
+#subspaces that have tables
+#@param _seed the random seed
+#@return a dictionary of arrays for ARRAYS of positions with no pieces in hand
+#labelled 1, 0.5 or 0 by their result for the player to move
+def sampleTables(_database, _samples, _seed):
+    rng = random.Random(_seed)
+    classes = [(a, b) for a in range(endgame.MIN_PIECES, engine.PIECES_PER_PLAYER + 1)
+               for b in range(endgame.MIN_PIECES, engine.PIECES_PER_PLAYER + 1) if _database.getTable(a, b) is not None]
+    rows = []
+    for a, b in classes:
+        count = pairCount(a, b)
+        for i in range(_samples // len(classes)):
+            mover, other = unrankPair(a, b, rng.randrange(count))
+            value = _database.lookup(mover, other)
+            if value is None:
+                continue
+            if isinstance(_database, endgame.EndgameDatabase):
+                value = endgame.decodeValue(value)[0]
+            rows.append((mover, other, (value + 1) / 2.0))
+    if not rows:
+        return emptyData()
+    columns = zip(*rows)
+    return {'mover': numpy.array(columns[0], dtype=numpy.int64), 'other': numpy.array(columns[1], dtype=numpy.int64),
+            'moverHand': numpy.zeros(len(rows), dtype=numpy.int32), 'otherHand': numpy.zeros(len(rows), dtype=numpy.int32),
+            'labels': numpy.array(columns[2], dtype=numpy.float64)}
+
+#getFeatures function
+#@param _data a dictionary of arrays for ARRAYS
+#@return an (N, 4) float64 array of the features of the positions
+def getFeatures(_data):
+    return getFeaturesBatch(_data['mover'], _data['other'], _data['moverHand'], _data['otherHand']).astype(numpy.float64)
+
+#winProbability function
+#@param _scores an array of scores for the player to move
+#@return an array of the chances of winning the model gives them
+def winProbability(_scores):
+    return 1.0 / (1.0 + numpy.exp(-numpy.clip(_scores / SCORE_SCALE, -50, 50)))
+
+#fitWeights function
+#logistic regression by Newton's method, a few steps are enough for four weights
+#@param _features an (N, 4) array of features
+#@param _labels an array of N labels between 0 and 1
+#@param _regularization the L2 penalty on the weights in units of the log odds
+#@return a float64 array of the weights in score units
+def fitWeights(_features, _labels, _regularization=REGULARIZATION):
+    count, size = _features.shape
+    weights = numpy.zeros(size) #in units of the log odds of winning
+    for iteration in range(MAX_ITERATIONS):
+        p = 1.0 / (1.0 + numpy.exp(-numpy.clip(numpy.dot(_features, weights), -50, 50)))
+        gradient = numpy.dot(_features.T, p - _labels) / count + _regularization * weights
+        hessian = numpy.dot(_features.T * (p * (1 - p)), _features) / count + _regularization * numpy.eye(size)
+        step = numpy.linalg.solve(hessian, gradient)
+        weights -= step
+        if numpy.abs(step).max() < TOLERANCE:
+            break
+    return weights * SCORE_SCALE
+
+#logLoss function
+#@param _features an (N, 4) array of features
+#@param _labels an array of N labels between 0 and 1
+#@param _weights the weights in score units
+#@return the mean cross entropy of the model's chances of winning and the labels
+def logLoss(_features, _labels, _weights):
+    p = numpy.clip(winProbability(numpy.dot(_features, _weights)), 1e-12, 1 - 1e-12)
+    return float(-numpy.mean(_labels * numpy.log(p) + (1 - _labels) * numpy.log(1 - p)))
+
+#accuracy function
+#@param _features an (N, 4) array of features
+#@param _labels an array of N labels between 0 and 1
+#@param _weights the weights, in any scale
+#@return the part of the won and lost positions whose score has the sign of the
+#result, a score of 0 counting as half right
+def accuracy(_features, _labels, _weights):
+    decided = _labels != 0.5
+    if not decided.any():
+        return 0.0
+    signs = numpy.sign(numpy.dot(_features[decided], _weights))
+    right = numpy.where(_labels[decided] > 0.5, signs, -signs)
+    return float(numpy.mean((right + 1) / 2.0))
+
+#splitData function
+#@param _count the number of positions
+#@param _holdout the part of the positions to keep out of the fit
+#@param _seed the random seed
+#@return a tuple (fit, check) of arrays of indices
+def splitData(_count, _holdout, _seed):
+    order = numpy.random.RandomState(_seed).permutation(_count)
+    held = int(_count * _holdout)
+    return (order[held:], order[:held])
+
+#benchPositions function
+#@param _count the number of positions
+#@param _seed the random seed
+#@return a list of Positions reached by random moves, none of them finished
+def benchPositions(_count, _seed):
+    rng = random.Random(_seed)
+    positions = []
+    while len(positions) < _count:
+        position = engine.Position()
+        for ply in range(rng.randint(0, 40)):
+            if position.isGameOver():
+                break
+            position.makeCompound(rng.choice(position.getCompoundMoves()))
+        if not position.isGameOver():
+            positions.append(position)
+    return positions
+
+#leafSpeed function
+#@param _positions a list of Positions
+#@param _weights the evaluation weights
+#@return the microseconds to make a move, evaluate the position and take the move
+#back as the search does at a leaf
+def leafSpeed(_positions, _weights):
+    leaves = 0
+    start = time.time()
+    for position in _positions:
+        state = evaluation.EvaluationState(position, _weights)
+        player = position.turn
+        for m in position.getCompoundMoves():
+            position.makeCompound(m)
+            state.makeCompound(m, player)
+            state.evaluate(position)
+            state.unmakeCompound(m, player)
+            position.unmakeCompound(m)
+            leaves += 1
+    return 1e6 * (time.time() - start) / max(1, leaves)
+
+#greedySpeed function
+#@param _positions a list of Positions
+#@return the microseconds the original AI's intersection values take for a
+#position, the heuristic it scores every move with
+def greedySpeed(_positions):
+    start = time.time()
+    for position in _positions:
+        for i in range(24):
+            greedy.intersectionValue(position, position.turn, i)
+    return 1e6 * (time.time() - start) / len(_positions)
+
+#searchSpeed function
+#@param _positions a list of Positions
+#@param _weights the evaluation weights
+#@param _depth the depth to search each position to
+#@return the nodes searched a second
+def searchSpeed(_positions, _weights, _depth):
+    searcher = search.Searcher(float('inf'), _depth, _weights=_weights)
+    nodes = 0
+    start = time.time()
+    for position in _positions:
+        searcher.table.clear()
+        searcher.findMove(position)
+        nodes += searcher.nodes
+    return nodes / max(time.time() - start, 1e-9)
+
+#reportMatch function
+#plays a match and prints the result for player A
+#@param _specA the spec of player A
+#@param _specB the spec of player B
+#@param _games the number of games
+#@param _processes the number of worker processes
+def reportMatch(_specA, _specB, _games, _processes):
+    r = tournament.runTournament(_specA, _specB, _games, _processes, 1, tournament.DEFAULT_OPENING_PLIES,
+                                 tournament.MAX_PLIES)
+    elo, low, high = tournament.eloInterval(r['wins'], r['draws'], r['losses'])
+    print '%s vs %s: wins %d, draws %d, losses %d, elo difference %.1f (%.1f to %.1f)' % (
+        _specA, _specB, r['wins'], r['draws'], r['losses'], elo, low, high)
+
+def main():
+    parser = OptionParser(usage='usage: %prog [options] COMMAND ...\n\n'
+                          'commands:\n'
+                          '  generate FILE          label positions from self-play, --record games or the\n'
+                          '                         --endgame or --wdl tables and save them to FILE\n'
+                          '  fit WEIGHTS DATA...    fit the evaluation weights to the positions in the\n'
+                          '                         DATA files and write them to WEIGHTS\n'
+                          '  bench WEIGHTS          compare the speed and strength of the weights in\n'
+                          '                         WEIGHTS with the hand-tuned weights and the original AI')
+    parser.add_option('-g', '--games', type='int',
+                      help='self-play games for generate [default: %d], games of each match for bench [default: %d]'
+                      % (DEFAULT_GAMES, DEFAULT_BENCH_GAMES))
+    parser.add_option('-P', '--player', default=DEFAULT_PLAYER,
+                      help='player of the self-play games [default: %default]')
+    parser.add_option('-o', '--opening-plies', type='int', default=DEFAULT_OPENING_PLIES,
+                      help='random moves at the start of each self-play game [default: %default]')
+    parser.add_option('-r', '--record', metavar='FILE',
+                      help='label the games of the game record FILE instead of playing')
+    parser.add_option('-e', '--endgame', metavar='DIR',
+                      help='also sample positions from the endgame tables in DIR')
+    parser.add_option('-w', '--wdl', metavar='DIR',
+                      help='also sample positions from the wdl tables in DIR')
+    parser.add_option('-n', '--samples', type='int', default=DEFAULT_SAMPLES,
+                      help='positions to sample from the tables [default: %default]')
+    parser.add_option('-l', '--regularization', type='float', default=REGULARIZATION,
+                      help='L2 penalty on the weights [default: %default]')
+    parser.add_option('-t', '--time', type='float', default=DEFAULT_BENCH_TIME,
+                      help='seconds for each move of the bench games [default: %default]')
+    parser.add_option('-p', '--processes', type='int', default=cpu_count(),
+                      help='worker processes [default: %default]')
+    parser.add_option('-s', '--seed', type='int', default=1,
+                      help='random seed [default: %default]')
+    options, args = parser.parse_args()
+    if len(args) == 2 and args[0] == 'generate':
+        start = time.time()
+        parts = []
+        if options.record is not None:
+            parts.append(labelGames(readGames(options.record)))
+        elif options.games != 0:
+            games = DEFAULT_GAMES if options.games is None else options.games
+            parts.append(labelGames(selfPlayGames(options.player, games, options.processes, options.seed,
+                                                  options.opening_plies)))
+        if options.endgame is not None:
+            parts.append(sampleTables(endgame.EndgameDatabase(options.endgame), options.samples, options.seed))
+        if options.wdl is not None:
+            parts.append(sampleTables(wdl.WdlDatabase(options.wdl), options.samples, options.seed))
+        data = joinData(parts)
+        saveData(args[1], data)
+        labels = data['labels']
+        print '%d positions, %d won, %d drawn, %d lost for the player to move in %.1fs' % (
+            len(labels), (labels == 1).sum(), (labels == 0.5).sum(), (labels == 0).sum(), time.time() - start)
+    elif len(args) >= 3 and args[0] == 'fit':
+        data = loadData(args[2:])
+        features = getFeatures(data)
+        labels = data['labels']
+        if len(labels) == 0:
+            sys.exit('no positions to fit')
+        fit, check = splitData(len(labels), HOLDOUT, options.seed)
+        weights = fitWeights(features[fit], labels[fit], options.regularization)
+        rounded = [int(round(w)) for w in weights]
+        evaluation.saveWeights(args[1], rounded)
+        handScale = fitWeights(numpy.dot(features[fit], evaluation.WEIGHTS)[:, None], labels[fit], 0)[0] #hand-tuned weights at their best scale
+        hand = numpy.array(evaluation.WEIGHTS) * handScale
+        print '%d positions fitted, %d held out' % (len(fit), len(check))
+        print 'weights %s: %s' % (', '.join(evaluation.FEATURES), ', '.join([str(w) for w in rounded]))
+        for name, w in [('fitted', numpy.array(rounded, dtype=numpy.float64)), ('hand-tuned', hand)]:
+            print '%s: held out log loss %.4f, accuracy %.1f%%' % (name, logLoss(features[check], labels[check], w),
+                                                                   100 * accuracy(features[check], labels[check], w))
+    elif len(args) == 2 and args[0] == 'bench':
+        weights = evaluation.loadWeights(args[1])
+        positions = benchPositions(BENCH_POSITIONS, options.seed)
+        print 'weights %s: %s' % (', '.join(evaluation.FEATURES), ', '.join([str(w) for w in weights]))
+        print 'leaf: fitted %.2fus, hand-tuned %.2fus, original AI values %.2fus a position' % (
+            leafSpeed(positions, weights), leafSpeed(positions, evaluation.WEIGHTS), greedySpeed(positions))
+        print 'search: fitted %.0f nodes/s, hand-tuned %.0f nodes/s' % (
+            searchSpeed(positions, weights, 4), searchSpeed(positions, evaluation.WEIGHTS, 4))
+        games = DEFAULT_BENCH_GAMES if options.games is None else options.games
+        fitted = 'search:time=%g,weights=%s' % (options.time, args[1])
+        reportMatch(fitted, 'search:time=%g' % options.time, games, options.processes)
+        reportMatch(fitted, 'greedy', games, options.processes)
+    else:
+        parser.error('unknown command')
+
+if __name__ == '__main__':
+    main()
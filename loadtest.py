@@ -0,0 +1,132 @@
+#!/usr/bin/python
+
+#loadtest module
+#load test client for server, opens connections that each keep several games
+#going with random moves and reports the moves per second and the latency of
+#the replies
+
+import time, socket, asyncore, asynchat, json, random
+from optparse import OptionParser
+from server import DEFAULT_PORT
+
+#LoadClient class plays games on one connection
+class LoadClient(asynchat.async_chat):
+    #__init__ method
+    #@param _address the server address as (host, port)
+    #@param _games the number of games to keep going at once
+    #@param _ai the player the server's AI plays in each game or 0
+    #@param _aiTime the seconds the AI searches each move
+    #@param _random the random number generator for the moves
+    #@param _latencies the list to add the latency of each reply to
+    #@param _map the asyncore socket map
+    def __init__(self, _address, _games, _ai, _aiTime, _random, _latencies, _map):
+        asynchat.async_chat.__init__(self, map=_map)
+        self.create_socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.connect(_address)
+        self.set_terminator('\n')
+        self.buffer = []
+        self.games = _games
+        self.ai = _ai
+        self.aiTime = _aiTime
+        self.random = _random
+        self.latencies = _latencies
+        self.sent = {} #request id to the time it was sent
+        self.nextId = 0
+        self.moves = 0 #moves played, the AI's included
+        self.finished = 0 #games played to the end
+        self.errors = 0
+        self.stopping = False
+
+    def handle_connect(self):
+        for i in range(self.games):
+            self.newGame()
+
+    #send method
+    #@param _request the request object, an id is added to it
+    def sendRequest(self, _request):
+        self.nextId += 1
+        _request['id'] = self.nextId
+        self.sent[self.nextId] = time.time()
+        self.push(json.dumps(_request) + '\n')
+
+    def newGame(self):
+        self.sendRequest({'cmd': 'new', 'ai': self.ai, 'time': self.aiTime})
+
+    def collect_incoming_data(self, _data):
+        self.buffer.append(_data)
+
+    def found_terminator(self):
+        reply = json.loads(''.join(self.buffer))
+        self.buffer = []
+        sent = self.sent.pop(reply.get('id'), None)
+        if sent is not None:
+            self.latencies.append(time.time() - sent)
+        if not reply['ok']:
+            self.errors += 1
+            return
+        if 'ai' in reply:
+            self.moves += 1
+        if self.stopping or 'moves' not in reply: #stopping or a game was closed
+            return
+        if reply['winner'] or not reply['moves']:
+            self.finished += 1
+            self.sendRequest({'cmd': 'close', 'game': reply['game']})
+            self.newGame()
+            return
+        f, t, r = self.random.choice(reply['moves'])
+        self.moves += 1
+        self.sendRequest({'cmd': 'move', 'game': reply['game'], 'from': f, 'to': t, 'remove': r})
+
+    def handle_close(self):
+        self.close()
+
+#percentile function
+#@param _values a sorted list
+#@param _fraction the fraction below the percentile
+#@return the value at _fraction of _values
+def percentile(_values, _fraction):
+    if not _values:
+        return 0.0
+    return _values[min(len(_values) - 1, int(len(_values) * _fraction))]
+
+def main():
+    parser = OptionParser(usage='usage: %prog [options]')
+    parser.add_option('-H', '--host', default='127.0.0.1',
+                      help='server address [default: %default]')
+    parser.add_option('-p', '--port', type='int', default=DEFAULT_PORT,
+                      help='server port [default: %default]')
+    parser.add_option('-c', '--connections', type='int', default=10,
+                      help='connections to open [default: %default]')
+    parser.add_option('-g', '--games', type='int', default=10,
+                      help='games at once on each connection [default: %default]')
+    parser.add_option('-a', '--ai', type='int', default=0,
+                      help='player the server AI plays, 0 for none [default: %default]')
+    parser.add_option('-t', '--ai-time', type='float', default=0.01,
+                      help='seconds the AI searches each move [default: %default]')
+    parser.add_option('-d', '--duration', type='float', default=10.0,
+                      help='seconds to run [default: %default]')
+    parser.add_option('-s', '--seed', type='int', default=1,
+                      help='random seed [default: %default]')
+    options, args = parser.parse_args()
+    socketMap = {}
+    latencies = []
+    rng = random.Random(options.seed)
+    clients = [LoadClient((options.host, options.port), options.games, options.ai, options.ai_time,
+                          random.Random(rng.random()), latencies, socketMap) for i in range(options.connections)]
+    start = time.time()
+    while time.time() - start < options.duration and socketMap:
+        asyncore.loop(timeout=0.1, map=socketMap, count=1)
+    seconds = time.time() - start
+    for client in clients:
+        client.stopping = True
+        client.close()
+    latencies.sort()
+    moves = sum([c.moves for c in clients])
+    print '%d connections, %d games at once' % (options.connections, options.connections * options.games)
+    print '%d moves in %.1fs, %.0f moves/s, %d games finished, %d errors' % (
+        moves, seconds, moves / seconds, sum([c.finished for c in clients]), sum([c.errors for c in clients]))
+    print 'latency p50 %.2fms, p99 %.2fms, max %.2fms' % (1000 * percentile(latencies, 0.5),
+                                                          1000 * percentile(latencies, 0.99), 1000 * percentile(latencies, 1.0))
+
+if __name__ == '__main__':
+    main()
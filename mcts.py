@@ -0,0 +1,567 @@
+#!/usr/bin/python
+
+#mcts module
+#Monte Carlo tree search AI, an alternative to the alpha-beta search with the
+#same interface. Moves are chosen with UCT and positions past the tree are
+#scored by playing them out to the end with random or lightly guided moves on a
+#compact state of plain integers.
+#Searches can run in parallel in worker processes in two ways: root parallelism,
+#where each process grows its own tree from the root and the visits of the root
+#moves are added up, and tree parallelism, where this process grows one tree and
+#the workers play out batches of its leaves, with a virtual loss on the paths
+#being played out so a batch spreads over the tree.
+#The tree is kept between moves, the next search starts from the node of the
+#position it is given if the last tree reached it.
+
+import sys, time, math, random
+from optparse import OptionParser
+import multiprocessing
+from multiprocessing import Pool, cpu_count
+import engine
+import variants
+from engine import bit, bitPositions, popCount
+from perft import formatPosition, parsePosition
+
+DEFAULT_TIME_LIMIT = 0.02 #seconds for each move, the same as the alpha-beta search
+EXPLORATION = 1.4 #UCT exploration constant, higher tries more of the less promising moves
+PLAYOUTS = ('random', 'heuristic')
+PARALLEL = ('none', 'root', 'tree')
+PLAYOUT_PLIES = 200 #a playout this long is a draw
+VIRTUAL_LOSS = 3 #lost visits added to each node of a path while its leaf is played out
+BATCH_PER_WORKER = 8 #leaves played out by each worker in one round of tree parallelism
+TIME_CHECK_PLAYOUTS = 16 #playouts between looks at the clock
+ROOT_ROUND = 0.1 #seconds the workers search before the root moves are added up, and the stop event looked at
+MAX_REUSE_PLIES = 2 #how far below the last root the next position is looked for
+MAX_NODES = 200000 #nodes in the tree after which leaves are played out without expanding them
+CHECK_POSITIONS = 20 #positions searched by --check
+LOST_POSITION = '11......2.2.2........... 1 0 0' #checked to give no move, player 1 has two pieces left
+
+#compactState function
+#@param _position the Position, not in the middle of a removal
+#@return the state of _position as (pieces of player 1, pieces of player 2,
+#pieces in hand of player 1 and of player 2, player to move) for playout
+def compactState(_position):
+    return (_position.bits[1], _position.bits[2], _position.inHand[1], _position.inHand[2], _position.turn)
+
+#playout function
+#plays the game from a state to the end with random moves, with the heuristic a
+#move that makes a mill is played if there is one, then one that blocks a mill
+#of an opponent who is still placing
+#@param _state a state from compactState
+#@param _random the random number generator
+#@param _heuristic true to guide the moves, false for uniformly random moves
+#@param _maxPlies the plies after which the game is a draw
+#@param _variant the variants.Variant of the game
+#@return the winning player or 0 for a draw
+def playout(_state, _random, _heuristic=True, _maxPlies=PLAYOUT_PLIES, _variant=engine.STANDARD):
+    allPositions = _variant.allPositions
+    neighborMask = _variant.neighborMask
+    closesMill = _variant.closesMill
+    millMask = _variant.millMask
+    flying = _variant.flying
+    bits = [0, _state[0], _state[1]]
+    hand = [0, _state[2], _state[3]]
+    player = _state[4]
+    choice = _random.choice
+    for ply in xrange(_maxPlies):
+        opponent = player % 2 + 1
+        own = bits[player]
+        other = bits[opponent]
+        onBoard = popCount(own)
+        if onBoard + hand[player] < 3:
+            return opponent
+        empty = allPositions & ~(own | other)
+        if hand[player]:
+            moves = [(-1, t) for t in bitPositions(empty)]
+        elif onBoard <= flying:
+            targets = bitPositions(empty)
+            moves = [(f, t) for f in bitPositions(own) for t in targets]
+        else:
+            moves = [(f, t) for f in bitPositions(own) for t in bitPositions(neighborMask[f] & empty)]
+            if not moves:
+                return opponent
+        move = None
+        if _heuristic:
+            mills = [(f, t) for f, t in moves if closesMill((own & ~bit[f] if f != -1 else own) | bit[t], t)]
+            if mills:
+                move = choice(mills)
+            elif hand[opponent]:
+                blocks = [(f, t) for f, t in moves if closesMill(other | bit[t], t)]
+                if blocks:
+                    move = choice(blocks)
+        if move is None:
+            move = choice(moves)
+        f, t = move
+        if f == -1:
+            hand[player] -= 1
+            own |= bit[t]
+        else:
+            own ^= bit[f] | bit[t]
+        bits[player] = own
+        if closesMill(own, t):
+            removable = other & ~millMask(other) or other
+            bits[opponent] = other ^ bit[choice(bitPositions(removable))]
+        player = opponent
+    return 0
+
+#Node class is a position in the search tree, reached by a compound move
+class Node(object):
+    __slots__ = ['move', 'player', 'parent', 'children', 'untried', 'visits', 'wins', 'winner']
+
+    #__init__ method
+    #@param _move the compound move from the parent or None for the root
+    #@param _player the player who made _move
+    #@param _parent the parent Node or None
+    #@param _position the Position of the node
+    #@param _random the random number generator the untried moves are shuffled with
+    def __init__(self, _move, _player, _parent, _position, _random):
+        self.move = _move
+        self.player = _player
+        self.parent = _parent
+        self.children = []
+        self.winner = None #the winner if the game is over at this node, 0 for a draw
+        if _position.isGameOver():
+            self.winner = _position.winner()
+            self.untried = [] #getCompoundMoves doesn't know the game is over
+        else:
+            self.untried = _position.getCompoundMoves() #moves without a child yet, tried from the end
+            _random.shuffle(self.untried)
+        self.visits = 0
+        self.wins = 0.0 #for the player who made move, a draw counts half
+
+    #update method
+    #@param _winner the winning player of a playout through this node or 0 for a draw
+    def update(self, _winner):
+        self.visits += 1
+        if _winner == self.player:
+            self.wins += 1
+        elif _winner == 0:
+            self.wins += 0.5
+
+    #bestChild method
+    #@param _exploration the UCT exploration constant
+    #@return the child with the highest upper confidence bound
+    def bestChild(self, _exploration):
+        logVisits = math.log(self.visits)
+        best = None
+        bestValue = -1.0
+        for c in self.children:
+            value = c.wins / c.visits + _exploration * math.sqrt(logVisits / c.visits)
+            if value > bestValue:
+                best = c
+                bestValue = value
+        return best
+
+    #mostVisited method
+    #@return the child visited most, the move to play
+    def mostVisited(self):
+        return max(self.children, key=lambda c: c.visits)
+
+    #size method
+    #@return the number of nodes in the tree below this one, itself included
+    def size(self):
+        count = 0
+        stack = [self]
+        while stack:
+            node = stack.pop()
+            count += 1
+            stack.extend(node.children)
+        return count
+
+_worker = None #MctsSearcher of a worker process
+_playoutRandom = None #random number generator of a worker process, made after the fork
+
+#rootSearchTask function
+#runs in a worker process for root parallelism, the worker keeps its tree so
+#the rounds of one search all grow the same tree
+#@param _task a tuple (variant, position text, seconds, playouts, exploration,
+#playout, seed) where variant is the source of the variants.Variant
+#@return a tuple (playouts, [(move, visits, wins), ...]) of what the round added
+#to the root moves
+def rootSearchTask(_task):
+    global _worker
+    source, text, timeLimit, playouts, exploration, kind, seed = _task
+    if _worker is None:
+        _worker = MctsSearcher(_seed=seed)
+    _worker.exploration = exploration
+    _worker.playout = kind
+    before = {}
+    if _worker.root is not None and _worker.rootPosition.variant.source == source and formatPosition(_worker.rootPosition) == text:
+        before = dict([(c.move, (c.visits, c.wins)) for c in _worker.root.children])
+    _worker.findMove(parsePosition(text, variants.getVariant(source)), timeLimit, _playouts=playouts)
+    added = []
+    for c in _worker.root.children:
+        visits, wins = before.get(c.move, (0, 0.0))
+        if c.visits > visits:
+            added.append((c.move, c.visits - visits, c.wins - wins))
+    return (_worker.nodes, added)
+
+#playoutTask function
+#runs in a worker process for tree parallelism
+#@param _task a tuple (variant, states, heuristic) where variant is the source of
+#the variants.Variant and states is a list from compactState
+#@return the list of the winners of a playout from each state
+def playoutTask(_task):
+    global _playoutRandom
+    if _playoutRandom is None:
+        _playoutRandom = random.Random()
+    source, states, heuristic = _task
+    variant = variants.getVariant(source)
+    return [playout(s, _playoutRandom, heuristic, PLAYOUT_PLIES, variant) for s in states]
+
+#MctsSearcher class finds a compound move with Monte Carlo tree search
+class MctsSearcher(object):
+    #__init__ method
+    #@param _timeLimit the seconds allowed for each move
+    #@param _playouts the most playouts for each move or 0 for no limit
+    #@param _exploration the UCT exploration constant
+    #@param _playout 'random' or 'heuristic' playouts
+    #@param _parallel 'none', 'root' or 'tree' parallelism
+    #@param _workers the worker processes for parallel searches
+    #@param _reuse true to keep the tree between moves
+    #@param _seed the seed of the random number generator or None
+    def __init__(self, _timeLimit=DEFAULT_TIME_LIMIT, _playouts=0, _exploration=EXPLORATION, _playout='heuristic',
+                 _parallel='none', _workers=cpu_count(), _reuse=True, _seed=None):
+        if _playout not in PLAYOUTS:
+            raise ValueError('unknown playout ' + _playout)
+        if _parallel not in PARALLEL:
+            raise ValueError('unknown parallelism ' + _parallel)
+        self.timeLimit = _timeLimit
+        self.playouts = _playouts
+        self.exploration = _exploration
+        self.playout = _playout
+        self.parallel = _parallel
+        self.workers = _workers
+        self.reuse = _reuse
+        self.random = random.Random(_seed)
+        self.pool = None #worker processes, started by the first parallel search
+        self.root = None #root Node of the last search
+        self.rootPosition = None #Position of root
+        self.size = 0 #nodes in the tree
+        self.deadline = 0
+        self.stop = None #event that stops the current search
+        #results of the last call to findMove
+        self.nodes = 0 #playouts
+        self.depth = 0 #deepest node reached
+        self.score = 0.0 #share of the playouts won by the best move
+        self.pv = [] #most visited line, a list of compound moves
+        self.elapsed = 0.0 #seconds spent
+        self.reused = 0 #visits of the root kept from the last search
+
+    #clear method
+    #forgets the tree
+    def clear(self):
+        self.root = None
+        self.rootPosition = None
+        self.size = 0
+
+    #close method
+    #stops the worker processes
+    def close(self):
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool = None
+
+    #getPool method
+    #@return the worker processes, or None if the search must stay in this
+    #process because it is itself a daemonic worker (a tournament's)
+    def getPool(self):
+        if self.pool is None and self.workers > 0 and not multiprocessing.current_process().daemon:
+            self.pool = Pool(self.workers)
+        return self.pool
+
+    #findRoot method
+    #@param _position the Position to search
+    #@return the Node of _position in the last tree, at most MAX_REUSE_PLIES
+    #below its root, or a new Node
+    def findRoot(self, _position):
+        if self.reuse and self.root is not None:
+            key = (_position.bits, _position.inHand, _position.turn)
+            frontier = [(self.root, self.rootPosition)]
+            for ply in range(MAX_REUSE_PLIES + 1):
+                below = []
+                for node, position in frontier:
+                    if position.hash == _position.hash and (position.bits, position.inHand, position.turn) == key:
+                        node.parent = None
+                        node.move = None
+                        return node
+                    if ply < MAX_REUSE_PLIES:
+                        for c in node.children:
+                            child = position.copy()
+                            child.makeCompound(c.move)
+                            below.append((c, child))
+                frontier = below
+        self.size = 0
+        return Node(None, _position.turn % 2 + 1, None, _position, self.random)
+
+    #findMove method
+    #searches until the time limit or the playout limit is reached, or it is
+    #stopped, and plays the most visited move
+    #@param _position the Position, it is not changed
+    #@param _timeLimit the seconds to search, timeLimit if None
+    #@param _stop a threading.Event that stops the search when set, or None
+    #@param _playouts the most playouts, playouts if None
+    #@return the best compound move (from, to, remove) for the player to move or
+    #None if there are no moves
+    def findMove(self, _position, _timeLimit=None, _stop=None, _playouts=None):
+        start = time.time()
+        if _timeLimit is None:
+            _timeLimit = self.timeLimit
+        if _playouts is None:
+            _playouts = self.playouts
+        self.deadline = start + _timeLimit
+        self.stop = _stop
+        self.nodes = 0
+        self.depth = 0
+        self.score = 0.0
+        self.pv = []
+        root = self.findRoot(_position)
+        self.root = root
+        self.rootPosition = _position.copy()
+        self.reused = root.visits
+        if self.reused:
+            self.size = root.size()
+        else:
+            self.size = 1
+        if not root.children and not root.untried:
+            self.elapsed = time.time() - start
+            return None
+        pool = None
+        if self.parallel != 'none':
+            pool = self.getPool()
+        if pool is None:
+            self.searchTree(_playouts)
+        elif self.parallel == 'root':
+            self.searchRootParallel(pool, _playouts)
+        else:
+            self.searchTreeParallel(pool, _playouts)
+        if not root.children: #stopped before the first playout, a child without visits would break bestChild
+            self.elapsed = time.time() - start
+            return root.untried[-1]
+        best = root.mostVisited()
+        self.score = best.wins / max(1, best.visits)
+        node = root
+        while node.children:
+            node = node.mostVisited()
+            self.pv.append(node.move)
+        self.elapsed = time.time() - start
+        return best.move
+
+    #searching method
+    #@param _playouts the most playouts or 0 for no limit
+    #@param _deadline the time to stop at, deadline if None
+    #@return true if the search may go on
+    def searching(self, _playouts, _deadline=None):
+        if _playouts and self.nodes >= _playouts:
+            return False
+        if _deadline is None:
+            _deadline = self.deadline
+        return time.time() < _deadline and (self.stop is None or not self.stop.is_set())
+
+    #select method
+    #walks down the tree by UCT from the root and adds a node at the end
+    #@param _position a copy of the root's Position, left at the node returned
+    #@param _virtualLoss the lost visits added to each node on the way
+    #@return the Node reached
+    def select(self, _position, _virtualLoss=0):
+        node = self.root
+        node.visits += _virtualLoss
+        depth = 0
+        while not node.untried and node.children:
+            node = node.bestChild(self.exploration)
+            _position.makeCompound(node.move)
+            node.visits += _virtualLoss
+            depth += 1
+        if node.untried and (self.size < MAX_NODES or not node.children):
+            move = node.untried.pop()
+            player = _position.turn
+            _position.makeCompound(move)
+            child = Node(move, player, node, _position, self.random)
+            node.children.append(child)
+            node = child
+            node.visits += _virtualLoss
+            depth += 1
+            self.size += 1
+        if depth > self.depth:
+            self.depth = depth
+        return node
+
+    #backup method
+    #@param _node the node a playout was made from
+    #@param _winner the winner of the playout or 0 for a draw
+    #@param _virtualLoss the lost visits select added, taken off again
+    def backup(self, _node, _winner, _virtualLoss=0):
+        while _node is not None:
+            _node.visits -= _virtualLoss
+            _node.update(_winner)
+            _node = _node.parent
+
+    #searchTree method
+    #grows the tree in this process
+    #@param _playouts the most playouts or 0 for no limit
+    #@param _deadline the time to stop at, deadline if None
+    def searchTree(self, _playouts, _deadline=None):
+        heuristic = self.playout == 'heuristic'
+        while self.searching(_playouts, _deadline):
+            for i in range(TIME_CHECK_PLAYOUTS):
+                position = self.rootPosition.copy()
+                node = self.select(position)
+                if node.winner is not None: #a finished game has its result without a playout
+                    winner = node.winner
+                else:
+                    winner = playout(compactState(position), self.random, heuristic, PLAYOUT_PLIES, position.variant)
+                self.backup(node, winner)
+                self.nodes += 1
+                if _playouts and self.nodes >= _playouts:
+                    break
+
+    #searchTreeParallel method
+    #grows the tree in this process and plays out batches of its leaves in the workers
+    #@param _pool the worker processes
+    #@param _playouts the most playouts or 0 for no limit
+    def searchTreeParallel(self, _pool, _playouts):
+        heuristic = self.playout == 'heuristic'
+        batch = self.workers * BATCH_PER_WORKER
+        while self.searching(_playouts):
+            if _playouts:
+                batch = min(batch, _playouts - self.nodes)
+            leaves = [] #nodes to play out and their states
+            for i in range(batch):
+                position = self.rootPosition.copy()
+                node = self.select(position, VIRTUAL_LOSS)
+                if node.winner is not None:
+                    self.backup(node, node.winner, VIRTUAL_LOSS)
+                    self.nodes += 1
+                else:
+                    leaves.append((node, compactState(position)))
+            states = [s for node, s in leaves]
+            if not states:
+                continue
+            size = (len(states) + self.workers - 1) // self.workers
+            source = self.rootPosition.variant.source
+            tasks = [(source, states[i:i + size], heuristic) for i in range(0, len(states), size)]
+            winners = sum(_pool.map(playoutTask, tasks), [])
+            for (node, state), winner in zip(leaves, winners):
+                self.backup(node, winner, VIRTUAL_LOSS)
+            self.nodes += len(leaves)
+
+    #searchRootParallel method
+    #in rounds of ROOT_ROUND seconds each worker grows its own tree from the
+    #root while this process grows the kept one, then what the workers added to
+    #the root moves is added to it
+    #@param _pool the worker processes
+    #@param _playouts the most playouts or 0 for no limit
+    def searchRootParallel(self, _pool, _playouts):
+        source = self.rootPosition.variant.source
+        text = formatPosition(self.rootPosition)
+        root = self.root
+        while self.searching(_playouts):
+            share = 0
+            limit = 0
+            if _playouts:
+                share = max(1, (_playouts - self.nodes) // (self.workers + 1))
+                limit = self.nodes + share
+            roundEnd = min(self.deadline, time.time() + ROOT_ROUND)
+            tasks = [(source, text, roundEnd - time.time(), share, self.exploration, self.playout, self.random.getrandbits(32))
+                     for i in range(self.workers)]
+            results = _pool.map_async(rootSearchTask, tasks)
+            self.searchTree(limit, roundEnd)
+            children = dict([(c.move, c) for c in root.children])
+            for playouts, moves in results.get():
+                self.nodes += playouts
+                for move, visits, wins in moves:
+                    child = children.get(move)
+                    if child is None:
+                        position = self.rootPosition.copy()
+                        position.makeCompound(move)
+                        child = Node(move, self.rootPosition.turn, root, position, self.random)
+                        root.children.append(child)
+                        root.untried.remove(move)
+                        children[move] = child
+                        self.size += 1
+                    child.visits += visits
+                    child.wins += wins
+                    root.visits += visits
+
+#runChecks function
+#searches positions reached by random moves with a search stopped before its
+#first playout and then again, reusing the tree, and searches a finished game
+#@param _positions the number of positions to check
+#@return true if every search gave a legal move and left no child unvisited,
+#and the finished game gave no move
+def runChecks(_positions):
+    passed = True
+    rng = random.Random(1)
+    for i in range(_positions):
+        position = engine.Position()
+        for ply in range(rng.randint(0, 40)):
+            if position.isGameOver():
+                break
+            position.makeCompound(rng.choice(position.getCompoundMoves()))
+        if position.isGameOver():
+            continue
+        searcher = MctsSearcher(0.0, _seed=i)
+        text = formatPosition(position)
+        try:
+            moves = [searcher.findMove(position, 0.0), searcher.findMove(position, 0.05)]
+        except Exception, e:
+            print 'FAIL  %s: %s: %s' % (text, type(e).__name__, e)
+            passed = False
+            continue
+        if [m for m in moves if m not in position.getCompoundMoves()]:
+            print 'FAIL  %s: illegal move in %s' % (text, moves)
+            passed = False
+        elif [c for c in searcher.root.children if c.visits == 0]:
+            print 'FAIL  %s: a child without visits was kept' % text
+            passed = False
+        else:
+            print 'ok    %s: stopped search, then %d playouts' % (text, searcher.nodes)
+    position = parsePosition(LOST_POSITION)
+    move = MctsSearcher(0.05, _seed=0).findMove(position)
+    if move is not None:
+        print 'FAIL  %s: move %s in a finished game' % (LOST_POSITION, move)
+        passed = False
+    else:
+        print 'ok    %s: no move in a finished game' % LOST_POSITION
+    return passed
+
+def main():
+    parser = OptionParser(usage='usage: %prog [options] [POSITION]\n\n'
+                          'searches a position, the start if none is given, as board, player to move\n'
+                          'and pieces in hand such as "........................ 1 9 9"')
+    parser.add_option('-t', '--time', type='float', default=1.0,
+                      help='seconds to search [default: %default]')
+    parser.add_option('-n', '--playouts', type='int', default=0,
+                      help='most playouts, 0 for no limit [default: %default]')
+    parser.add_option('-c', '--exploration', type='float', default=EXPLORATION,
+                      help='UCT exploration constant [default: %default]')
+    parser.add_option('-l', '--playout', default='heuristic', choices=PLAYOUTS,
+                      help='random or heuristic playouts [default: %default]')
+    parser.add_option('-P', '--parallel', default='none', choices=PARALLEL,
+                      help='none, root or tree parallelism [default: %default]')
+    parser.add_option('-w', '--workers', type='int', default=cpu_count(),
+                      help='worker processes for parallel searches [default: %default]')
+    parser.add_option('-v', '--variant', default='nine',
+                      help='game to play, %s or a definition file [default: %%default]' % ', '.join(sorted(variants.definitions)))
+    parser.add_option('--check', action='store_true', default=False,
+                      help='check searches stopped before their first playout and exit with 1 if any fails')
+    options, args = parser.parse_args()
+    if options.check:
+        sys.exit(int(not runChecks(CHECK_POSITIONS)))
+    variant = variants.getVariant(options.variant)
+    position = engine.Position(variant)
+    if args:
+        position = parsePosition(' '.join(args), variant)
+    searcher = MctsSearcher(options.time, options.playouts, options.exploration, options.playout,
+                            options.parallel, options.workers)
+    try:
+        move = searcher.findMove(position)
+    finally:
+        searcher.close()
+    print 'move', move
+    print '%d playouts in %.2fs, %.0f playouts/s, depth %d, %d nodes' % (
+        searcher.nodes, searcher.elapsed, searcher.nodes / max(searcher.elapsed, 1e-9), searcher.depth, searcher.size)
+    print 'score %.3f, line %s' % (searcher.score, ' '.join([str(m) for m in searcher.pv]))
+
+if __name__ == '__main__':
+    main()
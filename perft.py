@@ -0,0 +1,188 @@
+#!/usr/bin/python
+
+#perft module
+#counts the leaf nodes of the game tree to a fixed depth to check and time the
+#rules in engine, a ply is a compound move so a mill and its removal count once
+#positions are written as the 24 intersections in position order (1 and 2 for
+#the players' pieces, . for empty) followed by the player to move and the
+#pieces each player still has in hand, e.g. the start is
+#........................ 1 9 9
+#positions of other variants have as many intersections as their board
+
+import sys, time
+from optparse import OptionParser
+import engine
+import variants
+
+START = '........................ 1 9 9'
+SEQUENTIAL_DEPTH = 3 #deepest count also checked with makeMove and removePiece
+
+#perftSuite is a list of (name, position, [node counts from depth 1]), the
+#counts were checked against a separate plain implementation of the rules
+perftSuite = [
+    ('start', START, [24, 552, 12144, 255024, 5140800]),
+    ('placing with mills', '1..12.1....2........2... 1 6 6', [20, 343, 6454, 104332]),
+    ('removal from mills', '...2......1112.......2.. 2 0 0', [56, 2862, 157446, 8594108]),
+    ('sliding', '.1......1.12111.....22.2 1 0 0', [11, 259, 1813, 63674, 710832]),
+    ('flying', '...2.1..2.2....1......1. 1 0 0', [54, 3018, 156782, 8467394]),
+    ('sliding against flying', '.2.122.2.2..1..1.2.22... 2 0 0', [17, 429, 7250, 198310]),
+    ('blocked', '12121212................ 1 0 0', [0, 0]),
+]
+
+#parsePosition function
+#@param _text a position as board, player to move and pieces in hand
+#@param _variant the variants.Variant of the position, the standard game if None
+#@return a new Position
+def parsePosition(_text, _variant=None):
+    position = engine.Position(_variant)
+    fields = _text.split()
+    if len(fields) != 4 or len(fields[0]) != position.variant.size or fields[1] not in ('1', '2'):
+        raise ValueError('bad position ' + _text)
+    position.bits = [0, 0, 0]
+    for i, c in enumerate(fields[0]):
+        if c in '12':
+            position.bits[int(c)] |= engine.bit[i]
+        elif c != '.':
+            raise ValueError('bad intersection %s in %s' % (c, _text))
+    position.turn = int(fields[1])
+    position.inHand = [0, int(fields[2]), int(fields[3])]
+    if max(position.inHand) > position.variant.pieces or min(position.inHand) < 0:
+        raise ValueError('bad pieces in hand in ' + _text)
+    position.removing = False
+    position.hash = position.computeHash()
+    return position
+
+#formatPosition function
+#@param _position the Position
+#@return _position in the form read by parsePosition
+def formatPosition(_position):
+    board = ''.join([str(_position.getPlayer(i)) if _position.getPlayer(i) else '.' for i in range(_position.variant.size)])
+    return '%s %d %d %d' % (board, _position.turn, _position.inHand[1], _position.inHand[2])
+
+#perft function
+#@param _position the Position, it is left as it was
+#@param _depth the depth to count to
+#@return the number of positions _depth plies from _position
+def perft(_position, _depth):
+    if _position.isGameOver():
+        return 0
+    moves = _position.getCompoundMoves()
+    if _depth == 1:
+        return len(moves)
+    nodes = 0
+    for m in moves:
+        _position.makeCompound(m)
+        nodes += perft(_position, _depth - 1)
+        _position.unmakeCompound(m)
+    return nodes
+
+#perftSequential function
+#counts like perft but plays moves with makeMove and removePiece as the GUI
+#does, on copies of the position, to check them against the compound moves
+#@param _position the Position
+#@param _depth the depth to count to
+#@return the number of positions _depth plies from _position
+def perftSequential(_position, _depth):
+    if _position.isGameOver():
+        return 0
+    nodes = 0
+    for f, t in _position.getMoves():
+        position = _position.copy()
+        if position.makeMove(f, t):
+            removals = position.getRemovals()
+        else:
+            removals = [-1]
+        for r in removals:
+            after = position
+            if r != -1:
+                after = position.copy()
+                after.removePiece(r)
+            if _depth == 1:
+                nodes += 1
+            else:
+                nodes += perftSequential(after, _depth - 1)
+    return nodes
+
+#divide function
+#@param _position the Position
+#@param _depth the depth to count to, at least 1
+#@return a list of (move, nodes) with the count below each move
+def divide(_position, _depth):
+    counts = []
+    if _position.isGameOver():
+        return counts
+    for m in _position.getCompoundMoves():
+        _position.makeCompound(m)
+        if _depth == 1:
+            counts.append((m, 1))
+        else:
+            counts.append((m, perft(_position, _depth - 1)))
+        _position.unmakeCompound(m)
+    return counts
+
+#runSuite function
+#checks the node counts of perftSuite up to _maxDepth
+#@param _maxDepth the deepest count to check
+#@return true if every count matched
+def runSuite(_maxDepth):
+    passed = True
+    totalNodes = 0
+    seconds = 0.0 #time in perft only
+    for name, text, counts in perftSuite:
+        position = parsePosition(text)
+        for depth, expected in enumerate(counts[:_maxDepth], 1):
+            start = time.time()
+            nodes = perft(position, depth)
+            seconds += time.time() - start
+            totalNodes += nodes
+            if nodes == expected:
+                print 'ok    %s depth %d: %d' % (name, depth, nodes)
+            else:
+                print 'FAIL  %s depth %d: %d, expected %d' % (name, depth, nodes, expected)
+                passed = False
+            if depth <= SEQUENTIAL_DEPTH and perftSequential(position, depth) != nodes:
+                print 'FAIL  %s depth %d: makeMove and removePiece give a different count' % (name, depth)
+                passed = False
+            if formatPosition(position) != text or position.hash != position.computeHash():
+                print 'FAIL  %s depth %d: position changed' % (name, depth)
+                passed = False
+    print '%d nodes in %.2fs, %.0f nodes/s' % (totalNodes, seconds, totalNodes / max(seconds, 1e-9))
+    return passed
+
+def main():
+    parser = OptionParser(usage='usage: %prog [options]')
+    parser.add_option('-p', '--position',
+                      help='position to count from [default: the start]')
+    parser.add_option('-v', '--variant', default='nine',
+                      help='game to count, %s or a definition file [default: %%default]' % ', '.join(sorted(variants.definitions)))
+    parser.add_option('-d', '--depth', type='int', default=4,
+                      help='depth to count to, or the deepest count checked [default: %default]')
+    parser.add_option('--divide', action='store_true', default=False,
+                      help='show the count below each move')
+    parser.add_option('--check', action='store_true', default=False,
+                      help='check the known node counts and exit with 1 if any is wrong')
+    options, args = parser.parse_args()
+    if options.depth < 1:
+        parser.error('depth must be at least 1')
+    if options.check:
+        sys.exit(int(not runSuite(options.depth)))
+    try:
+        variant = variants.getVariant(options.variant)
+        position = engine.Position(variant)
+        if options.position is not None:
+            position = parsePosition(options.position, variant)
+    except ValueError, e:
+        parser.error(str(e))
+    start = time.time()
+    if options.divide:
+        counts = divide(position, options.depth)
+        for m, nodes in counts:
+            print '%s: %d' % (m, nodes)
+        nodes = sum([n for m, n in counts])
+    else:
+        nodes = perft(position, options.depth)
+    seconds = time.time() - start
+    print 'depth %d: %d nodes in %.2fs, %.0f nodes/s' % (options.depth, nodes, seconds, nodes / max(seconds, 1e-9))
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,144 @@
+#!/usr/bin/python
+
+#players module
+#headless AI players for self-play, each makes a whole turn on a Position
+#players are made from spec strings such as search:time=0.05,depth=6 or greedy
+
+import os
+import search
+import evaluation
+import mcts
+import greedy
+import endgame
+import wdl
+import book
+from transposition import TranspositionTable
+
+#SearchPlayer class plays the alpha-beta search AI
+class SearchPlayer(object):
+    #__init__ method
+    #@param _timeLimit the seconds to search each move
+    #@param _maxDepth the deepest iteration to search
+    #@param _hashMB the size of the transposition table in megabytes
+    #@param _book the opening book file or None
+    #@param _endgame the endgame table directory or None
+    #@param _wdl the wdl table directory or None
+    #@param _weights the evaluation weights file made by learn.py or None for the hand-tuned weights
+    def __init__(self, _timeLimit=search.DEFAULT_TIME_LIMIT, _maxDepth=search.MAX_DEPTH, _hashMB=16,
+                 _book=None, _endgame=None, _wdl=None, _weights=None):
+        if _endgame is not None:
+            _endgame = endgame.EndgameDatabase(_endgame)
+        if _wdl is not None:
+            _wdl = wdl.WdlDatabase(_wdl)
+        if _weights is not None:
+            if not os.path.exists(_weights):
+                raise ValueError('no weights file ' + _weights)
+            _weights = evaluation.loadWeights(_weights)
+        self.searcher = search.Searcher(_timeLimit, _maxDepth, TranspositionTable(_hashMB), _endgame, _wdl, _weights)
+        self.book = book.OpeningBook(_book)
+
+    #newGame method
+    #forgets what was learned in the last game
+    def newGame(self):
+        self.searcher.table.clear()
+
+    #play method
+    #@param _position the Position, the player to move makes their move on it
+    #@param _random the random number generator of the game
+    #@return the compound move made
+    def play(self, _position, _random):
+        move = self.book.lookup(_position)
+        if move is None:
+            move = self.searcher.findMove(_position)
+        _position.makeCompound(move)
+        return move
+
+#MctsPlayer class plays the Monte Carlo tree search AI
+class MctsPlayer(object):
+    #__init__ method
+    #@param _timeLimit the seconds to search each move
+    #@param _playouts the most playouts each move or 0 for no limit
+    #@param _exploration the UCT exploration constant
+    #@param _playout 'random' or 'heuristic' playouts
+    #@param _parallel 'none', 'root' or 'tree' parallelism
+    #@param _workers the worker processes for parallel searches
+    #@param _reuse 1 to keep the tree between moves, 0 to start each search afresh
+    def __init__(self, _timeLimit=mcts.DEFAULT_TIME_LIMIT, _playouts=0, _exploration=mcts.EXPLORATION,
+                 _playout='heuristic', _parallel='none', _workers=2, _reuse=1):
+        self.searcher = mcts.MctsSearcher(_timeLimit, _playouts, _exploration, _playout, _parallel, _workers, _reuse != 0)
+
+    #newGame method
+    #forgets the tree of the last game
+    def newGame(self):
+        self.searcher.clear()
+
+    #play method
+    #@param _position the Position, the player to move makes their move on it
+    #@param _random the random number generator of the game
+    #@return the compound move made
+    def play(self, _position, _random):
+        move = self.searcher.findMove(_position)
+        _position.makeCompound(move)
+        return move
+
+#GreedyPlayer class plays the original AI
+class GreedyPlayer(object):
+    def newGame(self):
+        pass
+
+    #play method
+    #@param _position the Position, the player to move makes their move on it
+    #@param _random the random number generator of the game
+    #@return the compound move made
+    def play(self, _position, _random):
+        player = _position.turn
+        f, t = greedy.bestMove(_position, player, _random)
+        r = -1
+        if _position.makeMove(f, t):
+            r = greedy.pieceToRemove(_position, player, _random)
+            _position.removePiece(r)
+        return (f, t, r)
+
+#RandomPlayer class plays random moves
+class RandomPlayer(object):
+    def newGame(self):
+        pass
+
+    #play method
+    #@param _position the Position, the player to move makes their move on it
+    #@param _random the random number generator of the game
+    #@return the compound move made
+    def play(self, _position, _random):
+        move = _random.choice(_position.getCompoundMoves())
+        _position.makeCompound(move)
+        return move
+
+#options of each kind of player as (spec name, argument, conversion)
+playerOptions = {
+    'search': [('time', '_timeLimit', float), ('depth', '_maxDepth', int), ('hash', '_hashMB', int),
+               ('book', '_book', str), ('endgame', '_endgame', str), ('wdl', '_wdl', str), ('weights', '_weights', str)],
+    'mcts': [('time', '_timeLimit', float), ('playouts', '_playouts', int), ('c', '_exploration', float),
+             ('playout', '_playout', str), ('parallel', '_parallel', str), ('workers', '_workers', int),
+             ('reuse', '_reuse', int)],
+    'greedy': [],
+    'random': []
+}
+playerClasses = {'search': SearchPlayer, 'mcts': MctsPlayer, 'greedy': GreedyPlayer, 'random': RandomPlayer}
+standardOnly = ['search', 'greedy'] #kinds whose evaluation, tables and book are made for the standard board
+
+#makePlayer function
+#@param _spec the kind of player and its options as kind:name=value,name=value
+#@return the new player
+def makePlayer(_spec):
+    kind, sep, rest = _spec.partition(':')
+    if kind not in playerClasses:
+        raise ValueError('unknown player kind ' + kind)
+    options = dict([(name, (argument, convert)) for name, argument, convert in playerOptions[kind]])
+    arguments = {}
+    for item in filter(None, rest.split(',')):
+        name, sep, value = item.partition('=')
+        if name not in options:
+            raise ValueError('unknown option %s for %s' % (name, kind))
+        argument, convert = options[name]
+        arguments[argument] = convert(value)
+    return playerClasses[kind](**arguments)
@@ -0,0 +1,180 @@
+#!/usr/bin/python
+
+#positionindex module
+#dense numbering of the positions with a given number of pieces for each side,
+#used to store solved positions in flat tables
+#a pair (mover, other) of disjoint masks with a and b pieces is numbered
+#rank(mover) * C(24 - a, b) + rank(other packed into the 24 - a free points)
+#where rank is the colexicographic rank of a set of points, so every number
+#below C(24, a) * C(24 - a, b) is used by exactly one pair
+#the symmetry reduced numbering moves the pair by the symmetry that makes the
+#mover's mask smallest and numbers only those smallest masks, about a
+#sixteenth of the entries
+
+from array import array
+from engine import popCount, ALL_POSITIONS
+from symmetry import canonicalMasks
+
+#binomial[n][k] is n choose k
+binomial = [[0] * 25 for n in range(25)]
+for n in range(25):
+    binomial[n][0] = 1
+    for k in range(1, n + 1):
+        binomial[n][k] = binomial[n - 1][k - 1] + binomial[n - 1][k]
+
+_byteCount = [bin(b).count('1') for b in range(256)]
+
+#_rankTables[r][b][c] is the part of the rank of a mask given by byte b of the
+#mask at byte r when c points are set in the lower bytes
+#each row is the row of b without its highest point q plus the term for q, as are
+#the rows of the extract and deposit tables below, so the tables build quickly
+_highBit = [0] + [b.bit_length() - 1 for b in range(1, 256)]
+_rankTables = []
+for r in range(3):
+    table = [[0] * 25]
+    for b in range(1, 256):
+        q = _highBit[b]
+        n = r * 8 + q
+        i = _byteCount[b] - 1 #points of b below q
+        table.append([t + binomial[n][c + i + 1] if c + i + 1 <= n else t for c, t in enumerate(table[b ^ (1 << q)])])
+    _rankTables.append(table)
+
+#_extractTables[f][b] packs the bits of byte b that are set in byte f into the
+#low bits, _depositTables[f][b] does the reverse
+_extractTables = [[0] * 256]
+_depositTables = [[0] * 256]
+for f in range(1, 256):
+    q = _highBit[f]
+    i = _byteCount[f] - 1
+    _extractTables.append([e | (((b >> q) & 1) << i) for b, e in enumerate(_extractTables[f ^ (1 << q)])])
+    _depositTables.append([d | (((b >> i) & 1) << q) for b, d in enumerate(_depositTables[f ^ (1 << q)])])
+
+_sortedMasks = {}
+_representatives = {}
+
+#rankMask function
+#@param _mask a 24 bit mask
+#@return the rank of _mask among the masks with as many bits set
+def rankMask(_mask):
+    b0 = _mask & 255
+    b1 = (_mask >> 8) & 255
+    c = _byteCount[b0]
+    return _rankTables[0][b0][0] + _rankTables[1][b1][c] + _rankTables[2][_mask >> 16][c + _byteCount[b1]]
+
+#extractMask function
+#@param _mask a 24 bit mask
+#@param _points a mask of the points to keep
+#@return the bits of _mask at _points packed together into the low bits
+def extractMask(_mask, _points):
+    f0 = _points & 255
+    f1 = (_points >> 8) & 255
+    c0 = _byteCount[f0]
+    return _extractTables[f0][_mask & 255] | (_extractTables[f1][(_mask >> 8) & 255] << c0) | \
+           (_extractTables[_points >> 16][_mask >> 16] << (c0 + _byteCount[f1]))
+
+#depositMask function
+#@param _packed bits packed into the low bits
+#@param _points a mask of the points to spread them to
+#@return the inverse of extractMask
+def depositMask(_packed, _points):
+    f0 = _points & 255
+    f1 = (_points >> 8) & 255
+    c0 = _byteCount[f0]
+    c1 = _byteCount[f1]
+    return _depositTables[f0][_packed & ((1 << c0) - 1)] | \
+           (_depositTables[f1][(_packed >> c0) & ((1 << c1) - 1)] << 8) | \
+           (_depositTables[_points >> 16][_packed >> (c0 + c1)] << 16)
+
+#sortedMasks function
+#@param _count the number of bits set
+#@return an array of all 24 bit masks with _count bits set in increasing order,
+#which is also their rank order
+def sortedMasks(_count):
+    masks = _sortedMasks.get(_count)
+    if masks is None:
+        masks = array('I')
+        if _count == 0:
+            masks.append(0)
+        else:
+            m = (1 << _count) - 1
+            while m <= ALL_POSITIONS:
+                masks.append(m)
+                low = m & -m #next mask with as many bits
+                ripple = m + low
+                m = ripple | (((m ^ ripple) >> 2) // low)
+        _sortedMasks[_count] = masks
+    return masks
+
+#pairCount function
+#@param _a the number of pieces of the player to move
+#@param _b the number of pieces of the other player
+#@return the number of positions with _a and _b pieces
+def pairCount(_a, _b):
+    return binomial[24][_a] * binomial[24 - _a][_b]
+
+#rankPair function
+#@param _mover the mask of the player to move
+#@param _other the mask of the other player
+#@return the index of the pair among all pairs with the same piece counts
+def rankPair(_mover, _other):
+    free = ALL_POSITIONS & ~_mover
+    return rankMask(_mover) * binomial[24 - popCount(_mover)][popCount(_other)] + rankMask(extractMask(_other, free))
+
+#unrankPair function
+#@param _a the number of pieces of the player to move
+#@param _b the number of pieces of the other player
+#@param _index the index of the pair
+#@return the pair (mover, other) numbered _index
+def unrankPair(_a, _b, _index):
+    mover = sortedMasks(_a)[_index // binomial[24 - _a][_b]]
+    other = depositMask(sortedMasks(_b)[_index % binomial[24 - _a][_b]], ALL_POSITIONS & ~mover)
+    return (mover, other)
+
+#representatives function
+#the smallest mask of every class of masks equal up to a symmetry of the board,
+#worked out on first use for each piece count
+#@param _count the number of bits set
+#@return a tuple (masks, numbers) of an array of the representatives in
+#increasing order and an array giving the number of the representative for
+#each mask rank, -1 for masks that aren't representatives
+def representatives(_count):
+    result = _representatives.get(_count)
+    if result is None:
+        masks = array('I')
+        numbers = array('i')
+        for m in sortedMasks(_count):
+            if canonicalMasks(m, 0)[1] == m:
+                numbers.append(len(masks))
+                masks.append(m)
+            else:
+                numbers.append(-1)
+        result = (masks, numbers)
+        _representatives[_count] = result
+    return result
+
+#symmetricCount function
+#@param _a the number of pieces of the player to move
+#@param _b the number of pieces of the other player
+#@return the number of symmetry reduced indices of the positions with _a and _b pieces
+def symmetricCount(_a, _b):
+    return len(representatives(_a)[0]) * binomial[24 - _a][_b]
+
+#rankSymmetric function
+#@param _mover the mask of the player to move
+#@param _other the mask of the other player
+#@return the index of the pair, the same for all pairs equal up to a symmetry
+def rankSymmetric(_mover, _other):
+    s, mover, other = canonicalMasks(_mover, _other)
+    a = popCount(mover)
+    return representatives(a)[1][rankMask(mover)] * binomial[24 - a][popCount(other)] + \
+           rankMask(extractMask(other, ALL_POSITIONS & ~mover))
+
+#unrankSymmetric function
+#@param _a the number of pieces of the player to move
+#@param _b the number of pieces of the other player
+#@param _index the symmetry reduced index
+#@return a pair (mover, other) with index _index
+def unrankSymmetric(_a, _b, _index):
+    mover = representatives(_a)[0][_index // binomial[24 - _a][_b]]
+    other = depositMask(sortedMasks(_b)[_index % binomial[24 - _a][_b]], ALL_POSITIONS & ~mover)
+    return (mover, other)
@@ -0,0 +1,333 @@
+#!/usr/bin/python
+
+#profiling module
+#opt-in instrumentation of the AI and the rules, nothing is changed until a
+#Profiler is started
+#instrument mode wraps the hot functions (move generation, mills, paths, the
+#greedy AI's values and the searches, labelled by stage) and counts their calls
+#and time, trace mode also keeps every call as an event for a Chrome trace and
+#sample mode leaves the code alone and looks at the stacks of all threads every
+#few milliseconds from a background thread, which costs far less
+#results are saved in the format of cProfile, readable with pstats, or as Chrome
+#trace JSON for chrome://tracing in trace mode
+#scripts are profiled with: profiling.py [options] SCRIPT [ARGS]
+#only the process the Profiler is started in is profiled, the work of the worker
+#processes of a multiprocessing pool is not counted, so profile tools that
+#use a pool with one process in the pool or look at the workers another way
+
+import sys, os, time, threading, marshal, json, types
+from optparse import OptionParser
+import engine
+import greedy
+import search
+
+MODES = ('instrument', 'trace', 'sample')
+SAMPLE_INTERVAL = 0.005 #seconds between samples
+MAX_TRACE_EVENTS = 1000000 #events kept in trace mode, later calls are only counted
+REPORT_LINES = 25
+
+current = None #the Profiler started last and not yet stopped
+
+#defaultTargets function
+#@return the functions instrumented by default as (owner, attribute, label)
+#where label is None for the function's name or a function of the arguments,
+#functions are instrumented where their callers look them up: greedy's own
+#name for shortestPath and the standard Variant's closesMill, which the rules
+#call for every mill check
+def defaultTargets():
+    return [(engine.Position, 'getMoves', None),
+            (engine.Position, 'getCompoundMoves', None),
+            (engine.STANDARD, 'closesMill', None),
+            (greedy, 'shortestPath', None),
+            (greedy, 'bestMove', lambda _position, _player, *args: 'greedy.bestMove stage %d' % _position.stage(_player)),
+            (greedy, 'intersectionValue', None),
+            (greedy, 'pathValue', None),
+            (greedy, 'pieceToRemove', None),
+            (search.Searcher, 'findMove',
+             lambda self, _position, *args: 'Searcher.findMove stage %d' % _position.stage(_position.turn))]
+
+#NullSection class is the section returned when nothing is being instrumented
+class NullSection(object):
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exception):
+        return False
+
+NULL_SECTION = NullSection()
+
+#Section class times a block of code for a Profiler
+class Section(object):
+    #__init__ method
+    #@param _profiler the Profiler
+    #@param _key the key of the block as (file, line, name)
+    def __init__(self, _profiler, _key):
+        self.profiler = _profiler
+        self.key = _key
+
+    def __enter__(self):
+        self.start = self.profiler.enter(self.key)
+        return self
+
+    def __exit__(self, *exception):
+        self.profiler.exit(self.key, self.start)
+        return False
+
+#Profiler class records where the time goes
+class Profiler(object):
+    #__init__ method
+    #@param _mode 'instrument', 'trace' or 'sample'
+    #@param _interval the seconds between samples in sample mode
+    def __init__(self, _mode, _interval=SAMPLE_INTERVAL):
+        if _mode not in MODES:
+            raise ValueError('unknown profiling mode ' + _mode)
+        self.mode = _mode
+        self.interval = _interval
+        self.stats = {} #(file, line, name) to [calls, own seconds, total seconds]
+        self.events = [] #Chrome trace events in trace mode
+        self.lock = threading.Lock()
+        self.local = threading.local() #stack of the calls being timed in each thread
+        self.patched = [] #(owner, attribute, original) to put back
+        self.sampler = None
+        self.running = False
+        self.startTime = time.time()
+
+    #start method
+    #@param _targets the functions to instrument as (owner, attribute, label),
+    #added to defaultTargets, ignored in sample mode
+    def start(self, _targets=[]):
+        global current
+        current = self
+        self.running = True
+        self.startTime = time.time()
+        if self.mode == 'sample':
+            self.sampler = threading.Thread(target=self.sampleLoop, name='Profiler')
+            self.sampler.daemon = True
+            self.sampler.start()
+        else:
+            for owner, attribute, label in defaultTargets() + list(_targets):
+                self.instrument(owner, attribute, label)
+
+    #stop method
+    #stops sampling and puts the instrumented functions back
+    def stop(self):
+        global current
+        if current is self:
+            current = None
+        self.running = False
+        if self.sampler is not None:
+            self.sampler.join()
+            self.sampler = None
+        for owner, attribute, original in reversed(self.patched):
+            setattr(owner, attribute, original)
+        self.patched = []
+
+    #instrument method
+    #@param _owner the module, class or object holding the function
+    #@param _attribute the name of the function
+    #@param _label None to label calls with the function's name or a function
+    #of the call's arguments giving the label
+    def instrument(self, _owner, _attribute, _label=None):
+        original = _owner.__dict__[_attribute]
+        function = getattr(original, 'im_func', original)
+        code = function.func_code
+        name = getattr(_owner, '__name__', type(_owner).__name__) + '.' + _attribute
+        profiler = self
+        def wrapper(*args, **kwargs):
+            key = (code.co_filename, code.co_firstlineno, name if _label is None else _label(*args, **kwargs))
+            start = profiler.enter(key)
+            try:
+                return function(*args, **kwargs)
+            finally:
+                profiler.exit(key, start)
+        wrapper.__name__ = function.__name__
+        wrapper.__doc__ = function.__doc__
+        setattr(_owner, _attribute, wrapper)
+        self.patched.append((_owner, _attribute, original))
+
+    #section method
+    #@param _name the name of a block of code
+    #@param _frames how far up the stack the block is, 1 for the caller
+    #@return a context manager timing the block
+    def section(self, _name, _frames=1):
+        if self.mode == 'sample':
+            return NULL_SECTION
+        caller = sys._getframe(_frames)
+        return Section(self, (caller.f_code.co_filename, caller.f_lineno, _name))
+
+    #enter method
+    #@param _key the key of the call
+    #@return the start time of the call
+    def enter(self, _key):
+        stack = getattr(self.local, 'stack', None)
+        if stack is None:
+            stack = self.local.stack = []
+        stack.append([_key, 0.0]) #key and time spent in timed calls below
+        return time.time()
+
+    #exit method
+    #@param _key the key of the call
+    #@param _start the start time of the call
+    def exit(self, _key, _start):
+        elapsed = time.time() - _start
+        stack = self.local.stack
+        key, below = stack.pop()
+        if stack:
+            stack[-1][1] += elapsed
+        outermost = True #recursive calls count once in the total
+        for k, b in stack:
+            if k == _key:
+                outermost = False
+                break
+        self.lock.acquire()
+        try:
+            entry = self.stats.get(_key)
+            if entry is None:
+                entry = self.stats[_key] = [0, 0.0, 0.0]
+            entry[0] += 1
+            entry[1] += elapsed - below
+            if outermost:
+                entry[2] += elapsed
+            if self.mode == 'trace' and len(self.events) < MAX_TRACE_EVENTS:
+                self.events.append({'name': _key[2], 'ph': 'X', 'pid': os.getpid(),
+                                    'tid': threading.current_thread().ident,
+                                    'ts': int((_start - self.startTime) * 1e6), 'dur': int(elapsed * 1e6)})
+        finally:
+            self.lock.release()
+
+    #sampleLoop method
+    #the sampling thread, charges the time since the last sample to the function
+    #running in each thread (own time) and to every function on its stack (total)
+    def sampleLoop(self):
+        me = threading.current_thread().ident
+        last = time.time()
+        while self.running:
+            time.sleep(self.interval)
+            now = time.time()
+            elapsed = now - last
+            last = now
+            frames = sys._current_frames()
+            self.lock.acquire()
+            try:
+                for ident, frame in frames.items():
+                    if ident == me:
+                        continue
+                    seen = set()
+                    top = True
+                    while frame is not None:
+                        code = frame.f_code
+                        key = (code.co_filename, code.co_firstlineno, code.co_name)
+                        if key not in seen:
+                            seen.add(key)
+                            entry = self.stats.get(key)
+                            if entry is None:
+                                entry = self.stats[key] = [0, 0.0, 0.0]
+                            entry[0] += 1 #samples the function was seen in
+                            entry[2] += elapsed
+                            if top:
+                                entry[1] += elapsed
+                        top = False
+                        frame = frame.f_back
+            finally:
+                self.lock.release()
+
+    #report method
+    #@param _lines the most functions to list
+    #@return a text table of the functions taking the most total time
+    def report(self, _lines=REPORT_LINES):
+        count = 'samples' if self.mode == 'sample' else 'calls'
+        rows = ['%10s %10s %10s %10s  %s' % (count, 'total ms', 'own ms', 'us/call', 'function')]
+        for key, (calls, own, total) in sorted(self.stats.items(), key=lambda item: -item[1][2])[:_lines]:
+            rows.append('%10d %10.1f %10.1f %10.1f  %s (%s:%d)' % (calls, 1000 * total, 1000 * own, 1e6 * total / max(1, calls),
+                                                                   key[2], os.path.basename(key[0]), key[1]))
+        return '\n'.join(rows)
+
+    #writeProfile method
+    #@param _path the file to write the results to in the format of cProfile,
+    #for pstats.Stats(_path)
+    def writeProfile(self, _path):
+        stats = {}
+        for key, (calls, own, total) in self.stats.items():
+            stats[key] = (calls, calls, own, total, {})
+        f = open(_path, 'wb')
+        try:
+            marshal.dump(stats, f)
+        finally:
+            f.close()
+
+    #writeTrace method
+    #@param _path the file to write the trace events to as Chrome trace JSON
+    def writeTrace(self, _path):
+        f = open(_path, 'w')
+        try:
+            json.dump({'traceEvents': self.events, 'displayTimeUnit': 'ms'}, f)
+        finally:
+            f.close()
+
+    #save method
+    #@param _path the file to write, a Chrome trace in trace mode and a cProfile
+    #file otherwise
+    def save(self, _path):
+        if self.mode == 'trace':
+            self.writeTrace(_path)
+        else:
+            self.writeProfile(_path)
+
+#section function
+#@param _name the name of a block of code
+#@return a context manager timing the block for the current Profiler, which
+#does nothing if there is none
+def section(_name):
+    if current is None:
+        return NULL_SECTION
+    return current.section(_name, 2)
+
+#defaultPath function
+#@param _mode the profiling mode
+#@return the file the results are saved to if no other is given
+def defaultPath(_mode):
+    if _mode == 'trace':
+        return 'profile.json'
+    return 'profile.prof'
+
+def main():
+    parser = OptionParser(usage='usage: %prog [options] SCRIPT [ARGS]')
+    parser.disable_interspersed_args()
+    parser.add_option('-m', '--mode', default='instrument', choices=MODES,
+                      help='instrument, trace or sample [default: %default]')
+    parser.add_option('-o', '--output',
+                      help='file to save the results to [default: profile.prof, profile.json in trace mode]')
+    parser.add_option('-i', '--interval', type='float', default=SAMPLE_INTERVAL,
+                      help='seconds between samples in sample mode [default: %default]')
+    parser.add_option('-n', '--lines', type='int', default=REPORT_LINES,
+                      help='functions to list [default: %default]')
+    options, args = parser.parse_args()
+    if not args:
+        parser.error('give a script to profile')
+    sys.argv = args
+    sys.path.insert(0, os.path.dirname(os.path.abspath(args[0])))
+    #the script runs as the real __main__ module so the functions it defines can
+    #be pickled for the worker processes of a pool
+    script = types.ModuleType('__main__')
+    script.__file__ = args[0]
+    mainModule = sys.modules['__main__']
+    sys.modules['__main__'] = script
+    profiler = Profiler(options.mode, options.interval)
+    profiler.start()
+    try:
+        try:
+            with profiler.section(os.path.basename(args[0])): #the whole run, so the profile is never empty
+                execfile(args[0], script.__dict__)
+        except SystemExit:
+            pass
+    finally:
+        profiler.stop()
+        sys.modules['__main__'] = mainModule
+        output = options.output or defaultPath(options.mode)
+        profiler.save(output)
+        print >>sys.stderr, profiler.report(options.lines)
+        print >>sys.stderr, 'saved to', output
+        print >>sys.stderr, 'only this process was profiled, the work of pool worker processes is not counted'
+
+if __name__ == '__main__':
+    main()
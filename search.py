@@ -0,0 +1,217 @@
+#!/usr/bin/python
+
+#search module
+#negamax search with alpha-beta pruning and iterative deepening for the AI,
+#moves are compound moves (from, to, remove) so a mill and its removal are
+#searched as one ply
+
+import time
+from evaluation import EvaluationState, WEIGHTS
+from transposition import TranspositionTable, EXACT, LOWER, UPPER
+
+WIN_SCORE = 100000 #score of a won position, less the number of plies to reach it
+INFINITY = 1000000
+MAX_DEPTH = 64
+WIN_RANGE = 4096 #scores this close to WIN_SCORE are wins, endgame tables reach far past MAX_DEPTH
+KNOWN_WIN_SCORE = WIN_SCORE // 2 #added to the evaluation of a position the wdl tables say is won
+DEFAULT_TIME_LIMIT = 0.02 #seconds for each move, leaves room for a frame at 30 FPS
+TIME_CHECK_NODES = 32 #nodes searched between looks at the clock
+
+#SearchTimeout exception is raised inside the search when the time limit is reached or it is stopped
+class SearchTimeout(Exception):
+    pass
+
+#orderMoves function
+#@param _moves a list of compound moves
+#@param _first a move to search before all others or None
+#@return _moves with _first and then the moves that make a mill first
+def orderMoves(_moves, _first=None):
+    return sorted(_moves, key=lambda m: (m != _first, m[2] == -1))
+
+#toTableScore function
+#@param _score a score from the search
+#@param _ply the distance from the root
+#@return _score with wins and losses counted from the current position for storing
+def toTableScore(_score, _ply):
+    if _score >= WIN_SCORE - WIN_RANGE:
+        return _score + _ply
+    if _score <= WIN_RANGE - WIN_SCORE:
+        return _score - _ply
+    return _score
+
+#fromTableScore function
+#@param _score a score from the transposition table
+#@param _ply the distance from the root
+#@return _score with wins and losses counted from the root
+def fromTableScore(_score, _ply):
+    if _score >= WIN_SCORE - WIN_RANGE:
+        return _score - _ply
+    if _score <= WIN_RANGE - WIN_SCORE:
+        return _score + _ply
+    return _score
+
+#endgameScore function
+#@param _value a value from the endgame tables
+#@param _ply the distance from the root
+#@return _value as a score counted from the root
+def endgameScore(_value, _ply):
+    if _value > 0:
+        return WIN_SCORE - _ply - _value
+    if _value < 0:
+        return _ply - _value - 1 - WIN_SCORE
+    return 0
+
+#Searcher class finds the best compound move for a position
+class Searcher(object):
+    #__init__ method
+    #@param _timeLimit the seconds allowed for each move
+    #@param _maxDepth the deepest iteration to search
+    #@param _table the TranspositionTable to use, a new one if None
+    #@param _endgame the endgame.EndgameDatabase to look positions up in or None
+    #@param _wdl the wdl.WdlDatabase to look positions up in when _endgame doesn't have them or None
+    #@param _weights the evaluation weights, a weight for each of evaluation.FEATURES, WEIGHTS if None
+    def __init__(self, _timeLimit=DEFAULT_TIME_LIMIT, _maxDepth=MAX_DEPTH, _table=None, _endgame=None, _wdl=None,
+                 _weights=None):
+        self.timeLimit = _timeLimit
+        self.maxDepth = _maxDepth
+        if _table is None:
+            _table = TranspositionTable()
+        self.table = _table
+        self.endgame = _endgame
+        self.wdl = _wdl
+        if _weights is None:
+            _weights = WEIGHTS
+        self.weights = _weights
+        self.deadline = 0
+        self.stop = None #event that stops the current search
+        self.evaluation = None #EvaluationState kept in step with the searched position
+        self.pvLines = [[] for i in range(MAX_DEPTH + 2)] #best line found from each ply
+        #results of the last call to findMove
+        self.nodes = 0 #nodes searched
+        self.depth = 0 #deepest completed iteration
+        self.score = 0 #score of the best move for the player to move
+        self.pv = [] #principal variation, a list of compound moves
+        self.elapsed = 0.0 #seconds spent
+
+    #findMove method
+    #searches one iteration deeper at a time until the time limit or maximum depth
+    #is reached, or it is stopped, and keeps the result of the last completed iteration
+    #@param _position the Position, it is not changed
+    #@param _timeLimit the seconds to search, timeLimit if None
+    #@param _stop a threading.Event that stops the search when set, or None
+    #@return the best compound move (from, to, remove) for the player to move or
+    #None if there are no moves
+    def findMove(self, _position, _timeLimit=None, _stop=None):
+        start = time.time()
+        if _timeLimit is None:
+            _timeLimit = self.timeLimit
+        self.deadline = start + _timeLimit
+        self.stop = _stop
+        self.nodes = 0
+        self.depth = 0
+        self.score = 0
+        self.pv = []
+        self.table.newSearch()
+        position = _position.copy() #an aborted search leaves its position half played
+        self.evaluation = EvaluationState(position, self.weights)
+        moves = orderMoves(position.getCompoundMoves())
+        if not moves:
+            self.elapsed = time.time() - start
+            return None
+        for depth in range(1, self.maxDepth + 1):
+            try:
+                score = self.searchRoot(position, moves, depth)
+            except SearchTimeout:
+                break
+            self.depth = depth
+            self.score = score
+            self.pv = self.pvLines[0]
+            moves.remove(self.pv[0])
+            moves.insert(0, self.pv[0]) #search the best move first next iteration
+            if abs(score) >= WIN_SCORE - WIN_RANGE or time.time() >= self.deadline:
+                break
+        self.elapsed = time.time() - start
+        return moves[0]
+
+    #searchRoot method
+    #@param _position the Position to search
+    #@param _moves the ordered compound moves of _position
+    #@param _depth the depth to search to
+    #@return the score of the best move, its line is left in pvLines[0]
+    def searchRoot(self, _position, _moves, _depth):
+        alpha = -INFINITY
+        player = _position.turn
+        for m in _moves:
+            _position.makeCompound(m)
+            self.evaluation.makeCompound(m, player)
+            score = -self.negamax(_position, _depth - 1, -INFINITY, -alpha, 1)
+            self.evaluation.unmakeCompound(m, player)
+            _position.unmakeCompound(m)
+            if score > alpha:
+                alpha = score
+                self.pvLines[0] = [m] + self.pvLines[1]
+        self.table.store(_position.hash, _depth, EXACT, alpha, self.pvLines[0][0])
+        return alpha
+
+    #negamax method
+    #@param _position the Position to search
+    #@param _depth the remaining depth
+    #@param _alpha the lower bound
+    #@param _beta the upper bound
+    #@param _ply the distance from the root
+    #@return the score of _position for the player to move
+    def negamax(self, _position, _depth, _alpha, _beta, _ply):
+        self.nodes += 1
+        if self.nodes % TIME_CHECK_NODES == 0 and (time.time() > self.deadline or (self.stop is not None and self.stop.is_set())):
+            raise SearchTimeout()
+        self.pvLines[_ply] = []
+        if _position.isGameOver():
+            return _ply - WIN_SCORE
+        if self.endgame is not None:
+            value = self.endgame.probe(_position)
+            if value is not None:
+                return endgameScore(value, _ply)
+        if self.wdl is not None:
+            result = self.wdl.probe(_position)
+            if result is not None:
+                if result == 0:
+                    return 0
+                return result * KNOWN_WIN_SCORE + self.evaluation.evaluate(_position) #the evaluation makes progress towards the win
+        if _depth == 0:
+            return self.evaluation.evaluate(_position)
+        tableMove = None
+        entry = self.table.probe(_position.hash)
+        if entry is not None:
+            depth, bound, score, tableMove = entry
+            if depth >= _depth:
+                score = fromTableScore(score, _ply)
+                if bound == EXACT or (bound == LOWER and score >= _beta) or (bound == UPPER and score <= _alpha):
+                    if tableMove is not None:
+                        self.pvLines[_ply] = [tableMove]
+                    return score
+        alphaOriginal = _alpha
+        best = -INFINITY
+        bestMove = None
+        player = _position.turn
+        for m in orderMoves(_position.getCompoundMoves(), tableMove):
+            _position.makeCompound(m)
+            self.evaluation.makeCompound(m, player)
+            score = -self.negamax(_position, _depth - 1, -_beta, -_alpha, _ply + 1)
+            self.evaluation.unmakeCompound(m, player)
+            _position.unmakeCompound(m)
+            if score > best:
+                best = score
+                bestMove = m
+                if score > _alpha:
+                    _alpha = score
+                    self.pvLines[_ply] = [m] + self.pvLines[_ply + 1]
+                    if _alpha >= _beta:
+                        break
+        if best >= _beta:
+            bound = LOWER
+        elif best > alphaOriginal:
+            bound = EXACT
+        else:
+            bound = UPPER
+        self.table.store(_position.hash, _depth, bound, toTableScore(best, _ply), bestMove)
+        return best
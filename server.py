@@ -0,0 +1,312 @@
+#!/usr/bin/python
+
+#server module
+#headless game server holding many games at once, one JSON object per line
+#over TCP. Games are small GameSession objects, moves are checked with engine
+#and AI moves are searched in a pool of worker processes so the event loop
+#never waits on them.
+#requests, each may carry an "id" that is copied into the reply:
+#  {"cmd": "new", "ai": 0, 1 or 2, "time": seconds} starts a game, ai is the player the AI plays or 0
+#  {"cmd": "move", "game": id, "from": -1, "to": 3, "remove": -1} plays a compound move
+#  {"cmd": "state", "game": id}
+#  {"cmd": "close", "game": id}
+#replies are {"ok": true, "game": id, "position": ..., "moves": [[from, to, remove], ...],
+#"ai": [from, to, remove] if the AI moved, "winner": 0, 1 or 2} or {"ok": false, "error": ...}
+#with --record every game is appended to a game record file when it is closed
+
+import sys, socket, asyncore, asynchat, json, Queue, itertools
+from optparse import OptionParser
+from multiprocessing import Pool, cpu_count
+import engine
+from perft import formatPosition, parsePosition
+from search import Searcher, DEFAULT_TIME_LIMIT
+from gamerecord import GameRecord, GameWriter, UNFINISHED
+
+DEFAULT_PORT = 9009
+MAX_TIME_LIMIT = 5.0 #longest AI search a client may ask for
+MAX_LINE = 4096 #longest request accepted
+AI_ATTEMPTS = 3 #searches tried for an AI move before the game is given up
+
+#GameSession class is the state of one game
+class GameSession(object):
+    __slots__ = ['position', 'ai', 'timeLimit', 'thinking', 'moves', 'failures']
+
+    #__init__ method
+    #@param _ai the player the AI plays or 0
+    #@param _timeLimit the seconds the AI searches each move
+    def __init__(self, _ai, _timeLimit):
+        self.position = engine.Position()
+        self.ai = _ai
+        self.timeLimit = _timeLimit
+        self.thinking = False #an AI move is being searched
+        self.moves = [] #compound moves played
+        self.failures = 0 #failed searches for the current AI move
+
+_searcher = None #Searcher of a worker process
+
+#searchMove function
+#runs in a worker process
+#@param _task a tuple (position text, time limit)
+#@return a tuple (move, error) of the compound move found and None, or None and
+#the error if the search failed
+def searchMove(_task):
+    global _searcher
+    text, timeLimit = _task
+    try:
+        if _searcher is None:
+            _searcher = Searcher()
+        return (_searcher.findMove(parsePosition(text), timeLimit), None)
+    except Exception, e: #the pool has no error callback, the game must still get its reply
+        return (None, '%s: %s' % (type(e).__name__, e))
+
+#Waker class wakes the event loop when a worker has finished, the pool's result
+#thread writes a byte to one end of a socket pair and the loop reads the other
+class Waker(asyncore.dispatcher):
+    def __init__(self, _map):
+        reader, self.writer = socket.socketpair()
+        asyncore.dispatcher.__init__(self, reader, _map)
+        self.results = Queue.Queue() #(game id, (move, error)) from the workers
+
+    #wake method
+    #called from the pool's result thread
+    #@param _gameId the game the move is for
+    #@param _result the tuple (move, error) returned by searchMove
+    def wake(self, _gameId, _result):
+        self.results.put((_gameId, _result))
+        self.writer.send('x')
+
+    def writable(self):
+        return False
+
+    def handle_read(self):
+        self.recv(4096)
+
+#GameServer class accepts connections and holds the games
+class GameServer(asyncore.dispatcher):
+    #__init__ method
+    #@param _host the address to listen on
+    #@param _port the port to listen on
+    #@param _processes the number of AI worker processes
+    #@param _recordPath a game record file to append finished games to or None
+    def __init__(self, _host, _port, _processes, _recordPath=None):
+        self.pool = Pool(_processes) #started first so the workers don't inherit the sockets
+        self.socketMap = {}
+        asyncore.dispatcher.__init__(self, map=self.socketMap)
+        self.create_socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.set_reuse_addr()
+        self.bind((_host, _port))
+        self.listen(128)
+        self.games = {}
+        self.gameIds = itertools.count(1)
+        self.waiting = {} #game id to (connection, request id) waiting for an AI move
+        self.waker = Waker(self.socketMap)
+        self.writer = None
+        if _recordPath is not None:
+            self.writer = GameWriter(_recordPath)
+
+    def handle_accept(self):
+        pair = self.accept()
+        if pair is not None:
+            Connection(pair[0], self)
+
+    #serve method
+    #runs the event loop until interrupted
+    def serve(self):
+        try:
+            while self.socketMap:
+                asyncore.loop(timeout=1.0, map=self.socketMap, count=1)
+                self.finishAIMoves()
+        finally:
+            self.pool.terminate()
+            for gameId in self.games.keys():
+                self.endGame(gameId)
+            if self.writer is not None:
+                self.writer.close()
+
+    #startAIMove method
+    #@param _gameId the game where it is the AI's turn
+    #@param _connection the connection to reply to
+    #@param _requestId the id of the request to reply to
+    def startAIMove(self, _gameId, _connection, _requestId):
+        game = self.games[_gameId]
+        game.thinking = True
+        self.waiting[_gameId] = (_connection, _requestId)
+        self.pool.apply_async(searchMove, [(formatPosition(game.position), game.timeLimit)],
+                              callback=lambda result: self.waker.wake(_gameId, result))
+
+    #finishAIMoves method
+    #plays the moves the workers have found and sends the replies, a failed
+    #search is started again and after AI_ATTEMPTS failures the game is ended
+    #with an error reply so it isn't left waiting for the AI
+    def finishAIMoves(self):
+        while True:
+            try:
+                gameId, (move, error) = self.waker.results.get_nowait()
+            except Queue.Empty:
+                return
+            connection, requestId = self.waiting.pop(gameId)
+            game = self.games.get(gameId)
+            if game is None: #closed while the AI was thinking
+                continue
+            game.thinking = False
+            if error is not None:
+                game.failures += 1
+                if game.failures < AI_ATTEMPTS:
+                    self.startAIMove(gameId, connection, requestId)
+                else:
+                    self.endGame(gameId)
+                    connection.games.discard(gameId)
+                    connection.reply(requestId, {'ok': False, 'game': gameId, 'error': 'the AI failed to move: ' + error})
+                continue
+            game.failures = 0
+            if move is not None:
+                game.position.makeCompound(move)
+                game.moves.append(move)
+            connection.reply(requestId, self.describe(gameId, move))
+
+    #describe method
+    #@param _gameId the game
+    #@param _aiMove the move the AI just made or None
+    #@return the reply for the game
+    def describe(self, _gameId, _aiMove=None):
+        position = self.games[_gameId].position
+        reply = {'ok': True, 'game': _gameId, 'position': formatPosition(position),
+                 'moves': position.getCompoundMoves(), 'winner': position.winner()}
+        if _aiMove is not None:
+            reply['ai'] = _aiMove
+        return reply
+
+    #handleRequest method
+    #@param _connection the connection the request came from
+    #@param _request the decoded request
+    #@return the reply, or None if it will be sent after an AI move
+    def handleRequest(self, _connection, _request):
+        command = _request.get('cmd')
+        requestId = _request.get('id')
+        if command == 'new':
+            ai = _request.get('ai', 2)
+            timeLimit = _request.get('time', DEFAULT_TIME_LIMIT)
+            if ai not in (0, 1, 2):
+                raise ValueError('ai must be 0, 1 or 2')
+            if not 0 < timeLimit <= MAX_TIME_LIMIT:
+                raise ValueError('time must be above 0 and at most %g' % MAX_TIME_LIMIT)
+            gameId = next(self.gameIds)
+            self.games[gameId] = GameSession(ai, timeLimit)
+            _connection.games.add(gameId)
+            if ai == 1:
+                self.startAIMove(gameId, _connection, requestId)
+                return None
+            return self.describe(gameId)
+        gameId = _request.get('game')
+        game = self.games.get(gameId)
+        if game is None or gameId not in _connection.games: #other connections' games are not theirs to see or play
+            raise ValueError('no game %s' % gameId)
+        if command == 'state':
+            return self.describe(gameId)
+        if command == 'close':
+            self.endGame(gameId)
+            _connection.games.discard(gameId)
+            return {'ok': True, 'game': gameId}
+        if command == 'move':
+            position = game.position
+            if game.thinking or position.turn == game.ai:
+                raise ValueError('it is the AI\'s turn')
+            if position.isGameOver():
+                raise ValueError('the game is over')
+            move = (_request.get('from', -1), _request.get('to'), _request.get('remove', -1))
+            if move not in position.getCompoundMoves():
+                raise ValueError('illegal move %s' % (move,))
+            position.makeCompound(move)
+            game.moves.append(move)
+            if position.turn == game.ai and not position.isGameOver():
+                self.startAIMove(gameId, _connection, requestId)
+                return None
+            return self.describe(gameId)
+        raise ValueError('unknown command %s' % command)
+
+    #endGame method
+    #forgets a game, recording it if there is a record file
+    #@param _gameId the game
+    def endGame(self, _gameId):
+        game = self.games.pop(_gameId, None)
+        if game is not None and game.moves and self.writer is not None:
+            self.writer.write(GameRecord(game.moves, game.position.winner() or UNFINISHED))
+            self.writer.flush()
+
+    #dropConnection method
+    #@param _connection a closed connection, its games are ended
+    def dropConnection(self, _connection):
+        for gameId in _connection.games:
+            self.endGame(gameId)
+        _connection.games.clear()
+
+#Connection class reads requests from one client line by line
+class Connection(asynchat.async_chat):
+    #__init__ method
+    #@param _socket the client's socket
+    #@param _server the GameServer
+    def __init__(self, _socket, _server):
+        asynchat.async_chat.__init__(self, _socket, _server.socketMap)
+        self.server = _server
+        self.buffer = []
+        self.games = set() #games started on this connection
+        self.set_terminator('\n')
+
+    def collect_incoming_data(self, _data):
+        self.buffer.append(_data)
+        if sum([len(d) for d in self.buffer]) > MAX_LINE:
+            self.buffer = []
+            self.reply(None, {'ok': False, 'error': 'request too long'})
+            self.close_when_done()
+
+    def found_terminator(self):
+        line = ''.join(self.buffer)
+        self.buffer = []
+        if not line.strip():
+            return
+        requestId = None
+        try:
+            request = json.loads(line)
+            if not isinstance(request, dict):
+                raise ValueError('a request must be an object')
+            requestId = request.get('id')
+            reply = self.server.handleRequest(self, request)
+        except (ValueError, TypeError), e:
+            reply = {'ok': False, 'error': str(e)}
+        if reply is not None:
+            self.reply(requestId, reply)
+
+    #reply method
+    #@param _requestId the id of the request or None
+    #@param _reply the reply object
+    def reply(self, _requestId, _reply):
+        if self.connected:
+            if _requestId is not None:
+                _reply['id'] = _requestId
+            self.push(json.dumps(_reply) + '\n')
+
+    def handle_close(self):
+        self.server.dropConnection(self)
+        self.close()
+
+def main():
+    parser = OptionParser(usage='usage: %prog [options]')
+    parser.add_option('-H', '--host', default='127.0.0.1',
+                      help='address to listen on [default: %default]')
+    parser.add_option('-p', '--port', type='int', default=DEFAULT_PORT,
+                      help='port to listen on [default: %default]')
+    parser.add_option('-w', '--workers', type='int', default=cpu_count(),
+                      help='AI worker processes [default: %default]')
+    parser.add_option('-r', '--record', metavar='FILE',
+                      help='append the games to the game record FILE')
+    options, args = parser.parse_args()
+    server = GameServer(options.host, options.port, options.workers, options.record)
+    print 'listening on %s:%d' % (options.host, options.port)
+    sys.stdout.flush()
+    try:
+        server.serve()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,97 @@
+#!/usr/bin/python
+
+#symmetry module
+#the 16 symmetries of the board and canonical keys for positions
+#intersection i is point i % 8 of ring i / 8 (0 outer, 1 middle, 2 inner), the
+#points of a ring numbered clockwise from the top left corner, so rotations and
+#reflections permute the points of every ring the same way and the ring swap
+#exchanges the outer and inner rings
+
+#ringMap function
+#@param _rotation quarter turns clockwise, 0 to 3
+#@param _reflect true to reflect left to right before rotating
+#@return a list mapping each point of a ring to its new point
+def ringMap(_rotation, _reflect):
+    points = []
+    for k in range(8):
+        if _reflect:
+            k = (2 - k) % 8
+        points.append((k + 2 * _rotation) % 8)
+    return points
+
+#permutations[s][i] is where symmetry s moves intersection i, symmetry 0 is the identity
+permutations = []
+for swap in (False, True):
+    for reflect in (False, True):
+        for rotation in range(4):
+            points = ringMap(rotation, reflect)
+            perm = []
+            for i in range(24):
+                ring = i // 8
+                if swap:
+                    ring = 2 - ring
+                perm.append(ring * 8 + points[i % 8])
+            permutations.append(perm)
+
+#inverses[s] is the symmetry that undoes symmetry s
+inverses = [[t for t in range(16) if [permutations[t][p] for p in permutations[s]] == range(24)][0] for s in range(16)]
+
+#maskTables[s][r][b] is the mask of the intersections that the points set in byte b
+#of ring r are moved to by symmetry s
+maskTables = [[[sum([1 << permutations[s][r * 8 + k] for k in range(8) if b & (1 << k)]) for b in range(256)] for r in range(3)] for s in range(16)]
+
+#transformMask function
+#@param _mask a 24 bit mask of intersections
+#@param _symmetry the symmetry
+#@return _mask moved by _symmetry
+def transformMask(_mask, _symmetry):
+    tables = maskTables[_symmetry]
+    return tables[0][_mask & 255] | tables[1][(_mask >> 8) & 255] | tables[2][_mask >> 16]
+
+#transformMove function
+#@param _move a compound move (from, to, remove), -1 entries are left alone
+#@param _symmetry the symmetry
+#@return _move moved by _symmetry
+def transformMove(_move, _symmetry):
+    perm = permutations[_symmetry]
+    return tuple([p if p == -1 else perm[p] for p in _move])
+
+#canonicalMasks function
+#@param _first the first mask of a pair, compared first
+#@param _second the second mask
+#@return a tuple (symmetry, first, second) of the symmetry that gives the
+#smallest moved pair of masks and the moved masks
+def canonicalMasks(_first, _second):
+    best = (_first << 24) | _second
+    bestSymmetry = 0
+    for s in range(1, 16):
+        tables = maskTables[s]
+        moved = ((tables[0][_first & 255] | tables[1][(_first >> 8) & 255] | tables[2][_first >> 16]) << 24) | \
+                tables[0][_second & 255] | tables[1][(_second >> 8) & 255] | tables[2][_second >> 16]
+        if moved < best:
+            best = moved
+            bestSymmetry = s
+    return (bestSymmetry, best >> 24, best & 0xffffff)
+
+#canonicalKey function
+#@param _position the Position
+#@return an integer that is the same for all positions equal to _position up to
+#a symmetry of the board and different for all other positions
+def canonicalKey(_position):
+    s, first, second = canonicalMasks(_position.bits[1], _position.bits[2])
+    key = (first << 24) | second
+    key = (key << 4) | _position.inHand[1]
+    key = (key << 4) | _position.inHand[2]
+    key = (key << 1) | (_position.turn - 1)
+    return (key << 1) | int(_position.removing)
+
+#canonicalPosition function
+#@param _position the Position
+#@return a tuple (symmetry, position) of a new Position with the pieces of
+#_position moved to their canonical places and the symmetry that moved them
+def canonicalPosition(_position):
+    s, first, second = canonicalMasks(_position.bits[1], _position.bits[2])
+    position = _position.copy()
+    position.bits = [0, first, second]
+    position.hash = position.computeHash()
+    return (s, position)
@@ -0,0 +1,189 @@
+#!/usr/bin/python
+
+#tournament module
+#plays AI against AI games without the GUI across all cores and reports the
+#results and the Elo difference between the players
+#games are played in pairs from the same seed with the colors swapped, and
+#every game has its own seeded random number generator so a run can be repeated
+
+import time, math, random
+from optparse import OptionParser
+from multiprocessing import Pool, cpu_count
+import engine
+import variants
+from players import makePlayer, standardOnly
+from gamerecord import GameRecord, GameWriter, DRAW
+
+DEFAULT_GAMES = 100
+DEFAULT_OPENING_PLIES = 2 #random moves at the start of each game so the games differ
+MAX_PLIES = 200 #a game this long is a draw
+CONFIDENCE_Z = 1.96 #95% confidence interval
+
+_players = {} #players made in this process by spec and side
+
+#getPlayer function
+#@param _spec the player spec
+#@param _side 0 for player A and 1 for player B, a player playing itself gets
+#two players so their tables and trees aren't shared between the sides
+#@return the player for _spec on _side, made once in each process
+def getPlayer(_spec, _side):
+    player = _players.get((_spec, _side))
+    if player is None:
+        player = makePlayer(_spec)
+        _players[(_spec, _side)] = player
+    return player
+
+#playGame function
+#@param _task a tuple (specA, specB, seed, swap, openingPlies, maxPlies, variant),
+#player A moves first unless swap is true, variant is the source of the
+#variants.Variant played
+#@return a tuple (score, plies, times, moves, record) where score is 1, 0.5 or 0
+#for player A, times and moves are the seconds spent and moves made by A and B
+#and record is the GameRecord of the game
+def playGame(_task):
+    specA, specB, seed, swap, openingPlies, maxPlies, variant = _task
+    rng = random.Random(seed)
+    sides = [getPlayer(specA, 0), getPlayer(specB, 1)]
+    for player in sides:
+        player.newGame()
+    first = int(swap) #index into sides of player 1
+    times = [0.0, 0.0]
+    moves = [0, 0]
+    position = engine.Position(variants.getVariant(variant))
+    played = [] #every compound move of the game
+    for ply in range(openingPlies):
+        if position.isGameOver():
+            break
+        played.append(rng.choice(position.getCompoundMoves()))
+        position.makeCompound(played[-1])
+    plies = 0
+    while not position.isGameOver() and plies < maxPlies:
+        side = first if position.turn == 1 else 1 - first
+        start = time.time()
+        played.append(sides[side].play(position, rng))
+        times[side] += time.time() - start
+        moves[side] += 1
+        plies += 1
+    winner = position.winner()
+    if winner == 0:
+        score = 0.5
+    elif (winner == 1) != swap:
+        score = 1.0
+    else:
+        score = 0.0
+    names = [specA, specB]
+    tag = '%s vs %s' % (names[first], names[1 - first])
+    if position.variant is not engine.STANDARD:
+        tag += ', ' + position.variant.name
+    record = GameRecord(played, winner or DRAW, tag, variant)
+    return (score, plies, times, moves, record)
+
+#eloDifference function
+#@param _score the fraction of points scored
+#@return the Elo difference that gives _score
+def eloDifference(_score):
+    if _score <= 0:
+        return float('-inf')
+    if _score >= 1:
+        return float('inf')
+    return -400 * math.log10(1 / _score - 1)
+
+#eloInterval function
+#@param _wins the games won
+#@param _draws the games drawn
+#@param _losses the games lost
+#@return a tuple (elo, low, high) of the Elo difference and its confidence
+#interval, which is unbounded if no games were played
+def eloInterval(_wins, _draws, _losses):
+    games = float(_wins + _draws + _losses)
+    if games == 0:
+        return (0.0, float('-inf'), float('inf'))
+    score = (_wins + 0.5 * _draws) / games
+    variance = (_wins * (1 - score) ** 2 + _draws * (0.5 - score) ** 2 + _losses * score ** 2) / games
+    margin = CONFIDENCE_Z * math.sqrt(variance / games)
+    return (eloDifference(score), eloDifference(score - margin), eloDifference(score + margin))
+
+#runTournament function
+#@param _specA the spec of player A
+#@param _specB the spec of player B
+#@param _games the number of games
+#@param _processes the number of worker processes
+#@param _seed the seed of the first pair of games
+#@param _openingPlies the random moves at the start of each game
+#@param _maxPlies the plies after which a game is a draw
+#@param _recordPath a game record file to append the games to or None
+#@param _variant the game to play, a name or definition file for variants.getVariant
+#@return a dictionary of the results
+def runTournament(_specA, _specB, _games, _processes, _seed, _openingPlies, _maxPlies, _recordPath=None, _variant='nine'):
+    tasks = [(_specA, _specB, _seed + g // 2, g % 2 == 1, _openingPlies, _maxPlies, _variant) for g in range(_games)]
+    results = {'wins': 0, 'draws': 0, 'losses': 0, 'plies': 0, 'times': [0.0, 0.0], 'moves': [0, 0]}
+    start = time.time()
+    writer = None
+    if _recordPath is not None:
+        writer = GameWriter(_recordPath)
+    pool = Pool(_processes)
+    try:
+        for score, plies, times, moves, record in pool.imap_unordered(playGame, tasks):
+            if writer is not None:
+                writer.write(record)
+            if score == 1:
+                results['wins'] += 1
+            elif score == 0:
+                results['losses'] += 1
+            else:
+                results['draws'] += 1
+            results['plies'] += plies
+            for i in range(2):
+                results['times'][i] += times[i]
+                results['moves'][i] += moves[i]
+    finally:
+        pool.terminate()
+        if writer is not None:
+            writer.close()
+    results['seconds'] = time.time() - start
+    return results
+
+def main():
+    parser = OptionParser(usage='usage: %prog [options] PLAYER_A PLAYER_B\n\n'
+                          'players are search[:time=S,depth=N,hash=MB,book=FILE,endgame=DIR,wdl=DIR,weights=FILE],\n'
+                          'mcts[:time=S,playouts=N,c=C,playout=random|heuristic,parallel=none|root|tree,workers=N,reuse=0|1],\n'
+                          'greedy or random')
+    parser.add_option('-g', '--games', type='int', default=DEFAULT_GAMES,
+                      help='games to play [default: %default]')
+    parser.add_option('-p', '--processes', type='int', default=cpu_count(),
+                      help='worker processes [default: %default]')
+    parser.add_option('-s', '--seed', type='int', default=1,
+                      help='seed of the first pair of games [default: %default]')
+    parser.add_option('-o', '--opening-plies', type='int', default=DEFAULT_OPENING_PLIES,
+                      help='random moves at the start of each game [default: %default]')
+    parser.add_option('-m', '--max-plies', type='int', default=MAX_PLIES,
+                      help='plies after which a game is a draw [default: %default]')
+    parser.add_option('-r', '--record', metavar='FILE',
+                      help='append the games to the game record FILE')
+    parser.add_option('-v', '--variant', default='nine',
+                      help='game to play, %s or a definition file [default: %%default]' % ', '.join(sorted(variants.definitions)))
+    options, args = parser.parse_args()
+    if len(args) != 2:
+        parser.error('give two players')
+    try:
+        variant = variants.getVariant(options.variant)
+        for spec in args:
+            makePlayer(spec)
+            if variant is not engine.STANDARD and spec.partition(':')[0] in standardOnly:
+                raise ValueError('%s only plays %s' % (spec, engine.STANDARD.name))
+    except ValueError, e:
+        parser.error(str(e))
+    r = runTournament(args[0], args[1], options.games, options.processes, options.seed,
+                      options.opening_plies, options.max_plies, options.record, options.variant)
+    games = r['wins'] + r['draws'] + r['losses']
+    elo, low, high = eloInterval(r['wins'], r['draws'], r['losses'])
+    print '%s vs %s: %d games' % (args[0], args[1], games)
+    print 'wins %d, draws %d, losses %d, score %.1f%%' % (r['wins'], r['draws'], r['losses'],
+                                                        100.0 * (r['wins'] + 0.5 * r['draws']) / max(1, games))
+    print 'elo difference %.1f (%.1f to %.1f)' % (elo, low, high)
+    for i in range(2):
+        print 'average move time %s: %.2fms' % (args[i], 1000.0 * r['times'][i] / max(1, r['moves'][i]))
+    print 'average game length %.1f plies, %.2f games/s' % (float(r['plies']) / max(1, games), games / r['seconds'])
+
+if __name__ == '__main__':
+    main()
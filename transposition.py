@@ -0,0 +1,110 @@
+#!/usr/bin/python
+
+#transposition module
+#fixed size table of search results keyed on zobrist hashes, every bucket has a
+#depth preferred slot and an always replace slot
+
+from array import array
+
+DEFAULT_SIZE_MB = 16
+SLOT_BYTES = 12 #check, score and info words of one slot
+
+#bound types of a stored score
+EXACT = 0
+LOWER = 1 #the score is at least this, the search failed high
+UPPER = 2 #the score is at most this, the search failed low
+
+#encodeMove function
+#@param _move a compound move (from, to, remove) or None
+#@return _move packed into 15 bits, 0 for None
+def encodeMove(_move):
+    if _move is None:
+        return 0
+    return (_move[0] + 1) | (_move[1] << 5) | ((_move[2] + 1) << 10) | (1 << 15)
+
+#decodeMove function
+#@param _code a move packed by encodeMove
+#@return the compound move or None
+def decodeMove(_code):
+    if not _code:
+        return None
+    return ((_code & 31) - 1, (_code >> 5) & 31, ((_code >> 10) & 31) - 1)
+
+#TranspositionTable class stores search results for positions
+class TranspositionTable(object):
+    #__init__ method
+    #@param _sizeMB the memory to use in megabytes
+    def __init__(self, _sizeMB=DEFAULT_SIZE_MB):
+        buckets = 1
+        while buckets * 4 * SLOT_BYTES <= _sizeMB * 1024 * 1024:
+            buckets *= 2
+        self.mask = buckets - 1
+        slots = buckets * 2 #slot 2i is depth preferred and 2i+1 always replace
+        self.checks = array('I', [0]) * slots #upper 32 bits of the hash, 0 if empty
+        self.scores = array('i', [0]) * slots
+        self.infos = array('I', [0]) * slots #depth, bound, move and generation
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.collisions = 0 #stores that replaced another position's entry
+
+    #clear method
+    #empties the table and resets the counters
+    def clear(self):
+        slots = len(self.checks)
+        self.checks = array('I', [0]) * slots
+        self.scores = array('i', [0]) * slots
+        self.infos = array('I', [0]) * slots
+        self.generation = 0
+        self.resetCounters()
+
+    #resetCounters method
+    def resetCounters(self):
+        self.hits = 0
+        self.misses = 0
+        self.collisions = 0
+
+    #newSearch method
+    #ages the stored entries so entries from earlier searches are replaced first
+    def newSearch(self):
+        self.generation = (self.generation + 1) & 255
+
+    #probe method
+    #@param _hash the zobrist hash of the position
+    #@return a tuple (depth, bound, score, move) or None if the position isn't stored
+    def probe(self, _hash):
+        check = (_hash >> 32) | 1
+        slot = (_hash & self.mask) << 1
+        if self.checks[slot] != check:
+            slot += 1
+            if self.checks[slot] != check:
+                self.misses += 1
+                return None
+        self.hits += 1
+        info = self.infos[slot]
+        return (info & 63, (info >> 6) & 3, self.scores[slot], decodeMove((info >> 8) & 65535))
+
+    #store method
+    #@param _hash the zobrist hash of the position
+    #@param _depth the depth searched
+    #@param _bound EXACT, LOWER or UPPER
+    #@param _score the score found
+    #@param _move the best compound move found or None
+    def store(self, _hash, _depth, _bound, _score, _move):
+        check = (_hash >> 32) | 1
+        slot = (_hash & self.mask) << 1
+        info = self.infos[slot]
+        if self.checks[slot] != check and (info & 63) > _depth and info >> 24 == self.generation:
+            slot += 1 #keep the deeper entry from this search
+        if self.checks[slot] and self.checks[slot] != check:
+            self.collisions += 1
+        self.checks[slot] = check
+        self.scores[slot] = _score
+        self.infos[slot] = min(_depth, 63) | (_bound << 6) | (encodeMove(_move) << 8) | (self.generation << 24)
+
+    #getStats method
+    #@return a dictionary of the hit, miss and collision counters and the fill rate
+    def getStats(self):
+        used = len(self.checks) - self.checks.count(0)
+        return {'hits': self.hits, 'misses': self.misses, 'collisions': self.collisions,
+                'slots': len(self.checks), 'used': used}
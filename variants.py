@@ -0,0 +1,202 @@
+#!/usr/bin/python
+
+#variants module
+#the boards and rules of the morris games, each game is a definition from which
+#every lookup table the rules need is built once when the variant is first used
+#a definition has:
+#  name     the name of the game
+#  points   the grid coordinates (x, y) of each intersection, at most MAX_POINTS
+#  lines    the lines drawn on the board as lists of intersections in order along
+#           the line, neighbors on a line are connected and every MILL_LENGTH of
+#           them in a row make a mill, diagonals are lines like any other
+#  pieces   the pieces each player starts with
+#  flying   the pieces left at which a player may move to any empty
+#           intersection, 0 if players never fly
+#custom boards are read from JSON files holding a definition
+
+import os, json, random
+
+MAX_POINTS = 24 #positions keep each player's pieces in a 24 bit mask
+MILL_LENGTH = 3
+ZOBRIST_SEED = 9 #the same keys on every run
+
+#the standard game, intersections are numbered from the top left corner of the
+#outer square clockwise, then the middle and inner squares
+NINE_MENS_MORRIS = {
+    'name': "Nine Men's Morris",
+    'points': [(0, 0), (3, 0), (6, 0), (6, 3), (6, 6), (3, 6), (0, 6), (0, 3),
+               (1, 1), (3, 1), (5, 1), (5, 3), (5, 5), (3, 5), (1, 5), (1, 3),
+               (2, 2), (3, 2), (4, 2), (4, 3), (4, 4), (3, 4), (2, 4), (2, 3)],
+    'lines': [[0, 1, 2], [2, 3, 4], [4, 5, 6], [6, 7, 0],
+              [8, 9, 10], [10, 11, 12], [12, 13, 14], [14, 15, 8],
+              [16, 17, 18], [18, 19, 20], [20, 21, 22], [22, 23, 16],
+              [1, 9, 17], [3, 11, 19], [5, 13, 21], [7, 15, 23]],
+    'pieces': 9,
+    'flying': 3
+}
+
+#lines through the corners of the three squares of the standard board
+DIAGONALS = [[0, 8, 16], [2, 10, 18], [4, 12, 20], [6, 14, 22]]
+
+SIX_MENS_MORRIS = {
+    'name': "Six Men's Morris",
+    'points': [(0, 0), (2, 0), (4, 0), (4, 2), (4, 4), (2, 4), (0, 4), (0, 2),
+               (1, 1), (2, 1), (3, 1), (3, 2), (3, 3), (2, 3), (1, 3), (1, 2)],
+    'lines': [[0, 1, 2], [2, 3, 4], [4, 5, 6], [6, 7, 0],
+              [8, 9, 10], [10, 11, 12], [12, 13, 14], [14, 15, 8],
+              [1, 9], [3, 11], [5, 13], [7, 15]],
+    'pieces': 6,
+    'flying': 0
+}
+
+TWELVE_MENS_MORRIS = {
+    'name': "Twelve Men's Morris",
+    'points': NINE_MENS_MORRIS['points'],
+    'lines': NINE_MENS_MORRIS['lines'] + DIAGONALS,
+    'pieces': 12,
+    'flying': 0
+}
+
+MORABARABA = {
+    'name': 'Morabaraba',
+    'points': NINE_MENS_MORRIS['points'],
+    'lines': NINE_MENS_MORRIS['lines'] + DIAGONALS,
+    'pieces': 12,
+    'flying': 3
+}
+
+definitions = {'nine': NINE_MENS_MORRIS, 'six': SIX_MENS_MORRIS, 'twelve': TWELVE_MENS_MORRIS,
+               'morabaraba': MORABARABA}
+
+_variants = {} #Variants made by getVariant
+
+#Variant class is a game's board and rules with the lookup tables built from them
+class Variant(object):
+    #__init__ method
+    #@param _definition the definition of the game
+    #@param _source the name or file it was loaded from, given to getVariant to get it again
+    def __init__(self, _definition, _source):
+        self.source = _source
+        self.name = _definition['name']
+        self.points = [tuple(p) for p in _definition['points']]
+        self.lines = [list(l) for l in _definition['lines']]
+        self.pieces = _definition['pieces']
+        self.flying = _definition['flying']
+        size = len(self.points)
+        if not MILL_LENGTH <= size <= MAX_POINTS:
+            raise ValueError('%s: a board has %d to %d intersections' % (self.name, MILL_LENGTH, MAX_POINTS))
+        for line in self.lines:
+            if len(line) < 2 or len(set(line)) != len(line) or [p for p in line if not 0 <= p < size]:
+                raise ValueError('%s: bad line %s' % (self.name, line))
+        if not MILL_LENGTH <= self.pieces <= size // 2: #both players' pieces must fit on the board
+            raise ValueError('%s: players have %d to %d pieces' % (self.name, MILL_LENGTH, size // 2))
+        self.size = size
+        self.allPositions = (1 << size) - 1
+        self.bit = [1 << i for i in range(size)]
+
+        #every MILL_LENGTH intersections in a row on a line, and for each
+        #intersection the other intersections of each mill through it in line order
+        runs = [line[i:i + MILL_LENGTH] for line in self.lines for i in range(len(line) - MILL_LENGTH + 1)]
+        self.millLines = sorted(set([tuple(sorted(run)) for run in runs]))
+        self.millLineMasks = [self.mask(line) for line in self.millLines]
+        self.pointLines = [[l for l in range(len(self.millLines)) if i in self.millLines[l]] for i in range(size)]
+        self.mills = [[[q for q in run if q != i] for run in runs if i in run] for i in range(size)]
+        self.millPairMasks = [tuple([self.mask(pair) for pair in self.mills[i]]) for i in range(size)]
+
+        #the other intersections of the mills through each intersection, and the
+        #parts of them that complete a mill, so closesMill is one set lookup
+        #however many mills go through an intersection
+        self.millPartners = [reduce(lambda a, b: a | b, pairs, 0) for pairs in self.millPairMasks]
+        self.millClosers = []
+        for pairs, partners in zip(self.millPairMasks, self.millPartners):
+            closers = set()
+            subset = partners
+            while True:
+                for pair in pairs:
+                    if subset & pair == pair:
+                        closers.add(subset)
+                        break
+                if subset == 0:
+                    break
+                subset = (subset - 1) & partners
+            self.millClosers.append(frozenset(closers))
+
+        self.neighbors = [[] for i in range(size)]
+        for line in self.lines:
+            for a, b in zip(line, line[1:]):
+                if b not in self.neighbors[a]:
+                    self.neighbors[a].append(b)
+                    self.neighbors[b].append(a)
+        self.neighborMask = [self.mask(n) for n in self.neighbors]
+        self.adjacent = [[b in self.neighbors[a] for b in range(size)] for a in range(size)]
+
+        #zobrist keys for hashing positions
+        keyRandom = random.Random(ZOBRIST_SEED)
+        self.pieceKeys = [[0] * size] + [[keyRandom.getrandbits(64) for i in range(size)] for player in (1, 2)]
+        self.handKeys = [[0] * (self.pieces + 1)] + [[keyRandom.getrandbits(64) for i in range(self.pieces + 1)] for player in (1, 2)]
+        self.turnKey = keyRandom.getrandbits(64) #included when player 2 is to move
+        self.removingKey = keyRandom.getrandbits(64) #included when a piece must be removed
+
+        partnerMasks = self.millPartners
+        closerSets = self.millClosers
+        lineMasks = self.millLineMasks
+
+        #closesMill function
+        #@param _mask the player's pieces, including _pos
+        #@param _pos the position
+        #@return true if _pos is part of a mill in _mask
+        def closesMill(_mask, _pos):
+            return _mask & partnerMasks[_pos] in closerSets[_pos]
+
+        #millMask function
+        #@param _mask a player's pieces
+        #@return a mask of the pieces in _mask that are part of mills
+        def millMask(_mask):
+            inMills = 0
+            for line in lineMasks:
+                if _mask & line == line:
+                    inMills |= line
+            return inMills
+
+        self.closesMill = closesMill
+        self.millMask = millMask
+
+    #mask method
+    #@param _points a list of intersections
+    #@return the mask with the bits of _points set
+    def mask(self, _points):
+        m = 0
+        for p in _points:
+            m |= 1 << p
+        return m
+
+#loadDefinition function
+#@param _path a JSON file holding a definition
+#@return the definition
+def loadDefinition(_path):
+    f = open(_path)
+    try:
+        definition = json.load(f)
+    finally:
+        f.close()
+    missing = [k for k in ('name', 'points', 'lines', 'pieces', 'flying') if k not in definition]
+    if missing:
+        raise ValueError('%s: the definition has no %s' % (_path, ', '.join(missing)))
+    return definition
+
+#getVariant function
+#@param _source the name of a game in definitions or the path of a JSON file
+#holding a definition
+#@return the Variant, made once
+def getVariant(_source):
+    variant = _variants.get(_source)
+    if variant is None:
+        if _source in definitions:
+            definition = definitions[_source]
+        elif os.path.exists(_source):
+            definition = loadDefinition(_source)
+        else:
+            raise ValueError('unknown variant ' + _source)
+        variant = Variant(definition, _source)
+        _variants[_source] = variant
+    return variant
@@ -0,0 +1,136 @@
+#!/usr/bin/python
+
+#wdl module
+#compact win, draw or loss tables for the AI, made from the endgame tables
+#every subspace is a file with a header and then 2 bits for each symmetry
+#reduced index from positionindex, four entries to a byte starting at the low
+#bits. The files are memory mapped so a lookup reads only the page it needs.
+
+import os, mmap, struct
+from optparse import OptionParser
+from engine import popCount
+from positionindex import symmetricCount, rankSymmetric, unrankSymmetric
+import endgame
+
+DEFAULT_DIRECTORY = os.path.join('data', 'wdl')
+MAGIC = 'NMMWDL'
+HEADER = struct.Struct('<6sBBI') #magic, pieces of the player to move, pieces of the other player, entries
+
+#entry values
+DRAW = 0
+WIN = 1 #the player to move wins
+LOSS = 2 #the player to move loses
+results = [0, 1, -1, None] #result of each entry value for the player to move, 3 is unused
+
+#tablePath function
+#@param _directory the directory of the tables
+#@param _a the pieces of the player to move
+#@param _b the pieces of the other player
+#@return the path of the file for subspace (_a, _b)
+def tablePath(_directory, _a, _b):
+    return os.path.join(_directory, 'wdl_%d_%d.bin' % (_a, _b))
+
+#WdlDatabase class looks up the result of positions in memory mapped tables
+class WdlDatabase(object):
+    #__init__ method
+    #@param _directory the directory of the tables
+    def __init__(self, _directory=DEFAULT_DIRECTORY):
+        self.directory = _directory
+        self.tables = {} #memory mapped file or None for each subspace asked for
+
+    #getTable method
+    #@param _a the pieces of the player to move
+    #@param _b the pieces of the other player
+    #@return the memory mapped table of subspace (_a, _b) or None if there is none
+    def getTable(self, _a, _b):
+        try:
+            return self.tables[(_a, _b)]
+        except KeyError:
+            pass
+        table = None
+        path = tablePath(self.directory, _a, _b)
+        if os.path.exists(path):
+            f = open(path, 'rb')
+            try:
+                table = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            finally:
+                f.close()
+            magic, a, b, count = HEADER.unpack_from(table, 0)
+            if magic != MAGIC or (a, b) != (_a, _b) or count != symmetricCount(_a, _b):
+                raise IOError('bad wdl table ' + path)
+        self.tables[(_a, _b)] = table
+        return table
+
+    #lookup method
+    #@param _mover the pieces of the player to move
+    #@param _other the pieces of the other player
+    #@return 1 if the player to move wins, -1 if they lose, 0 for a draw or None
+    #if the position isn't in the tables
+    def lookup(self, _mover, _other):
+        table = self.getTable(popCount(_mover), popCount(_other))
+        if table is None:
+            return None
+        index = rankSymmetric(_mover, _other)
+        return results[(ord(table[HEADER.size + (index >> 2)]) >> ((index & 3) << 1)) & 3]
+
+    #probe method
+    #@param _position the Position
+    #@return the result of _position for the player to move or None if it isn't in the tables
+    def probe(self, _position):
+        if _position.removing or _position.inHand[1] or _position.inHand[2]:
+            return None
+        player = _position.turn
+        return self.lookup(_position.bits[player], _position.bits[player % 2 + 1])
+
+#writeTable function
+#@param _directory the directory of the tables
+#@param _a the pieces of the player to move
+#@param _b the pieces of the other player
+#@param _lookup a function giving the result for a pair of masks
+def writeTable(_directory, _a, _b, _lookup):
+    count = symmetricCount(_a, _b)
+    data = bytearray((count + 3) >> 2)
+    for index in range(count):
+        result = _lookup(*unrankSymmetric(_a, _b, index))
+        if result > 0:
+            data[index >> 2] |= WIN << ((index & 3) << 1)
+        elif result < 0:
+            data[index >> 2] |= LOSS << ((index & 3) << 1)
+    path = tablePath(_directory, _a, _b)
+    f = open(path + '.tmp', 'wb')
+    f.write(HEADER.pack(MAGIC, _a, _b, count))
+    f.write(data)
+    f.close()
+    if os.path.exists(path):
+        os.remove(path)
+    os.rename(path + '.tmp', path)
+
+#convert function
+#writes a wdl table for every endgame table there is
+#@param _source the directory of the endgame tables
+#@param _directory the directory to write the wdl tables to
+#@return a list of the subspaces (a, b) written
+def convert(_source, _directory):
+    if not os.path.isdir(_directory):
+        os.makedirs(_directory)
+    database = endgame.EndgameDatabase(_source)
+    written = []
+    for a in range(endgame.MIN_PIECES, 10):
+        for b in range(endgame.MIN_PIECES, 10):
+            if database.getTable(a, b) is not None:
+                writeTable(_directory, a, b, database.lookup)
+                written.append((a, b))
+    return written
+
+def main():
+    parser = OptionParser(usage='usage: %prog [options]')
+    parser.add_option('-s', '--source', default=endgame.DEFAULT_DIRECTORY,
+                      help='directory of the endgame tables [default: %default]')
+    parser.add_option('-d', '--directory', default=DEFAULT_DIRECTORY,
+                      help='directory to write the tables to [default: %default]')
+    options, args = parser.parse_args()
+    for a, b in convert(options.source, options.directory):
+        print '%dv%d: %d entries' % (a, b, symmetricCount(a, b))
+
+if __name__ == '__main__':
+    main()